@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from database import get_db
+import crud, schemas
+from api.users import get_current_user, get_admin_user
+from services.odometer_audit import run_audit
+
+router = APIRouter()
+
+@router.get("/odometro", response_model=List[schemas.InconsistenciaOdometroResponse])
+def read_odometer_findings(
+    veiculo_id: Optional[int] = None,
+    tipo: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Apenas admin e gestor podem consultar a auditoria
+    if current_user.perfil not in ["admin", "gestor"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado"
+        )
+    return crud.get_inconsistencias_odometro(db, veiculo_id=veiculo_id, tipo=tipo, skip=skip, limit=limit)
+
+@router.post("/odometro/executar")
+def run_odometer_audit(
+    admin_user: schemas.UsuarioResponse = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Reprocessa todo o histórico e substitui as inconsistências registradas"""
+    summary = run_audit(db)
+    return {
+        "message": "Auditoria de hodômetro concluída",
+        "total": sum(summary.values()),
+        "por_tipo": summary
+    }
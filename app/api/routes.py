@@ -1,14 +1,49 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
 import crud, schemas
 from api.users import get_current_user
-from services.google_maps import google_maps_service
+from services.geocoding import get_geocoder
 from datetime import datetime
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Quantidade máxima de rotas aceitas por envio em lote
+ROUTES_BULK_MAX_ITEMS = int(os.getenv("ROUTES_BULK_MAX_ITEMS", "500"))
 
 router = APIRouter()
 
+def _route_write_error(db: Session, route_id: int, current_user, forbidden_detail: str, closed_detail: str) -> HTTPException:
+    """
+    Explica por que um UPDATE/DELETE condicional não afetou nenhuma linha.
+    Só é chamada no caminho de falha; o caminho de sucesso não faz leituras prévias.
+    """
+    db_route = crud.get_rota(db, rota_id=route_id)
+    if db_route is None:
+        return HTTPException(status_code=404, detail="Rota não encontrada")
+    
+    db_control = crud.get_controle(db, controle_id=db_route.controle_utilizacao_id)
+    if db_control.motorista_id != current_user.id:
+        return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden_detail)
+    return HTTPException(status_code=400, detail=closed_detail)
+
+def _check_route_owner(db: Session, route_id: int, current_user):
+    """Garante que a rota existe e pertence a um controle do usuário (404/403)"""
+    db_route = crud.get_rota(db, rota_id=route_id)
+    if db_route is None:
+        raise HTTPException(status_code=404, detail="Rota não encontrada")
+    
+    db_control = crud.get_controle(db, controle_id=db_route.controle_utilizacao_id)
+    if db_control.motorista_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado"
+        )
+
 @router.post("/", response_model=schemas.RotaResponse)
 def create_route(
     route: schemas.RotaCreate,
@@ -30,7 +65,74 @@ def create_route(
     if db_control.status != "aberto":
         raise HTTPException(status_code=400, detail="Não é possível adicionar rotas a um controle finalizado ou cancelado")
     
-    return crud.create_rota(db=db, rota=route)
+    db_route = crud.create_rota(db=db, rota=route)
+    if db_route is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="client_id já utilizado em outra rota")
+    return db_route
+
+@router.post("/bulk", response_model=schemas.RotaBulkResponse)
+def create_routes_bulk(
+    routes: List[schemas.RotaBulkItem],
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Recebe de uma vez as rotas gravadas offline pelo aplicativo.
+    
+    O reenvio é seguro: rotas cujo client_id já foi gravado voltam como
+    duplicadas, sem nova inserção. Rotas de controles inexistentes, de outro
+    motorista ou já encerrados voltam em "rejeitadas"; as demais são gravadas
+    juntas em uma única transação.
+    """
+    if len(routes) > ROUTES_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Envie no máximo {ROUTES_BULK_MAX_ITEMS} rotas por lote")
+    
+    # Mesmo client_id repetido no lote conta uma vez só
+    unicas = {}
+    for route in routes:
+        unicas.setdefault(route.client_id, route)
+    routes = list(unicas.values())
+    
+    existentes = {rota.client_id: rota for rota in crud.get_rotas_by_client_ids(db, [r.client_id for r in routes])}
+    control_ids = {r.controle_utilizacao_id for r in routes} | {r.controle_utilizacao_id for r in existentes.values()}
+    controles = {c.id: c for c in crud.get_controles_by_ids(db, control_ids)}
+    
+    novas, duplicadas, rejeitadas = [], [], []
+    for route in routes:
+        existente = existentes.get(route.client_id)
+        if existente is not None:
+            controle = controles.get(existente.controle_utilizacao_id)
+            if controle is not None and controle.motorista_id == current_user.id:
+                duplicadas.append(existente)
+            else:
+                rejeitadas.append({"client_id": route.client_id, "detail": "client_id já utilizado em outra rota"})
+            continue
+        
+        controle = controles.get(route.controle_utilizacao_id)
+        if controle is None:
+            detail = "Controle de utilização não encontrado"
+        elif controle.motorista_id != current_user.id:
+            detail = "Apenas o motorista responsável pode adicionar rotas"
+        elif controle.status != "aberto":
+            detail = "Não é possível adicionar rotas a um controle finalizado ou cancelado"
+        else:
+            novas.append(route)
+            continue
+        rejeitadas.append({"client_id": route.client_id, "detail": detail})
+    
+    criadas = crud.create_rotas_bulk(db, novas) if novas else []
+    if criadas is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Parte do lote foi gravada por outra requisição ao mesmo tempo. Reenvie o lote."
+        )
+    
+    return {
+        "criadas": len(criadas),
+        "duplicadas": len(duplicadas),
+        "rotas": criadas + duplicadas,
+        "rejeitadas": rejeitadas
+    }
 
 @router.get("/controle/{control_id}", response_model=List[schemas.RotaResponse])
 def read_routes_by_control(
@@ -79,22 +181,21 @@ def update_route(
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_route = crud.get_rota(db, rota_id=route_id)
-    if db_route is None:
-        raise HTTPException(status_code=404, detail="Rota não encontrada")
-    
-    # Verificar permissões através do controle
-    db_control = crud.get_controle(db, controle_id=db_route.controle_utilizacao_id)
-    if db_control.motorista_id != current_user.id:
+    # Permissão (motorista responsável, controle em aberto) verificada no próprio UPDATE
+    try:
+        db_route = crud.update_rota(db, rota_id=route_id, rota_update=route_update, motorista_id=current_user.id)
+    except crud.ConflitoVersao:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Apenas o motorista responsável pode editar a rota"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
         )
-    
-    if db_control.status != "aberto":
-        raise HTTPException(status_code=400, detail="Não é possível editar rotas de um controle finalizado ou cancelado")
-    
-    return crud.update_rota(db, rota_id=route_id, rota_update=route_update)
+    if db_route is None:
+        raise _route_write_error(
+            db, route_id, current_user,
+            forbidden_detail="Apenas o motorista responsável pode editar a rota",
+            closed_detail="Não é possível editar rotas de um controle finalizado ou cancelado"
+        )
+    return db_route
 
 @router.delete("/{route_id}")
 def delete_route(
@@ -102,28 +203,19 @@ def delete_route(
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_route = crud.get_rota(db, rota_id=route_id)
-    if db_route is None:
-        raise HTTPException(status_code=404, detail="Rota não encontrada")
-    
-    # Verificar permissões através do controle
-    db_control = crud.get_controle(db, controle_id=db_route.controle_utilizacao_id)
-    if current_user.perfil != "admin" and db_control.motorista_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado"
-        )
-    
-    if db_control.status != "aberto" and current_user.perfil != "admin":
-        raise HTTPException(status_code=400, detail="Não é possível excluir rotas de um controle finalizado ou cancelado")
-    
-    success = crud.delete_rota(db, rota_id=route_id)
+    # Admin exclui qualquer rota; o motorista só as de seus controles em aberto
+    motorista_id = None if current_user.perfil == "admin" else current_user.id
+    success = crud.delete_rota(db, rota_id=route_id, motorista_id=motorista_id)
     if not success:
-        raise HTTPException(status_code=404, detail="Rota não encontrada")
+        raise _route_write_error(
+            db, route_id, current_user,
+            forbidden_detail="Acesso negado",
+            closed_detail="Não é possível excluir rotas de um controle finalizado ou cancelado"
+        )
     return {"message": "Rota excluída com sucesso"}
 
 @router.post("/{route_id}/geocode-saida")
-def geocode_departure(
+async def geocode_departure(
     route_id: int,
     latitude: float,
     longitude: float,
@@ -131,20 +223,11 @@ def geocode_departure(
     db: Session = Depends(get_db)
 ):
     """Obter endereço a partir das coordenadas de saída"""
-    db_route = crud.get_rota(db, rota_id=route_id)
-    if db_route is None:
-        raise HTTPException(status_code=404, detail="Rota não encontrada")
-    
-    # Verificar permissões
-    db_control = crud.get_controle(db, controle_id=db_route.controle_utilizacao_id)
-    if db_control.motorista_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado"
-        )
+    # Consultas ao banco no threadpool: não bloqueiam o event loop durante a geocodificação
+    await run_in_threadpool(_check_route_owner, db, route_id, current_user)
     
-    # Obter endereço usando Google Maps
-    address = google_maps_service.get_address_from_coordinates(latitude, longitude)
+    # Obter endereço usando o provedor de geocodificação configurado
+    address = await get_geocoder().get_address_from_coordinates(latitude, longitude)
     
     if address:
         # Atualizar rota com os dados de geolocalização
@@ -153,7 +236,7 @@ def geocode_departure(
             longitude_saida=longitude,
             logradouro_saida=address
         )
-        crud.update_rota(db, rota_id=route_id, rota_update=route_update)
+        await run_in_threadpool(crud.update_rota, db, rota_id=route_id, rota_update=route_update)
         
         return {
             "latitude": latitude,
@@ -169,7 +252,7 @@ def geocode_departure(
         }
 
 @router.post("/{route_id}/geocode-chegada")
-def geocode_arrival(
+async def geocode_arrival(
     route_id: int,
     latitude: float,
     longitude: float,
@@ -177,20 +260,11 @@ def geocode_arrival(
     db: Session = Depends(get_db)
 ):
     """Obter endereço a partir das coordenadas de chegada"""
-    db_route = crud.get_rota(db, rota_id=route_id)
-    if db_route is None:
-        raise HTTPException(status_code=404, detail="Rota não encontrada")
-    
-    # Verificar permissões
-    db_control = crud.get_controle(db, controle_id=db_route.controle_utilizacao_id)
-    if db_control.motorista_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado"
-        )
+    # Consultas ao banco no threadpool: não bloqueiam o event loop durante a geocodificação
+    await run_in_threadpool(_check_route_owner, db, route_id, current_user)
     
-    # Obter endereço usando Google Maps
-    address = google_maps_service.get_address_from_coordinates(latitude, longitude)
+    # Obter endereço usando o provedor de geocodificação configurado
+    address = await get_geocoder().get_address_from_coordinates(latitude, longitude)
     
     if address:
         # Atualizar rota com os dados de geolocalização
@@ -199,7 +273,7 @@ def geocode_arrival(
             longitude_chegada=longitude,
             logradouro_chegada=address
         )
-        crud.update_rota(db, rota_id=route_id, rota_update=route_update)
+        await run_in_threadpool(crud.update_rota, db, rota_id=route_id, rota_update=route_update)
         
         return {
             "latitude": latitude,
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from database import get_db
+import schemas
+from api.users import get_current_user
+from services.search import TIPOS, search
+
+router = APIRouter()
+
+@router.get("/", response_model=List[schemas.BuscaResultado])
+def search_all(
+    q: str = Query(..., min_length=1, description="Texto a buscar; cada palavra é tratada como prefixo"),
+    tipos: Optional[str] = Query(None, description="Tipos separados por vírgula: usuarios, veiculos, rotas (padrão: todos)"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Busca unificada em usuários, veículos e endereços das rotas, ordenada por relevância"""
+    # Motoristas não consultam dados de outros usuários
+    if current_user.perfil == "motorista":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado"
+        )
+
+    selected = [tipo.strip() for tipo in tipos.split(",") if tipo.strip()] if tipos else list(TIPOS)
+    invalid = [tipo for tipo in selected if tipo not in TIPOS]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de busca inválido: {', '.join(invalid)}. Use: {', '.join(TIPOS)}"
+        )
+    return search(db, q, tipos=selected, limit=limit)
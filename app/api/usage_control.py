@@ -1,27 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 import crud, schemas
 from api.users import get_current_user
+from projection import Projecao, ProjecaoInvalida
 from datetime import datetime
 
 router = APIRouter()
 
+def _control_write_error(db: Session, control_id: int, current_user, forbidden_detail: str, closed_detail: str, check_owner: bool = True) -> HTTPException:
+    """
+    Explica por que o UPDATE condicional do controle não afetou nenhuma linha.
+    Só é chamada no caminho de falha.
+    """
+    db_control = crud.get_controle(db, controle_id=control_id)
+    if db_control is None:
+        return HTTPException(status_code=404, detail="Controle de utilização não encontrado")
+    if check_owner and db_control.motorista_id != current_user.id:
+        return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden_detail)
+    if db_control.status != "aberto":
+        return HTTPException(status_code=400, detail=closed_detail)
+    return HTTPException(status_code=400, detail="Quilometragem final deve ser maior que a inicial")
+
+def get_projecao(
+    fields: Optional[str] = Query(None, description="Campos do controle, separados por vírgula (id vem sempre)"),
+    include: Optional[str] = Query(None, description="Relações: motorista, veiculo e/ou rotas (vazio: nenhuma; omitido: todas)"),
+    fields_motorista: Optional[str] = Query(None, alias="fields[motorista]"),
+    fields_veiculo: Optional[str] = Query(None, alias="fields[veiculo]"),
+    fields_rotas: Optional[str] = Query(None, alias="fields[rotas]")
+) -> Optional[Projecao]:
+    """Projeção pedida em ?fields= / ?include= (None: resposta completa)"""
+    try:
+        projecao = Projecao.parse(fields, include, {
+            "motorista": fields_motorista, "veiculo": fields_veiculo, "rotas": fields_rotas
+        })
+    except ProjecaoInvalida as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return None if projecao.completa else projecao
+
 @router.post("/", response_model=schemas.ControleUtilizacaoVeiculoResponse)
 def create_usage_control(
     control: schemas.ControleUtilizacaoVeiculoCreate,
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verificar se o veículo existe e está disponível
+    # Reenvio de um controle já criado pelo aplicativo (mesmo client_id): devolve o existente
+    if control.client_id:
+        existing = crud.get_controle_by_client_id(db, client_id=control.client_id)
+        if existing is not None:
+            if existing.motorista_id != current_user.id:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="client_id já utilizado em outro controle")
+            return existing
+    
+    # Verificar se o veículo existe
     vehicle = crud.get_veiculo(db, veiculo_id=control.veiculo_id)
     if not vehicle:
         raise HTTPException(status_code=404, detail="Veículo não encontrado")
     
-    if vehicle.status != "disponivel":
-        raise HTTPException(status_code=400, detail="Veículo não está disponível")
-    
     # Verificar se o motorista não tem controles em aberto
     controles_abertos = crud.get_controles_abertos(db, motorista_id=current_user.id)
     if controles_abertos:
@@ -30,28 +67,80 @@ def create_usage_control(
             detail="Você já possui um controle de utilização em aberto. Finalize-o antes de iniciar outro."
         )
     
-    return crud.create_controle(db=db, controle=control, motorista_id=current_user.id)
+    # A disponibilidade é verificada e reservada atomicamente no checkout
+    db_control = crud.create_controle(db=db, controle=control, motorista_id=current_user.id)
+    if db_control is None:
+        raise HTTPException(status_code=400, detail="Veículo não está disponível")
+    return db_control
 
-@router.get("/", response_model=List[schemas.ControleUtilizacaoVeiculoResponse])
+@router.get(
+    "/",
+    response_model=List[schemas.ControleUtilizacaoVeiculoResponse],
+    responses={200: {"description": "Com formato=normalizado: ControleUtilizacaoNormalizadoResponse"}}
+)
 def read_usage_controls(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    formato: str = Query("completo", pattern="^(completo|normalizado)$"),
+    filtros: schemas.ControleUtilizacaoFiltro = Depends(),
+    projecao: Optional[Projecao] = Depends(get_projecao),
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Motoristas só veem seus próprios controles
-    if current_user.perfil == "motorista":
-        return crud.get_controles_by_motorista(db, motorista_id=current_user.id)
+    """
+    Lista controles com filtros, busca e ordenação feitos no banco.
+    O total de registros que atendem aos filtros vai no cabeçalho X-Total-Count.
+    
+    Com ``formato=normalizado``, motoristas e veículos vêm uma vez cada, em
+    ``usuarios`` e ``veiculos`` (por id), e os controles só trazem os ids.
+    ``fields`` e ``include`` limitam os campos e as relações lidos e devolvidos
+    (ver ``projection``).
+    """
+    if filtros.ordenar.lstrip("-") not in crud.CONTROLE_ORDENACAO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Ordenação inválida. Use: {', '.join(sorted(crud.CONTROLE_ORDENACAO))} (prefixo '-' para decrescente)"
+        )
     
-    # Admin, gestor e operador veem todos
-    return crud.get_controles(db, skip=skip, limit=limit)
+    # Motoristas só veem seus próprios controles; admin, gestor e operador veem todos
+    if current_user.perfil == "motorista":
+        filtros.motorista_id = current_user.id
+    
+    controles, total = crud.search_controles(db, filtros, skip=skip, limit=limit, projecao=projecao)
+    response.headers["X-Total-Count"] = str(total)
+    headers = {"X-Total-Count": str(total)}
+    if projecao is not None and formato == "normalizado":
+        normalized = {"total": total, "controles": projecao.dump(controles, normalizado=True), "usuarios": {}, "veiculos": {}}
+        if "motorista" in projecao.relacoes:
+            normalized["usuarios"] = projecao.dump_relation(
+                "motorista", {str(controle.motorista_id): controle.motorista for controle in controles})
+        if "veiculo" in projecao.relacoes:
+            normalized["veiculos"] = projecao.dump_relation(
+                "veiculo", {str(controle.veiculo_id): controle.veiculo for controle in controles})
+        return ORJSONResponse(normalized, headers=headers)
+    if projecao is not None:
+        return ORJSONResponse(projecao.dump(controles), headers=headers)
+    if formato == "normalizado":
+        normalized = schemas.ControleUtilizacaoNormalizadoResponse(
+            total=total,
+            controles=controles,
+            usuarios={str(controle.motorista_id): controle.motorista for controle in controles},
+            veiculos={str(controle.veiculo_id): controle.veiculo for controle in controles}
+        )
+        return ORJSONResponse(normalized.model_dump(mode="json"), headers=headers)
+    return controles
 
 @router.get("/meus", response_model=List[schemas.ControleUtilizacaoVeiculoResponse])
 def read_my_usage_controls(
+    projecao: Optional[Projecao] = Depends(get_projecao),
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    return crud.get_controles_by_motorista(db, motorista_id=current_user.id)
+    controles = crud.get_controles_by_motorista(db, motorista_id=current_user.id, projecao=projecao)
+    if projecao is not None:
+        return ORJSONResponse(projecao.dump(controles))
+    return controles
 
 @router.get("/abertos", response_model=List[schemas.ControleUtilizacaoVeiculoResponse])
 def read_open_usage_controls(
@@ -92,27 +181,10 @@ def finalize_usage_control(
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_control = crud.get_controle(db, controle_id=control_id)
-    if db_control is None:
-        raise HTTPException(status_code=404, detail="Controle de utilização não encontrado")
-    
-    # Apenas o próprio motorista pode finalizar seu controle
-    if db_control.motorista_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Apenas o motorista responsável pode finalizar o controle"
-        )
-    
-    if db_control.status != "aberto":
-        raise HTTPException(status_code=400, detail="Controle já foi finalizado ou cancelado")
-    
     # Validar dados de finalização
     if not finalization_data.km_final:
         raise HTTPException(status_code=400, detail="Quilometragem final é obrigatória")
     
-    if finalization_data.km_final <= db_control.km_inicial:
-        raise HTTPException(status_code=400, detail="Quilometragem final deve ser maior que a inicial")
-    
     # Adicionar data/hora de finalização se não fornecida
     if not finalization_data.data_fim:
         finalization_data.data_fim = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -120,7 +192,25 @@ def finalize_usage_control(
     # Marcar como finalizado
     finalization_data.status = "finalizado"
     
-    return crud.update_controle(db, controle_id=control_id, controle_update=finalization_data)
+    # Apenas o próprio motorista finaliza, só controles em aberto e com km_final
+    # maior que o inicial: tudo verificado no próprio UPDATE
+    try:
+        db_control = crud.update_controle(
+            db, controle_id=control_id, controle_update=finalization_data,
+            motorista_id=current_user.id, apenas_aberto=True
+        )
+    except crud.ConflitoVersao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
+        )
+    if db_control is None:
+        raise _control_write_error(
+            db, control_id, current_user,
+            forbidden_detail="Apenas o motorista responsável pode finalizar o controle",
+            closed_detail="Controle já foi finalizado ou cancelado"
+        )
+    return db_control
 
 @router.put("/{control_id}/cancelar")
 def cancel_usage_control(
@@ -128,22 +218,19 @@ def cancel_usage_control(
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_control = crud.get_controle(db, controle_id=control_id)
+    # Apenas o próprio motorista ou admin pode cancelar, e só controles em aberto
+    is_admin = current_user.perfil == "admin"
+    control_update = schemas.ControleUtilizacaoVeiculoUpdate(status="cancelado")
+    db_control = crud.update_controle(
+        db, controle_id=control_id, controle_update=control_update,
+        motorista_id=None if is_admin else current_user.id, apenas_aberto=True
+    )
     if db_control is None:
-        raise HTTPException(status_code=404, detail="Controle de utilização não encontrado")
-    
-    # Apenas o próprio motorista ou admin pode cancelar
-    if current_user.perfil != "admin" and db_control.motorista_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado"
+        raise _control_write_error(
+            db, control_id, current_user,
+            forbidden_detail="Acesso negado",
+            closed_detail="Apenas controles em aberto podem ser cancelados",
+            check_owner=not is_admin
         )
     
-    if db_control.status != "aberto":
-        raise HTTPException(status_code=400, detail="Apenas controles em aberto podem ser cancelados")
-    
-    # Cancelar controle
-    control_update = schemas.ControleUtilizacaoVeiculoUpdate(status="cancelado")
-    crud.update_controle(db, controle_id=control_id, controle_update=control_update)
-    
     return {"message": "Controle de utilização cancelado com sucesso"}
@@ -1,18 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 import crud, schemas
 from auth import verify_password, create_access_token, verify_token
+from services.bulk_import import ArquivoInvalido, import_usuarios
+from services import blob_store
+from services.images import AVATAR_SIZES, ImagemInvalida, delete_variants, variant_links
 from datetime import timedelta
 import os
-import uuid
 from pathlib import Path
 
 router = APIRouter()
 security = HTTPBearer()
 
+def _swap_avatar(db: Session, db_user, new_link: Optional[str], digest: Optional[str] = None, size_bytes: int = 0):
+    """
+    Troca o avatar e as referências na mesma transação. A versão lida do usuário
+    garante que o conjunto liberado é o que foi de fato substituído: se outra
+    requisição trocou o avatar antes, lança ConflitoVersao e o rollback desfaz a
+    referência somada. Retorna o usuário atualizado (None se não existe mais).
+    """
+    if digest is not None:
+        blob_store.acquire(db, digest, size_bytes)
+    blob_store.release(db, db_user.avatar_link)
+    try:
+        return crud.set_avatar_link(db, usuario_id=db_user.id, avatar_link=new_link, version=db_user.version)
+    except crud.ConflitoVersao:
+        if digest is not None:
+            # As miniaturas já estão no disco: ficam registradas para a coleta
+            blob_store.track(db, digest, size_bytes)
+            db.commit()
+        raise
+
 # Dependência para obter o usuário atual autenticado
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     token = credentials.credentials
@@ -83,8 +105,10 @@ def read_current_user(current_user: schemas.UsuarioResponse = Depends(get_curren
 
 @router.get("/", response_model=List[schemas.UsuarioResponse])
 def read_users(
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    perfil: Optional[str] = Query(None, description="Perfis separados por vírgula (ex.: motorista,gestor)"),
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -94,7 +118,22 @@ def read_users(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Acesso negado"
         )
-    return crud.get_usuarios(db, skip=skip, limit=limit)
+    perfis = [name.strip() for name in perfil.split(",") if name.strip()] if perfil else None
+    # Total de usuários (com o filtro) no cabeçalho, para a paginação do painel
+    response.headers["X-Total-Count"] = str(crud.count_usuarios(db, perfis=perfis))
+    return crud.get_usuarios(db, skip=skip, limit=limit, perfis=perfis)
+
+@router.post("/import", response_model=schemas.ImportacaoResponse)
+def import_users(
+    arquivo: UploadFile = File(...),
+    admin_user: schemas.UsuarioResponse = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Cadastra usuários a partir de uma planilha CSV/XLSX (colunas: matricula, nome, email, senha, celular, unidade, perfil, status)"""
+    try:
+        return import_usuarios(db, arquivo.file, arquivo.filename)
+    except ArquivoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{user_id}", response_model=schemas.UsuarioResponse)
 def read_user(
@@ -128,7 +167,13 @@ def update_user(
             detail="Acesso negado. Apenas administradores podem editar usuários."
         )
     
-    db_user = crud.update_usuario(db, usuario_id=user_id, usuario_update=user_update)
+    try:
+        db_user = crud.update_usuario(db, usuario_id=user_id, usuario_update=user_update)
+    except crud.ConflitoVersao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
+        )
     if db_user is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     return db_user
@@ -139,6 +184,9 @@ def delete_user(
     admin_user: schemas.UsuarioResponse = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
+    db_user = crud.get_usuario(db, usuario_id=user_id)
+    if db_user is not None:
+        blob_store.release(db, db_user.avatar_link)
     success = crud.delete_usuario(db, usuario_id=user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
@@ -176,7 +224,7 @@ async def upload_avatar(
     db: Session = Depends(get_db)
 ):
     # Verificar se o usuário existe
-    db_user = crud.get_usuario(db, usuario_id=user_id)
+    db_user = await run_in_threadpool(crud.get_usuario, db, usuario_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
@@ -187,58 +235,39 @@ async def upload_avatar(
             detail="Você só pode alterar seu próprio avatar"
         )
     
-    # Verificar se é uma imagem válida
-    valid_content_types = ["image/jpeg", "image/png", "image/gif", "image/bmp", "image/webp"]
-    if avatar.content_type not in valid_content_types:
+    try:
+        # Tipo conferido pelos primeiros bytes e miniaturas geradas fora do event loop, lendo o
+        # arquivo que o Starlette recebeu em partes; um arquivo já enviado antes reaproveita as miniaturas
+        digest, size_bytes = await blob_store.store_image(avatar.file, AVATAR_SIZES, crop=True)
+    except ImagemInvalida as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    # Troca o link e as referências na mesma transação; o conjunto anterior fica para a coleta
+    old_link = db_user.avatar_link
+    relative_path = blob_store.blob_links(digest, AVATAR_SIZES)[max(AVATAR_SIZES)]
+    try:
+        updated = await run_in_threadpool(_swap_avatar, db, db_user, relative_path, digest, size_bytes)
+    except crud.ConflitoVersao:
         raise HTTPException(
-            status_code=400,
-            detail="Formato de arquivo não suportado. Use: JPEG, PNG, GIF, BMP ou WebP"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
         )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    await blob_store.store_image(avatar.file, AVATAR_SIZES, crop=True, digest=digest)
     
-    # Verificar tamanho do arquivo (máximo 5MB)
-    if avatar.size > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Arquivo muito grande. Máximo 5MB")
+    # Avatares gravados antes do armazenamento por conteúdo são apagados direto
+    project_root = Path(__file__).parent.parent.parent  # Vai para a raiz do projeto (3 níveis acima)
+    await run_in_threadpool(delete_variants, project_root, old_link)
     
-    try:
-        # Criar diretório se não existir - usar caminho absoluto
-        project_root = Path(__file__).parent.parent.parent  # Vai para a raiz do projeto (3 níveis acima)
-        avatar_dir = project_root / "public" / "avatar"
-        avatar_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Deletar avatar anterior se existir
-        if db_user.avatar_link:
-            if db_user.avatar_link.startswith('public/'):
-                old_avatar_path = project_root / db_user.avatar_link
-            else:
-                old_avatar_path = Path(db_user.avatar_link)
-            if old_avatar_path.exists():
-                old_avatar_path.unlink()
-        
-        # Gerar nome único para o arquivo
-        file_extension = Path(avatar.filename).suffix
-        unique_filename = f"{user_id}_{uuid.uuid4()}{file_extension}"
-        avatar_path = avatar_dir / unique_filename
-        
-        # Salvar arquivo
-        with open(avatar_path, "wb") as buffer:
-            content = await avatar.read()
-            buffer.write(content)
-        
-        # Atualizar banco de dados - salvar caminho relativo
-        relative_path = f"public/avatar/{unique_filename}"
-        user_update = schemas.UsuarioUpdate(avatar_link=relative_path)
-        updated_user = crud.update_usuario(db, usuario_id=user_id, usuario_update=user_update)
-        
-        return {
-            "success": True,
-            "message": "Avatar atualizado com sucesso",
-            "data": {
-                "avatar_link": relative_path
-            }
+    return {
+        "success": True,
+        "message": "Avatar atualizado com sucesso",
+        "data": {
+            "avatar_link": relative_path,
+            "avatar_links": variant_links(relative_path)
         }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao fazer upload do avatar: {str(e)}")
+    }
 
 @router.delete("/{user_id}/avatar")
 async def delete_avatar(
@@ -247,7 +276,7 @@ async def delete_avatar(
     db: Session = Depends(get_db)
 ):
     # Verificar se o usuário existe
-    db_user = crud.get_usuario(db, usuario_id=user_id)
+    db_user = await run_in_threadpool(crud.get_usuario, db, usuario_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
@@ -258,20 +287,20 @@ async def delete_avatar(
             detail="Você só pode remover seu próprio avatar"
         )
     
+    # Atualizar banco de dados (as miniaturas ficam para a coleta, se ninguém mais as usa)
+    old_link = db_user.avatar_link
     try:
-        # Deletar arquivo do sistema
-        if db_user.avatar_link:
-            project_root = Path(__file__).parent.parent.parent
-            if db_user.avatar_link.startswith('public/'):
-                avatar_path = project_root / db_user.avatar_link
-            else:
-                avatar_path = Path(db_user.avatar_link)
-            if avatar_path.exists():
-                avatar_path.unlink()
-        
-        # Atualizar banco de dados
-        user_update = schemas.UsuarioUpdate(avatar_link=None)
-        crud.update_usuario(db, usuario_id=user_id, usuario_update=user_update)
+        updated = await run_in_threadpool(_swap_avatar, db, db_user, None)
+    except crud.ConflitoVersao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
+        )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    
+    try:
+        await run_in_threadpool(delete_variants, Path(__file__).parent.parent.parent, old_link)
         
         return {
             "success": True,
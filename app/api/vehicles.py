@@ -1,12 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 import crud, schemas
 from api.users import get_current_user
+from services.bulk_import import ArquivoInvalido, import_veiculos
+from services import blob_store
+from services.images import VEHICLE_IMAGE_SIZES, ImagemInvalida, delete_variants, image_dimensions, run_in_image_pool, variant_links
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent  # Raiz do projeto (onde fica "public")
 
 router = APIRouter()
 
+def _swap_cover(db: Session, db_vehicle, new_link: Optional[str], digest: Optional[str] = None, size_bytes: int = 0):
+    """
+    Troca a capa e as referências na mesma transação. A versão lida do veículo
+    garante que o conjunto liberado é o que foi de fato substituído: se outra
+    requisição trocou a capa antes, lança ConflitoVersao e o rollback desfaz a
+    referência somada. Retorna o veículo atualizado (None se não existe mais).
+    """
+    if digest is not None:
+        blob_store.acquire(db, digest, size_bytes)
+    blob_store.release(db, db_vehicle.imagem_link)
+    try:
+        return crud.set_imagem_link(db, veiculo_id=db_vehicle.id, imagem_link=new_link, version=db_vehicle.version)
+    except crud.ConflitoVersao:
+        if digest is not None:
+            # As miniaturas já estão no disco: ficam registradas para a coleta
+            blob_store.track(db, digest, size_bytes)
+            db.commit()
+        raise
+
 @router.post("/", response_model=schemas.VeiculoResponse)
 def create_vehicle(
     vehicle: schemas.VeiculoCreate,
@@ -27,13 +53,34 @@ def create_vehicle(
     
     return crud.create_veiculo(db=db, veiculo=vehicle)
 
+@router.post("/import", response_model=schemas.ImportacaoResponse)
+def import_vehicles(
+    arquivo: UploadFile = File(...),
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cadastra veículos a partir de uma planilha CSV/XLSX (colunas: marca, modelo, placa, ano, motor, tipo, status)"""
+    if current_user.perfil != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem criar veículos."
+        )
+    
+    try:
+        return import_veiculos(db, arquivo.file, arquivo.filename)
+    except ArquivoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/", response_model=List[schemas.VeiculoResponse])
 def read_vehicles(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     current_user: schemas.UsuarioResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    # Total de veículos no cabeçalho, para a paginação do painel
+    response.headers["X-Total-Count"] = str(crud.count_veiculos(db))
     return crud.get_veiculos(db, skip=skip, limit=limit)
 
 @router.get("/disponiveis", response_model=List[schemas.VeiculoResponse])
@@ -68,7 +115,13 @@ def update_vehicle(
             detail="Acesso negado. Apenas administradores podem editar veículos."
         )
     
-    db_vehicle = crud.update_veiculo(db, veiculo_id=vehicle_id, veiculo_update=vehicle_update)
+    try:
+        db_vehicle = crud.update_veiculo(db, veiculo_id=vehicle_id, veiculo_update=vehicle_update)
+    except crud.ConflitoVersao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
+        )
     if db_vehicle is None:
         raise HTTPException(status_code=404, detail="Veículo não encontrado")
     return db_vehicle
@@ -86,7 +139,204 @@ def delete_vehicle(
             detail="Acesso negado. Apenas administradores podem excluir veículos."
         )
     
+    db_vehicle = crud.get_veiculo(db, veiculo_id=vehicle_id)
+    imagem_link = db_vehicle.imagem_link if db_vehicle else None
+    blob_store.release(db, imagem_link)
+    for foto in crud.get_fotos_veiculo(db, veiculo_id=vehicle_id):
+        blob_store.release(db, foto.imagem_link)
     success = crud.delete_veiculo(db, veiculo_id=vehicle_id)
     if not success:
         raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    delete_variants(project_root, imagem_link, VEHICLE_IMAGE_SIZES)
     return {"message": "Veículo excluído com sucesso"}
+
+@router.post("/{vehicle_id}/imagem")
+async def upload_vehicle_image(
+    vehicle_id: int,
+    imagem: UploadFile = File(...),
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Envia a foto do veículo; são gravadas versões reduzidas em WebP (o original é descartado)"""
+    if current_user.perfil != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem editar veículos."
+        )
+    
+    db_vehicle = await run_in_threadpool(crud.get_veiculo, db, veiculo_id=vehicle_id)
+    if db_vehicle is None:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    
+    try:
+        # Mesmo processamento dos avatares: tipo pelos primeiros bytes, conversão fora do event loop
+        digest, size_bytes = await blob_store.store_image(imagem.file, VEHICLE_IMAGE_SIZES, crop=False)
+    except ImagemInvalida as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    # Troca o link e as referências na mesma transação; o conjunto anterior fica para a coleta
+    old_link = db_vehicle.imagem_link
+    relative_path = blob_store.blob_links(digest, VEHICLE_IMAGE_SIZES)[max(VEHICLE_IMAGE_SIZES)]
+    try:
+        updated = await run_in_threadpool(_swap_cover, db, db_vehicle, relative_path, digest, size_bytes)
+    except crud.ConflitoVersao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
+        )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    await blob_store.store_image(imagem.file, VEHICLE_IMAGE_SIZES, crop=False, digest=digest)
+    await run_in_threadpool(delete_variants, project_root, old_link, VEHICLE_IMAGE_SIZES)
+    return {
+        "success": True,
+        "message": "Imagem do veículo atualizada com sucesso",
+        "data": {
+            "imagem_link": relative_path,
+            "imagem_links": variant_links(relative_path, VEHICLE_IMAGE_SIZES)
+        }
+    }
+
+@router.delete("/{vehicle_id}/imagem")
+async def delete_vehicle_image(
+    vehicle_id: int,
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if current_user.perfil != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem editar veículos."
+        )
+    
+    db_vehicle = await run_in_threadpool(crud.get_veiculo, db, veiculo_id=vehicle_id)
+    if db_vehicle is None:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    
+    old_link = db_vehicle.imagem_link
+    try:
+        updated = await run_in_threadpool(_swap_cover, db, db_vehicle, None)
+    except crud.ConflitoVersao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
+        )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    await run_in_threadpool(delete_variants, project_root, old_link, VEHICLE_IMAGE_SIZES)
+    return {"success": True, "message": "Imagem do veículo removida com sucesso"}
+
+# Galeria: várias fotos por veículo, com dimensões e tamanho gravados junto. A listagem de
+# veículos traz só a capa (imagem_link); as fotos são buscadas ao abrir os detalhes.
+@router.get("/{vehicle_id}/fotos", response_model=List[schemas.FotoVeiculoResponse])
+def list_vehicle_photos(
+    vehicle_id: int,
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if crud.get_veiculo(db, veiculo_id=vehicle_id) is None:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    return crud.get_fotos_veiculo(db, veiculo_id=vehicle_id)
+
+@router.post("/{vehicle_id}/fotos", response_model=schemas.FotoVeiculoResponse)
+async def upload_vehicle_photo(
+    vehicle_id: int,
+    imagem: UploadFile = File(...),
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Acrescenta uma foto à galeria; a primeira foto de um veículo sem imagem vira a capa"""
+    if current_user.perfil != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem editar veículos."
+        )
+    
+    db_vehicle = await run_in_threadpool(crud.get_veiculo, db, veiculo_id=vehicle_id)
+    if db_vehicle is None:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    
+    try:
+        digest, size_bytes = await blob_store.store_image(imagem.file, VEHICLE_IMAGE_SIZES, crop=False)
+    except ImagemInvalida as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    relative_path = blob_store.blob_links(digest, VEHICLE_IMAGE_SIZES)[max(VEHICLE_IMAGE_SIZES)]
+    largura, altura = await run_in_image_pool(image_dimensions, project_root / relative_path)
+    
+    def save_photo():
+        # Referência, foto e capa sem nenhum await no meio: a transação de escrita do SQLite
+        # (aberta pelo acquire) não fica presa enquanto outras requisições rodam no event loop
+        blob_store.acquire(db, digest, size_bytes)
+        db_foto = crud.create_foto_veiculo(
+            db, veiculo_id=vehicle_id, imagem_link=relative_path, largura=largura, altura=altura,
+            bytes=size_bytes, nome_arquivo=imagem.filename
+        )
+        if not db_vehicle.imagem_link:
+            # A capa é mais uma referência ao mesmo conjunto
+            try:
+                _swap_cover(db, db_vehicle, relative_path, digest, size_bytes)
+            except crud.ConflitoVersao:
+                pass  # Outra requisição alterou o veículo (em geral, outra foto virou a capa)
+        return db_foto
+    
+    db_foto = await run_in_threadpool(save_photo)
+    # Com a referência gravada, refaz as miniaturas que a coleta possa ter apagado no meio tempo
+    await blob_store.store_image(imagem.file, VEHICLE_IMAGE_SIZES, crop=False, digest=digest)
+    return db_foto
+
+@router.put("/{vehicle_id}/fotos/{foto_id}/capa", response_model=schemas.VeiculoResponse)
+def set_vehicle_cover_photo(
+    vehicle_id: int,
+    foto_id: int,
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Usa uma foto da galeria como capa do veículo (a imagem mostrada na tabela)"""
+    if current_user.perfil != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem editar veículos."
+        )
+    
+    db_vehicle = crud.get_veiculo(db, veiculo_id=vehicle_id)
+    db_foto = crud.get_foto_veiculo(db, veiculo_id=vehicle_id, foto_id=foto_id)
+    if db_vehicle is None or db_foto is None:
+        raise HTTPException(status_code=404, detail="Foto não encontrada")
+    
+    old_link = db_vehicle.imagem_link
+    if old_link == db_foto.imagem_link:
+        return db_vehicle
+    try:
+        db_vehicle = _swap_cover(db, db_vehicle, db_foto.imagem_link, blob_store.blob_hash(db_foto.imagem_link), db_foto.bytes)
+    except crud.ConflitoVersao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Registro alterado por outro usuário. Recarregue e tente novamente."
+        )
+    if db_vehicle is None:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    delete_variants(project_root, old_link, VEHICLE_IMAGE_SIZES)
+    return db_vehicle
+
+@router.delete("/{vehicle_id}/fotos/{foto_id}")
+def delete_vehicle_photo(
+    vehicle_id: int,
+    foto_id: int,
+    current_user: schemas.UsuarioResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Remove a foto da galeria (a capa continua, se era a mesma imagem)"""
+    if current_user.perfil != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem editar veículos."
+        )
+    
+    db_foto = crud.get_foto_veiculo(db, veiculo_id=vehicle_id, foto_id=foto_id)
+    if db_foto is None:
+        raise HTTPException(status_code=404, detail="Foto não encontrada")
+    
+    blob_store.release(db, db_foto.imagem_link)
+    crud.delete_foto_veiculo(db, db_foto)
+    return {"success": True, "message": "Foto removida com sucesso"}
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 import os
 from dotenv import load_dotenv
+from metrics import BCRYPT_IN_PROGRESS, BCRYPT_SECONDS
 
 load_dotenv()
 
@@ -15,11 +16,13 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha em texto plano corresponde ao hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    with BCRYPT_IN_PROGRESS.labels("verify").track_inprogress(), BCRYPT_SECONDS.labels("verify").time():
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Gera o hash da senha"""
-    return pwd_context.hash(password)
+    with BCRYPT_IN_PROGRESS.labels("hash").track_inprogress(), BCRYPT_SECONDS.labels("hash").time():
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Cria um token JWT"""
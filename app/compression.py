@@ -0,0 +1,154 @@
+"""
+Compressão das respostas da API (brotli ou gzip, conforme o ``Accept-Encoding``).
+
+As listagens (controles com motorista, veículo e rotas) são JSON repetitivo e
+encolhem bastante comprimidas. O ``GZipMiddleware`` do Starlette só conhece
+gzip e usa nível 9 (lento para pouco ganho); este middleware:
+
+- escolhe brotli quando o cliente aceita e o pacote ``brotli`` está instalado
+  (opcional: sem ele, só gzip), senão gzip
+- usa níveis rápidos (``SGUV_GZIP_LEVEL``, ``SGUV_BROTLI_QUALITY``)
+- não comprime respostas pequenas (``SGUV_COMPRESS_MIN_BYTES``), imagens (já
+  comprimidas) nem respostas que já têm ``Content-Encoding``
+- comprime respostas em partes (streaming) à medida que são enviadas
+"""
+import os
+import zlib
+from typing import Optional
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+COMPRESS_MIN_BYTES = int(os.getenv("SGUV_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("SGUV_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("SGUV_BROTLI_QUALITY", "4"))
+
+# Tipos que não ganham nada com compressão
+_INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        # wbits=31: formato gzip (cabeçalho e CRC), não zlib puro
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Z_SYNC_FLUSH entre partes: o cliente recebe o que já foi comprimido
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Codificação a usar para um ``Accept-Encoding`` ("br", "gzip" ou None)"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """Middleware ASGI que comprime as respostas (ver docstring do módulo)"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def compressed_send(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Segura o início até saber se a resposta vai ser comprimida
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or content_type.startswith(_INCOMPRESSIBLE_PREFIXES)
+                )
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    # Pequena demais: vai como está
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                encoder = _BrotliEncoder() if encoding == "br" else _GzipEncoder()
+                headers["Content-Encoding"] = encoder.name
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    chunk = encoder.compress(body) + encoder.flush()
+                else:
+                    chunk = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(chunk))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            chunk = encoder.compress(body) + (encoder.flush() if more_body else encoder.finish())
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, compressed_send)
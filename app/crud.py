@@ -1,12 +1,57 @@
-from sqlalchemy.orm import Session
-from models import Usuario, Veiculo, ControleUtilizacaoVeiculo, Rota
+from sqlalchemy import delete, exists, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, load_only, selectinload
+from models import Usuario, Veiculo, FotoVeiculo, ControleUtilizacaoVeiculo, Rota, InconsistenciaOdometro
 from schemas import (
     UsuarioCreate, UsuarioUpdate, VeiculoCreate, VeiculoUpdate,
     ControleUtilizacaoVeiculoCreate, ControleUtilizacaoVeiculoUpdate,
-    RotaCreate, RotaUpdate
+    RotaCreate, RotaUpdate, ControleUtilizacaoFiltro
 )
 from auth import get_password_hash
-from typing import List, Optional
+from projection import Projecao
+from services.route_metrics import INPUT_FIELDS as ROTA_METRIC_INPUTS, apply_route_metrics, metrics_rows
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import os
+import random
+import time
+
+# Tentativas do checkout quando o banco está ocupado (ex.: SQLite "database is locked")
+CHECKOUT_MAX_RETRIES = int(os.getenv("CHECKOUT_MAX_RETRIES", "5"))
+CHECKOUT_RETRY_BACKOFF = float(os.getenv("CHECKOUT_RETRY_BACKOFF", "0.05"))
+
+class ConflitoVersao(Exception):
+    """O registro foi alterado por outra requisição depois que o cliente o leu"""
+
+def _update_returning(db: Session, model, obj_id: int, update_data: dict, *criteria):
+    """
+    Atualiza o registro com um único UPDATE ... RETURNING, incrementando a versão.
+    
+    ``criteria`` são condições extras (permissão, status) verificadas no próprio
+    WHERE. Se update_data trouxer "version", a escrita só acontece se a versão no
+    banco ainda for a mesma (controle de concorrência otimista); caso contrário
+    lança ConflitoVersao. Retorna o objeto atualizado ou None se nenhuma linha
+    atender às condições.
+    """
+    expected_version = update_data.pop("version", None)
+    stmt = update(model).where(model.id == obj_id, *criteria)
+    if expected_version is not None:
+        stmt = stmt.where(model.version == expected_version)
+    stmt = (
+        stmt.values(**update_data, version=model.version + 1)
+        .returning(model)
+        # "fetch" usa o próprio RETURNING para atualizar objetos já carregados na sessão
+        .execution_options(synchronize_session="fetch")
+    )
+    db_obj = db.execute(stmt).scalar_one_or_none()
+    
+    if db_obj is None and expected_version is not None:
+        # Só no caminho de falha: diferenciar "não existe" de "versão desatualizada"
+        encontrado = db.query(model.id).filter(model.id == obj_id, *criteria).first() is not None
+        db.rollback()
+        if encontrado:
+            raise ConflitoVersao()
+    return db_obj
 
 # CRUD para Usuario
 def get_usuario(db: Session, usuario_id: int) -> Optional[Usuario]:
@@ -18,8 +63,18 @@ def get_usuario_by_email(db: Session, email: str) -> Optional[Usuario]:
 def get_usuario_by_matricula(db: Session, matricula: str) -> Optional[Usuario]:
     return db.query(Usuario).filter(Usuario.matricula == matricula).first()
 
-def get_usuarios(db: Session, skip: int = 0, limit: int = 100) -> List[Usuario]:
-    return db.query(Usuario).offset(skip).limit(limit).all()
+def _usuarios_query(perfis: Optional[List[str]] = None):
+    query = select(Usuario)
+    if perfis:
+        query = query.where(Usuario.perfil.in_(perfis))
+    return query
+
+def get_usuarios(db: Session, skip: int = 0, limit: int = 100, perfis: Optional[List[str]] = None) -> List[Usuario]:
+    # Ordem estável para que as páginas não repitam nem pulem registros
+    return db.scalars(_usuarios_query(perfis).order_by(Usuario.id).offset(skip).limit(limit)).all()
+
+def count_usuarios(db: Session, perfis: Optional[List[str]] = None) -> int:
+    return db.scalar(select(func.count()).select_from(_usuarios_query(perfis).subquery()))
 
 def create_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
     hashed_password = get_password_hash(usuario.senha)
@@ -29,7 +84,6 @@ def create_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
         email=usuario.email,
         celular=usuario.celular,
         unidade=usuario.unidade,
-        avatar_link=usuario.avatar_link,
         status=usuario.status,
         perfil=usuario.perfil,
         senha_hash=hashed_password
@@ -40,13 +94,14 @@ def create_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
     return db_usuario
 
 def update_usuario(db: Session, usuario_id: int, usuario_update: UsuarioUpdate) -> Optional[Usuario]:
-    db_usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
-    if db_usuario:
-        update_data = usuario_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_usuario, field, value)
-        db.commit()
-        db.refresh(db_usuario)
+    db_usuario = _update_returning(db, Usuario, usuario_id, usuario_update.dict(exclude_unset=True))
+    db.commit()
+    return db_usuario
+
+def set_avatar_link(db: Session, usuario_id: int, avatar_link: Optional[str], version: int) -> Optional[Usuario]:
+    """Troca o avatar se a versão ainda for ``version`` (ConflitoVersao se não); as referências ficam com quem chama"""
+    db_usuario = _update_returning(db, Usuario, usuario_id, {"avatar_link": avatar_link, "version": version})
+    db.commit()
     return db_usuario
 
 def delete_usuario(db: Session, usuario_id: int) -> bool:
@@ -65,36 +120,64 @@ def get_veiculo_by_placa(db: Session, placa: str) -> Optional[Veiculo]:
     return db.query(Veiculo).filter(Veiculo.placa == placa).first()
 
 def get_veiculos(db: Session, skip: int = 0, limit: int = 100) -> List[Veiculo]:
-    return db.query(Veiculo).offset(skip).limit(limit).all()
+    return db.query(Veiculo).order_by(Veiculo.id).offset(skip).limit(limit).all()
+
+def count_veiculos(db: Session) -> int:
+    return db.scalar(select(func.count()).select_from(Veiculo))
 
 def get_veiculos_disponiveis(db: Session) -> List[Veiculo]:
     return db.query(Veiculo).filter(Veiculo.status == "disponivel").all()
 
 def create_veiculo(db: Session, veiculo: VeiculoCreate) -> Veiculo:
-    db_veiculo = Veiculo(**veiculo.dict())
+    # A capa só entra pelos endpoints de imagem (que contam as referências em imagens_blob)
+    db_veiculo = Veiculo(**veiculo.dict(exclude={"imagem_link"}))
     db.add(db_veiculo)
     db.commit()
     db.refresh(db_veiculo)
     return db_veiculo
 
 def update_veiculo(db: Session, veiculo_id: int, veiculo_update: VeiculoUpdate) -> Optional[Veiculo]:
-    db_veiculo = db.query(Veiculo).filter(Veiculo.id == veiculo_id).first()
-    if db_veiculo:
-        update_data = veiculo_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_veiculo, field, value)
-        db.commit()
-        db.refresh(db_veiculo)
+    db_veiculo = _update_returning(db, Veiculo, veiculo_id, veiculo_update.dict(exclude_unset=True))
+    db.commit()
+    return db_veiculo
+
+def set_imagem_link(db: Session, veiculo_id: int, imagem_link: Optional[str], version: int) -> Optional[Veiculo]:
+    """Troca a capa se a versão ainda for ``version`` (ConflitoVersao se não); as referências ficam com quem chama"""
+    db_veiculo = _update_returning(db, Veiculo, veiculo_id, {"imagem_link": imagem_link, "version": version})
+    db.commit()
     return db_veiculo
 
 def delete_veiculo(db: Session, veiculo_id: int) -> bool:
     db_veiculo = db.query(Veiculo).filter(Veiculo.id == veiculo_id).first()
     if db_veiculo:
+        db.execute(delete(FotoVeiculo).where(FotoVeiculo.veiculo_id == veiculo_id))
         db.delete(db_veiculo)
         db.commit()
         return True
     return False
 
+# Galeria de fotos do veículo
+def get_fotos_veiculo(db: Session, veiculo_id: int) -> List[FotoVeiculo]:
+    return db.query(FotoVeiculo).filter(FotoVeiculo.veiculo_id == veiculo_id).order_by(FotoVeiculo.id).all()
+
+def get_foto_veiculo(db: Session, veiculo_id: int, foto_id: int) -> Optional[FotoVeiculo]:
+    return db.query(FotoVeiculo).filter(FotoVeiculo.id == foto_id, FotoVeiculo.veiculo_id == veiculo_id).first()
+
+def create_foto_veiculo(db: Session, veiculo_id: int, imagem_link: str, largura: int, altura: int,
+                        bytes: int, nome_arquivo: Optional[str] = None) -> FotoVeiculo:
+    db_foto = FotoVeiculo(
+        veiculo_id=veiculo_id, imagem_link=imagem_link, largura=largura, altura=altura, bytes=bytes,
+        nome_arquivo=nome_arquivo, criado_em=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
+    db.add(db_foto)
+    db.commit()
+    db.refresh(db_foto)
+    return db_foto
+
+def delete_foto_veiculo(db: Session, db_foto: FotoVeiculo):
+    db.delete(db_foto)
+    db.commit()
+
 # CRUD para ControleUtilizacaoVeiculo
 def get_controle(db: Session, controle_id: int) -> Optional[ControleUtilizacaoVeiculo]:
     return db.query(ControleUtilizacaoVeiculo).filter(ControleUtilizacaoVeiculo.id == controle_id).first()
@@ -102,8 +185,107 @@ def get_controle(db: Session, controle_id: int) -> Optional[ControleUtilizacaoVe
 def get_controles(db: Session, skip: int = 0, limit: int = 100) -> List[ControleUtilizacaoVeiculo]:
     return db.query(ControleUtilizacaoVeiculo).offset(skip).limit(limit).all()
 
-def get_controles_by_motorista(db: Session, motorista_id: int) -> List[ControleUtilizacaoVeiculo]:
-    return db.query(ControleUtilizacaoVeiculo).filter(ControleUtilizacaoVeiculo.motorista_id == motorista_id).all()
+# Campos aceitos em ControleUtilizacaoFiltro.ordenar
+CONTROLE_ORDENACAO = {
+    "id": ControleUtilizacaoVeiculo.id,
+    "data_inicio": ControleUtilizacaoVeiculo.data_inicio,
+    "data_fim": ControleUtilizacaoVeiculo.data_fim,
+    "km_inicial": ControleUtilizacaoVeiculo.km_inicial,
+    "km_final": ControleUtilizacaoVeiculo.km_final,
+    "status": ControleUtilizacaoVeiculo.status,
+    "motorista": Usuario.nome,
+    "veiculo": Veiculo.placa,
+}
+
+def _controle_filtros(filtros: ControleUtilizacaoFiltro) -> list:
+    """
+    Condições do WHERE da listagem. Filtros sobre motorista/veículo viram
+    ``motorista_id IN (SELECT ...)``/``veiculo_id IN (SELECT ...)``: as tabelas de
+    usuários e veículos são pequenas e a busca nos controles usa os índices compostos.
+    """
+    C = ControleUtilizacaoVeiculo
+    criteria = []
+    if filtros.status:
+        criteria.append(C.status == filtros.status)
+    if filtros.motorista_id is not None:
+        criteria.append(C.motorista_id == filtros.motorista_id)
+    if filtros.veiculo_id is not None:
+        criteria.append(C.veiculo_id == filtros.veiculo_id)
+    if filtros.unidade:
+        criteria.append(C.motorista_id.in_(select(Usuario.id).where(Usuario.unidade == filtros.unidade)))
+    # Datas gravadas como texto "YYYY-MM-DD HH:MM:SS": a comparação de strings respeita a ordem
+    if filtros.data_de:
+        criteria.append(C.data_inicio >= filtros.data_de.isoformat())
+    if filtros.data_ate:
+        criteria.append(C.data_inicio < (filtros.data_ate + timedelta(days=1)).isoformat())
+    if filtros.finalizado_em:
+        criteria.append(C.data_fim >= filtros.finalizado_em.isoformat())
+        criteria.append(C.data_fim < (filtros.finalizado_em + timedelta(days=1)).isoformat())
+    for term in (filtros.busca or "").split():
+        pattern = f"%{term}%"
+        criteria.append(or_(
+            C.motorista_id.in_(select(Usuario.id).where(or_(Usuario.nome.ilike(pattern), Usuario.matricula.ilike(pattern)))),
+            C.veiculo_id.in_(select(Veiculo.id).where(or_(
+                Veiculo.placa.ilike(pattern), Veiculo.marca.ilike(pattern), Veiculo.modelo.ilike(pattern)
+            ))),
+        ))
+    return criteria
+
+# Modelo de cada relação do controle, para as projeções (?fields= / ?include=)
+_RELACOES_CONTROLE = {"motorista": Usuario, "veiculo": Veiculo, "rotas": Rota}
+
+def controle_options(projecao: Optional[Projecao] = None) -> list:
+    """
+    Opções de carregamento de uma listagem de controles: só as colunas e as
+    relações da projeção, cada relação em um SELECT ... IN (sem projeção: tudo).
+    """
+    C = ControleUtilizacaoVeiculo
+    projecao = projecao or Projecao()
+    options = []
+    columns = projecao.columns()
+    if columns is not None:
+        options.append(load_only(*(getattr(C, name) for name in columns)))
+    for name in projecao.relacoes:
+        loader = selectinload(getattr(C, name))
+        columns = projecao.relation_columns(name)
+        if columns is not None:
+            model = _RELACOES_CONTROLE[name]
+            loader = loader.load_only(*(getattr(model, column) for column in columns))
+        options.append(loader)
+    return options
+
+def search_controles(db: Session, filtros: ControleUtilizacaoFiltro, skip: int = 0, limit: int = 100,
+                     projecao: Optional[Projecao] = None) -> Tuple[List[ControleUtilizacaoVeiculo], int]:
+    """Uma página de controles filtrados e ordenados, mais o total de registros que atendem aos filtros"""
+    C = ControleUtilizacaoVeiculo
+    criteria = _controle_filtros(filtros)
+    total = db.scalar(select(func.count()).select_from(C).where(*criteria))
+    
+    campo = filtros.ordenar.lstrip("-")
+    column = CONTROLE_ORDENACAO[campo]
+    descending = filtros.ordenar.startswith("-")
+    stmt = select(C).where(*criteria)
+    if campo == "motorista":
+        stmt = stmt.join(Usuario, Usuario.id == C.motorista_id)
+    elif campo == "veiculo":
+        stmt = stmt.join(Veiculo, Veiculo.id == C.veiculo_id)
+    # id desempata a ordenação para a paginação ser estável
+    stmt = stmt.order_by(column.desc() if descending else column.asc(), C.id.desc() if descending else C.id.asc())
+    
+    # Motorista, veículo e rotas da página em três SELECT ... IN, em vez de um por controle
+    stmt = stmt.options(*controle_options(projecao))
+    return db.scalars(stmt.offset(skip).limit(limit)).all(), total
+
+def get_controle_by_client_id(db: Session, client_id: str) -> Optional[ControleUtilizacaoVeiculo]:
+    return db.query(ControleUtilizacaoVeiculo).filter(ControleUtilizacaoVeiculo.client_id == client_id).first()
+
+def get_controles_by_ids(db: Session, controle_ids) -> List[ControleUtilizacaoVeiculo]:
+    return db.query(ControleUtilizacaoVeiculo).filter(ControleUtilizacaoVeiculo.id.in_(list(controle_ids))).all()
+
+def get_controles_by_motorista(db: Session, motorista_id: int, projecao: Optional[Projecao] = None) -> List[ControleUtilizacaoVeiculo]:
+    return db.query(ControleUtilizacaoVeiculo).filter(
+        ControleUtilizacaoVeiculo.motorista_id == motorista_id
+    ).options(*controle_options(projecao)).all()
 
 def get_controles_abertos(db: Session, motorista_id: int) -> List[ControleUtilizacaoVeiculo]:
     return db.query(ControleUtilizacaoVeiculo).filter(
@@ -111,37 +293,77 @@ def get_controles_abertos(db: Session, motorista_id: int) -> List[ControleUtiliz
         ControleUtilizacaoVeiculo.status == "aberto"
     ).all()
 
-def create_controle(db: Session, controle: ControleUtilizacaoVeiculoCreate, motorista_id: int) -> ControleUtilizacaoVeiculo:
-    db_controle = ControleUtilizacaoVeiculo(
-        motorista_id=motorista_id,
-        **controle.dict()
+def create_controle(db: Session, controle: ControleUtilizacaoVeiculoCreate, motorista_id: int) -> Optional[ControleUtilizacaoVeiculo]:
+    """
+    Faz o checkout do veículo e cria o controle na mesma transação.
+    
+    A reserva é um UPDATE condicional (compare-and-set no status): entre
+    requisições concorrentes para o mesmo veículo, só uma consegue trocar
+    "disponivel" por "em_uso". Retorna None se o veículo não estiver disponível.
+    """
+    for tentativa in range(CHECKOUT_MAX_RETRIES):
+        try:
+            reserva = db.execute(
+                update(Veiculo)
+                .where(Veiculo.id == controle.veiculo_id, Veiculo.status == "disponivel")
+                .values(status="em_uso", version=Veiculo.version + 1)
+                .execution_options(synchronize_session="evaluate")
+            )
+            if reserva.rowcount != 1:
+                db.rollback()
+                return None
+            
+            db_controle = ControleUtilizacaoVeiculo(
+                motorista_id=motorista_id,
+                **controle.dict()
+            )
+            db.add(db_controle)
+            db.commit()
+            db.refresh(db_controle)
+            return db_controle
+        except OperationalError:
+            # Banco ocupado por outra escrita: desfaz e tenta de novo com espera exponencial
+            db.rollback()
+            if tentativa == CHECKOUT_MAX_RETRIES - 1:
+                raise
+            time.sleep(CHECKOUT_RETRY_BACKOFF * (2 ** tentativa) * random.uniform(0.5, 1.5))
+
+def update_controle(
+    db: Session,
+    controle_id: int,
+    controle_update: ControleUtilizacaoVeiculoUpdate,
+    motorista_id: Optional[int] = None,
+    apenas_aberto: bool = False
+) -> Optional[ControleUtilizacaoVeiculo]:
+    """
+    Atualiza o controle em um único UPDATE condicional.
+    
+    Com ``motorista_id`` só altera controles desse motorista; com ``apenas_aberto``
+    só altera controles em aberto; um ``km_final`` informado precisa ser maior que
+    o ``km_inicial`` gravado. Retorna None se alguma condição não for atendida.
+    """
+    criteria = []
+    if motorista_id is not None:
+        criteria.append(ControleUtilizacaoVeiculo.motorista_id == motorista_id)
+    if apenas_aberto:
+        criteria.append(ControleUtilizacaoVeiculo.status == "aberto")
+    if controle_update.km_final is not None:
+        criteria.append(ControleUtilizacaoVeiculo.km_inicial < controle_update.km_final)
+    
+    db_controle = _update_returning(
+        db, ControleUtilizacaoVeiculo, controle_id, controle_update.dict(exclude_unset=True), *criteria
     )
-    db.add(db_controle)
     
-    # Atualizar status do veículo para "em_uso"
-    veiculo = db.query(Veiculo).filter(Veiculo.id == controle.veiculo_id).first()
-    if veiculo:
-        veiculo.status = "em_uso"
+    # Se o status foi alterado para "finalizado", liberar o veículo
+    if db_controle and controle_update.status == "finalizado":
+        db.execute(
+            update(Veiculo)
+            .where(Veiculo.id == db_controle.veiculo_id)
+            .values(status="disponivel", version=Veiculo.version + 1)
+            .execution_options(synchronize_session="evaluate")
+        )
     
     db.commit()
-    db.refresh(db_controle)
-    return db_controle
-
-def update_controle(db: Session, controle_id: int, controle_update: ControleUtilizacaoVeiculoUpdate) -> Optional[ControleUtilizacaoVeiculo]:
-    db_controle = db.query(ControleUtilizacaoVeiculo).filter(ControleUtilizacaoVeiculo.id == controle_id).first()
-    if db_controle:
-        update_data = controle_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_controle, field, value)
-        
-        # Se o status foi alterado para "finalizado", liberar o veículo
-        if controle_update.status == "finalizado":
-            veiculo = db.query(Veiculo).filter(Veiculo.id == db_controle.veiculo_id).first()
-            if veiculo:
-                veiculo.status = "disponivel"
-        
-        db.commit()
-        db.refresh(db_controle)
     return db_controle
 
 # CRUD para Rota
@@ -151,27 +373,100 @@ def get_rota(db: Session, rota_id: int) -> Optional[Rota]:
 def get_rotas_by_controle(db: Session, controle_id: int) -> List[Rota]:
     return db.query(Rota).filter(Rota.controle_utilizacao_id == controle_id).all()
 
-def create_rota(db: Session, rota: RotaCreate) -> Rota:
+def get_rotas_by_client_ids(db: Session, client_ids) -> List[Rota]:
+    return db.query(Rota).filter(Rota.client_id.in_(list(client_ids))).all()
+
+def create_rota(db: Session, rota: RotaCreate) -> Optional[Rota]:
+    """
+    Cria a rota. Se o client_id já foi gravado (reenvio da mesma rota pelo
+    aplicativo), devolve a rota existente; retorna None se ele pertence a
+    uma rota de outro controle.
+    """
     db_rota = Rota(**rota.dict())
+    apply_route_metrics([db_rota])
     db.add(db_rota)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not rota.client_id:
+            raise
+        existentes = get_rotas_by_client_ids(db, [rota.client_id])
+        if existentes and existentes[0].controle_utilizacao_id == rota.controle_utilizacao_id:
+            return existentes[0]
+        return None
     db.refresh(db_rota)
     return db_rota
 
-def update_rota(db: Session, rota_id: int, rota_update: RotaUpdate) -> Optional[Rota]:
-    db_rota = db.query(Rota).filter(Rota.id == rota_id).first()
-    if db_rota:
-        update_data = rota_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_rota, field, value)
+def create_rotas_bulk(db: Session, rotas: List[RotaCreate]) -> Optional[List[Rota]]:
+    """
+    Insere um lote de rotas em uma única transação, com um INSERT em lote.
+    As métricas são calculadas para o lote inteiro de uma vez. Retorna None
+    (sem gravar nada) se algum client_id foi gravado em paralelo por outra
+    requisição; o reenvio do lote resolve.
+    """
+    rows = [rota.dict() for rota in rotas]
+    columns = {field: [row[field] for row in rows] for field in ROTA_METRIC_INPUTS}
+    for row, metrics in zip(rows, metrics_rows(columns)):
+        row.update(metrics)
+    try:
+        db_rotas = db.scalars(insert(Rota).returning(Rota), rows).all()
         db.commit()
-        db.refresh(db_rota)
+    except IntegrityError:
+        db.rollback()
+        return None
+    return db_rotas
+
+def _rota_editavel_por(motorista_id: int):
+    """Condição: a rota pertence a um controle em aberto do motorista"""
+    return exists().where(
+        ControleUtilizacaoVeiculo.id == Rota.controle_utilizacao_id,
+        ControleUtilizacaoVeiculo.motorista_id == motorista_id,
+        ControleUtilizacaoVeiculo.status == "aberto"
+    )
+
+def update_rota(db: Session, rota_id: int, rota_update: RotaUpdate, motorista_id: Optional[int] = None) -> Optional[Rota]:
+    """
+    Atualiza a rota em um único UPDATE ... RETURNING.
+    Com ``motorista_id`` só altera rotas de controles em aberto desse motorista;
+    retorna None se a rota não existir ou a condição não for atendida.
+    """
+    update_data = rota_update.dict(exclude_unset=True)
+    criteria = [_rota_editavel_por(motorista_id)] if motorista_id is not None else []
+    db_rota = _update_returning(db, Rota, rota_id, update_data, *criteria)
+    
+    # Recalcular métricas apenas se algum campo usado no cálculo mudou
+    # (a linha devolvida pelo RETURNING já tem todos os valores necessários)
+    if db_rota and any(field in update_data for field in ROTA_METRIC_INPUTS):
+        apply_route_metrics([db_rota])
+    
+    db.commit()
     return db_rota
 
-def delete_rota(db: Session, rota_id: int) -> bool:
-    db_rota = db.query(Rota).filter(Rota.id == rota_id).first()
-    if db_rota:
-        db.delete(db_rota)
-        db.commit()
-        return True
-    return False
+def delete_rota(db: Session, rota_id: int, motorista_id: Optional[int] = None) -> bool:
+    """Exclui a rota com um único DELETE ... RETURNING (mesmas condições de update_rota)"""
+    stmt = delete(Rota).where(Rota.id == rota_id)
+    if motorista_id is not None:
+        stmt = stmt.where(_rota_editavel_por(motorista_id))
+    deleted_id = db.execute(
+        stmt.returning(Rota.id).execution_options(synchronize_session="fetch")
+    ).scalar_one_or_none()
+    db.commit()
+    return deleted_id is not None
+
+# Consultas para InconsistenciaOdometro
+def get_inconsistencias_odometro(
+    db: Session,
+    veiculo_id: Optional[int] = None,
+    tipo: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[InconsistenciaOdometro]:
+    query = db.query(InconsistenciaOdometro)
+    if veiculo_id is not None:
+        query = query.filter(InconsistenciaOdometro.veiculo_id == veiculo_id)
+    if tipo:
+        query = query.filter(InconsistenciaOdometro.tipo == tipo)
+    return query.order_by(
+        InconsistenciaOdometro.veiculo_id, InconsistenciaOdometro.data
+    ).offset(skip).limit(limit).all()
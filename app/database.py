@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -11,7 +11,9 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sguv.db")
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: os objetos devolvidos por UPDATE ... RETURNING continuam
+# válidos após o commit, sem um SELECT extra para recarregá-los
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
@@ -26,4 +28,31 @@ def get_db():
 def create_tables():
     """Cria todas as tabelas no banco de dados"""
     from models import Base
+    from services.search import create_search_index
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(Base.metadata)
+    create_search_index(engine)
+
+def add_missing_columns(metadata):
+    """
+    Adiciona às tabelas existentes as colunas novas dos modelos.
+    O create_all só cria tabelas que ainda não existem; bancos criados por
+    versões anteriores recebem aqui as colunas que faltam (sempre anuláveis
+    ou com valor padrão no servidor), além dos índices que ainda não existem.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
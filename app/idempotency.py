@@ -0,0 +1,194 @@
+"""
+Suporte ao cabeçalho ``Idempotency-Key`` nas requisições de escrita.
+
+Quando o cliente envia a chave, a primeira resposta é guardada e qualquer
+repetição da mesma requisição (mesmo usuário, mesma chave) recebe a resposta
+guardada, sem executar a escrita de novo. Assim o aplicativo pode repetir um
+POST depois de um timeout sem criar controles ou rotas em dobro.
+
+- A chave vale por usuário: o mesmo valor enviado por outro usuário é outra chave
+- Reusar a chave com outro método, caminho ou corpo responde 422
+- Repetições que chegam enquanto a primeira ainda está em andamento esperam o
+  resultado dela em vez de executar em paralelo
+- Erros 5xx e respostas que pedem nova tentativa (401, 408, 409, 429) não são
+  guardados, então a repetição executa de novo
+
+As respostas ficam em memória, em um LRU limitado a ``IDEMPOTENCY_MAX_KEYS``
+chaves e expiradas após ``IDEMPOTENCY_TTL_SECONDS``. O armazenamento é por
+processo: com vários workers, a deduplicação durável continua sendo o
+``client_id`` dos controles e rotas.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from auth import verify_token
+
+load_dotenv()
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# Respostas maiores que isso não são guardadas (a repetição executa de novo)
+IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+UNCACHED_STATUS = {401, 408, 409, 429}
+
+HEADER = b"idempotency-key"
+REPLAY_HEADER = (b"idempotent-replayed", b"true")
+
+
+class CachedResponse:
+    def __init__(self, fingerprint: str, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, expires_at: float):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+
+
+class IdempotencyStore:
+    """LRU com expiração das respostas guardadas, mais as chaves em andamento"""
+
+    def __init__(self, max_keys: int = IDEMPOTENCY_MAX_KEYS, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self.in_flight: Dict[Tuple[str, str], asyncio.Event] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[str, str]) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple[str, str], fingerprint: str, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        now = time.monotonic()
+        self._entries[key] = CachedResponse(fingerprint, status, headers, body, now + self.ttl)
+        self._entries.move_to_end(key)
+        # Remove as menos usadas: primeiro as já expiradas, depois o excedente
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if len(self._entries) <= self.max_keys and oldest.expires_at > now:
+                break
+            self._entries.popitem(last=False)
+
+
+def _identity(headers: Dict[bytes, bytes]) -> str:
+    """Dono da chave: o email do token (sobrevive a um novo login) ou o próprio cabeçalho"""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization.lower().startswith("bearer "):
+        email = verify_token(authorization[7:])
+        if email:
+            return email
+    return hashlib.sha256(authorization.encode("latin-1")).hexdigest()
+
+
+async def _send_json(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Middleware ASGI que aplica o Idempotency-Key (ver docstring do módulo)"""
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store or IdempotencyStore()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        raw_key = headers.get(HEADER)
+        if not raw_key:
+            await self.app(scope, receive, send)
+            return
+        if len(raw_key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key deve ter no máximo {IDEMPOTENCY_MAX_KEY_LENGTH} caracteres")
+            return
+
+        # O corpo é lido inteiro para compor a impressão digital da requisição
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+        key = (_identity(headers), raw_key.decode("latin-1"))
+
+        while True:
+            cached = self.store.get(key)
+            if cached is not None:
+                if cached.fingerprint != fingerprint:
+                    await _send_json(send, 422, "Idempotency-Key já utilizada em outra requisição")
+                    return
+                await send({"type": "http.response.start", "status": cached.status, "headers": cached.headers + [REPLAY_HEADER]})
+                await send({"type": "http.response.body", "body": cached.body})
+                return
+            pending = self.store.in_flight.get(key)
+            if pending is None:
+                break
+            # Mesma chave em andamento: espera e usa a resposta dela (ou executa, se não foi guardada)
+            await pending.wait()
+
+        done = asyncio.Event()
+        self.store.in_flight[key] = done
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "headers": [], "body": [], "size": 0}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and response["body"] is not None:
+                chunk = message.get("body", b"")
+                response["size"] += len(chunk)
+                if response["size"] > IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    response["body"] = None
+                else:
+                    response["body"].append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            status = response["status"]
+            if response["body"] is not None and status < 500 and status not in UNCACHED_STATUS:
+                self.store.put(key, fingerprint, status, response["headers"], b"".join(response["body"]))
+        finally:
+            del self.store.in_flight[key]
+            done.set()
@@ -1,12 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from database import create_tables, get_db
-from api import users, vehicles, usage_control, routes
+from fastapi.responses import ORJSONResponse
+from database import SessionLocal, create_tables, engine, get_db
+from api import users, vehicles, usage_control, routes, audit, search
 import crud, schemas
 from auth import get_password_hash
+from services.geocoding import get_geocoder
+from idempotency import IdempotencyMiddleware
+from upload_limit import UploadLimitMiddleware
+from compression import CompressionMiddleware
+from metrics import CONTENT_TYPE_LATEST, METRICS_TOKEN, MetricsMiddleware, instrument_engine, render_metrics
+from services import blob_store
+from services.images import IMAGE_MAX_BYTES
 from sqlalchemy.orm import Session
+from typing import Optional
+import asyncio
 import os
+import secrets
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -15,12 +25,27 @@ load_dotenv()
 # Criar as tabelas do banco de dados
 create_tables()
 
+# Duração e quantidade de comandos SQL e estado do pool, para GET /metrics
+instrument_engine(engine)
+
 app = FastAPI(
     title="Sistema de Gerenciamento de Utilização de Veículos (SGUV)",
     description="API para gerenciamento de utilização de veículos com controle de rotas e usuários",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializa as listagens bem mais rápido que o json da biblioteca padrão
+    default_response_class=ORJSONResponse
 )
 
+# Repetições com o mesmo Idempotency-Key devolvem a resposta já gravada
+app.add_middleware(IdempotencyMiddleware)
+
+# Uploads de imagem maiores que o limite são recusados enquanto chegam (antes de irem para o disco);
+# a folga cobre os cabeçalhos do multipart
+app.add_middleware(UploadLimitMiddleware, limits=[
+    (r"^/api/users/\d+/avatar$", IMAGE_MAX_BYTES + 64 * 1024),
+    (r"^/api/vehicles/\d+/(imagem|fotos)$", IMAGE_MAX_BYTES + 64 * 1024),
+])
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,11 +55,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Respostas comprimidas (brotli, se instalado, ou gzip); por fora do CORS, do limite de upload e
+# da idempotência (o cache guarda e compara os corpos sem compressão) e por dentro das métricas
+app.add_middleware(CompressionMiddleware)
+
+# Latência por rota, comandos SQL por requisição e tamanho dos uploads (por fora de tudo: mede a
+# requisição inteira, inclusive a compressão)
+app.add_middleware(MetricsMiddleware)
+
 # Incluir routers
 app.include_router(users.router, prefix="/api/users", tags=["Usuários"])
 app.include_router(vehicles.router, prefix="/api/vehicles", tags=["Veículos"])
 app.include_router(usage_control.router, prefix="/api/usage-control", tags=["Controle de Utilização"])
 app.include_router(routes.router, prefix="/api/routes", tags=["Rotas"])
+app.include_router(audit.router, prefix="/api/audit", tags=["Auditoria"])
+app.include_router(search.router, prefix="/api/search", tags=["Busca"])
 
 # Servir arquivos estáticos (avatares e imagens)
 project_root = Path(__file__).parent.parent  # Vai para a raiz do projeto
@@ -42,7 +77,8 @@ public_dir = project_root / "public"
 if not public_dir.exists():
     public_dir.mkdir(parents=True)
 
-app.mount("/public", StaticFiles(directory=str(public_dir)), name="public")
+# Miniaturas em public/blobs têm o hash do conteúdo no nome: entregues como imutáveis
+app.mount("/public", blob_store.BlobStaticFiles(directory=str(public_dir)), name="public")
 
 @app.get("/")
 def read_root():
@@ -57,6 +93,13 @@ def read_root():
 def health_check():
     return {"status": "healthy", "service": "SGUV API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    """Métricas no formato do Prometheus (ver app/metrics.py)"""
+    if METRICS_TOKEN and not secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 @app.on_event("startup")
 async def startup_event():
     """Executado quando a aplicação inicia"""
@@ -89,6 +132,21 @@ async def startup_event():
         print(f"❌ Erro ao criar usuário administrador: {e}")
     finally:
         db.close()
+    
+    # Inicializar o provedor de geocodificação (carrega o gazetteer offline, se configurado)
+    geocoder = get_geocoder()
+    if not geocoder.is_available():
+        print(f"⚠️  Provedor de geocodificação '{geocoder.name}' não configurado")
+    
+    # Coleta das imagens sem referências, em segundo plano
+    app.state.blob_gc = asyncio.create_task(blob_store.run_garbage_collector(SessionLocal))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Executado quando a aplicação é encerrada"""
+    app.state.blob_gc.cancel()
+    # Fechar o pool de conexões HTTP do provedor de geocodificação
+    await get_geocoder().close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,210 @@
+"""
+Métricas da API no formato do Prometheus (``GET /metrics``).
+
+- ``sguv_http_request_duration_seconds``: latência por método, rota (o modelo
+  do caminho, ex.: ``/api/usage-control/{control_id}``) e status
+- ``sguv_db_queries_per_request`` e ``sguv_db_time_per_request_seconds``:
+  quantos comandos SQL cada requisição executou e quanto tempo passou no banco,
+  por rota; ``sguv_db_query_duration_seconds``: cada comando, por tipo
+- ``sguv_db_pool_*``: conexões do pool do SQLAlchemy em uso, livres e extras
+- ``sguv_threadpool_*``: threads do AnyIO em uso e requisições esperando uma;
+  os endpoints síncronos (login com bcrypt, por exemplo) rodam nelas
+- ``sguv_bcrypt_*``: duração e hashes em andamento ou na fila da importação
+- ``sguv_geocoding_*``: latência e resultado (encontrado ou não) de cada
+  consulta ao provedor de geocodificação
+- ``sguv_upload_bytes``: tamanho dos envios ``multipart/form-data`` por rota
+
+As contagens por requisição usam um ``ContextVar`` preenchido pelo
+``MetricsMiddleware`` e incrementado pelos eventos do engine
+(``instrument_engine``); o contexto é copiado para o threadpool, então
+endpoints síncronos também são contados. Com ``SGUV_METRICS_TOKEN`` definido, o
+endpoint exige ``Authorization: Bearer <token>``.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from anyio.to_thread import current_default_thread_limiter
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from starlette.datastructures import Headers
+from starlette.routing import Match
+
+load_dotenv()
+
+METRICS_TOKEN = os.getenv("SGUV_METRICS_TOKEN")
+
+# Rota usada para caminhos que não casam com nenhuma (não cria uma série por URL)
+UNMATCHED_ROUTE = "nao_encontrada"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "sguv_http_request_duration_seconds", "Latência das requisições HTTP",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge("sguv_http_requests_in_progress", "Requisições HTTP em andamento")
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "sguv_db_queries_per_request", "Comandos SQL executados por requisição", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "sguv_db_time_per_request_seconds", "Tempo no banco por requisição", ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_QUERY_SECONDS = Histogram(
+    "sguv_db_query_duration_seconds", "Duração de cada comando SQL", ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DB_POOL_SIZE = Gauge("sguv_db_pool_size", "Conexões mantidas pelo pool")
+DB_POOL_CHECKED_OUT = Gauge("sguv_db_pool_checked_out", "Conexões do pool em uso")
+DB_POOL_CHECKED_IN = Gauge("sguv_db_pool_checked_in", "Conexões livres no pool")
+DB_POOL_OVERFLOW = Gauge("sguv_db_pool_overflow", "Conexões abertas além do tamanho do pool")
+
+THREADPOOL_SIZE = Gauge("sguv_threadpool_size", "Threads disponíveis para endpoints síncronos")
+THREADPOOL_BUSY = Gauge("sguv_threadpool_busy", "Threads ocupadas por endpoints síncronos")
+THREADPOOL_WAITING = Gauge("sguv_threadpool_waiting", "Chamadas esperando uma thread livre")
+
+BCRYPT_SECONDS = Histogram(
+    "sguv_bcrypt_duration_seconds", "Duração de cada hash ou verificação bcrypt", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1, 2.5),
+)
+BCRYPT_IN_PROGRESS = Gauge("sguv_bcrypt_in_progress", "Hashes ou verificações bcrypt em execução", ["operation"])
+BCRYPT_QUEUED = Gauge("sguv_bcrypt_queued", "Hashes da importação de usuários aguardando uma thread")
+
+GEOCODING_SECONDS = Histogram(
+    "sguv_geocoding_duration_seconds", "Latência das consultas de geocodificação", ["provider", "operation"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+GEOCODING_REQUESTS = Counter(
+    "sguv_geocoding_requests_total", "Consultas de geocodificação por resultado (hit: endereço/coordenada encontrado)",
+    ["provider", "operation", "result"],
+)
+
+UPLOAD_BYTES = Histogram(
+    "sguv_upload_bytes", "Tamanho dos envios multipart/form-data", ["route"],
+    buckets=(16 * 1024, 64 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 2 * 1024 * 1024,
+             5 * 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024),
+)
+
+
+class _RequestDbStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_db: ContextVar[Optional[_RequestDbStats]] = ContextVar("sguv_request_db", default=None)
+
+
+def _statement_kind(statement: str) -> str:
+    kind = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return kind if kind in ("select", "insert", "update", "delete") else "other"
+
+
+def instrument_engine(engine):
+    """Registra a duração de cada comando SQL e expõe o estado do pool do engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sguv_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["sguv_query_start"].pop()
+        DB_QUERY_SECONDS.labels(_statement_kind(statement)).observe(elapsed)
+        stats = _request_db.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    # Lidos na hora da coleta; pools sem o método (ex.: StaticPool) ficam em NaN
+    def _pool_value(method: str):
+        return lambda: getattr(engine.pool, method, lambda: float("nan"))()
+
+    DB_POOL_SIZE.set_function(_pool_value("size"))
+    DB_POOL_CHECKED_OUT.set_function(_pool_value("checkedout"))
+    DB_POOL_CHECKED_IN.set_function(_pool_value("checkedin"))
+    # QueuePool.overflow() fica negativo enquanto o pool ainda não abriu todas as conexões
+    overflow = _pool_value("overflow")
+    DB_POOL_OVERFLOW.set_function(lambda: max(overflow(), 0))
+
+
+def route_name(scope) -> str:
+    """Modelo do caminho da rota que atende a requisição (ex.: ``/api/users/{user_id}``)"""
+    app = scope.get("app")
+    partial = None
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path  # Mesmo caminho, outro método (405)
+    return partial or UNMATCHED_ROUTE
+
+
+def update_threadpool_gauges():
+    """Ocupação do threadpool do AnyIO (precisa rodar no event loop)"""
+    limiter = current_default_thread_limiter()
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+    THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_WAITING.set(limiter.statistics().tasks_waiting)
+
+
+def render_metrics() -> bytes:
+    """Todas as métricas no formato de texto do Prometheus"""
+    update_threadpool_gauges()
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mede cada requisição HTTP (ver docstring do módulo)"""
+
+    def __init__(self, app, metrics_path: str = "/metrics"):
+        self.app = app
+        self.metrics_path = metrics_path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == self.metrics_path:
+            await self.app(scope, receive, send)
+            return
+
+        # Antes de chamar a aplicação: o Mount de /public altera o caminho no scope
+        route = route_name(scope)
+        stats = _RequestDbStats()
+        token = _request_db.set(stats)
+        status_code = 500
+        uploaded = 0
+        is_upload = Headers(scope=scope).get("content-type", "").startswith("multipart/form-data")
+
+        async def counting_receive():
+            nonlocal uploaded
+            message = await receive()
+            if message["type"] == "http.request":
+                uploaded += len(message.get("body", b""))
+            return message
+
+        async def status_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive if is_upload else receive, status_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            _request_db.reset(token)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status_code)).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.seconds)
+            if is_upload:
+                UPLOAD_BYTES.labels(route).observe(uploaded)
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,11 +13,12 @@ class Usuario(Base):
     nome = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False, index=True)
     celular = Column(String)
-    unidade = Column(String)
+    unidade = Column(String, index=True)
     avatar_link = Column(String)
     status = Column(String, nullable=False, default="pendente")  # pendente, ativo, inativo
     perfil = Column(String, nullable=False, default="motorista")  # admin, gestor, operador, motorista
     senha_hash = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Controle de concorrência otimista
     
     # Relacionamentos
     controles = relationship("ControleUtilizacaoVeiculo", back_populates="motorista")
@@ -34,6 +35,7 @@ class Veiculo(Base):
     tipo = Column(String)  # Carro, Moto, Caminhão
     status = Column(String, nullable=False, default="disponivel")  # disponivel, em_uso, manutencao, inativo
     imagem_link = Column(String)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relacionamentos
     controles = relationship("ControleUtilizacaoVeiculo", back_populates="veiculo")
@@ -50,17 +52,28 @@ class ControleUtilizacaoVeiculo(Base):
     data_fim = Column(String)  # YYYY-MM-DD HH:MM:SS
     assinatura_eletronica = Column(String)
     status = Column(String, nullable=False, default="aberto")  # aberto, finalizado, cancelado
+    # Identificador gerado pelo aplicativo do motorista (reenvio idempotente)
+    client_id = Column(String, unique=True, index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relacionamentos
     motorista = relationship("Usuario", back_populates="controles")
     veiculo = relationship("Veiculo", back_populates="controles")
     rotas = relationship("Rota", back_populates="controle")
+    
+    # Índices dos filtros da listagem, todos terminando na ordenação padrão (data_inicio)
+    __table_args__ = (
+        Index("ix_controles_data_inicio", "data_inicio"),
+        Index("ix_controles_status_data", "status", "data_inicio"),
+        Index("ix_controles_motorista_data", "motorista_id", "data_inicio"),
+        Index("ix_controles_veiculo_data", "veiculo_id", "data_inicio"),
+    )
 
 class Rota(Base):
     __tablename__ = "rotas"
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    controle_utilizacao_id = Column(Integer, ForeignKey("controles_utilizacao_veiculo.id"), nullable=False)
+    controle_utilizacao_id = Column(Integer, ForeignKey("controles_utilizacao_veiculo.id"), nullable=False, index=True)
     data_hora_saida = Column(String, nullable=False)  # YYYY-MM-DD HH:MM:SS
     km_saida = Column(Float, nullable=False)
     logradouro_saida = Column(String)
@@ -71,6 +84,63 @@ class Rota(Base):
     logradouro_chegada = Column(String)
     latitude_chegada = Column(Float)
     longitude_chegada = Column(Float)
+    # Identificador gerado pelo aplicativo; torna idempotente o reenvio de rotas gravadas offline
+    client_id = Column(String, unique=True, index=True)
+    
+    # Métricas derivadas (calculadas em services/route_metrics.py)
+    distancia_km = Column(Float)  # Distância em linha reta entre saída e chegada
+    km_percorrido = Column(Float)  # km_chegada - km_saida
+    duracao_minutos = Column(Float)
+    velocidade_media_kmh = Column(Float)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relacionamentos
     controle = relationship("ControleUtilizacaoVeiculo", back_populates="rotas")
+
+class InconsistenciaOdometro(Base):
+    __tablename__ = "inconsistencias_odometro"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    veiculo_id = Column(Integer, ForeignKey("veiculos.id"), nullable=False)
+    controle_id = Column(Integer, ForeignKey("controles_utilizacao_veiculo.id"), nullable=False)
+    rota_id = Column(Integer, ForeignKey("rotas.id"))
+    tipo = Column(String, nullable=False)  # lacuna_entre_controles, regressao_entre_controles, controle_regressivo, rota_regressiva, rota_sobreposta, rota_fora_do_controle
+    data = Column(String)  # data_inicio do controle ou data_hora_saida da rota
+    km_esperado = Column(Float)
+    km_encontrado = Column(Float)
+    diferenca = Column(Float)  # km_encontrado - km_esperado
+    detectado_em = Column(String, nullable=False)  # YYYY-MM-DD HH:MM:SS
+    
+    __table_args__ = (
+        Index("ix_inconsistencias_veiculo_data", "veiculo_id", "data"),
+        Index("ix_inconsistencias_tipo", "tipo"),
+    )
+
+class ImagemBlob(Base):
+    __tablename__ = "imagens_blob"
+    
+    # sha256 da imagem enviada e dos parâmetros de conversão; os arquivos são public/blobs/<2>/<hash>_<tamanho>.<formato>
+    hash = Column(String, primary_key=True)
+    referencias = Column(Integer, nullable=False, default=0, server_default="0")  # avatares e veículos que usam a imagem
+    bytes = Column(Integer, nullable=False, default=0, server_default="0")  # soma das miniaturas em disco
+    atualizado_em = Column(String, nullable=False)  # YYYY-MM-DD HH:MM:SS da última mudança de referências
+    
+    __table_args__ = (
+        Index("ix_imagens_blob_referencias", "referencias", "atualizado_em"),
+    )
+
+class FotoVeiculo(Base):
+    __tablename__ = "veiculo_fotos"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    veiculo_id = Column(Integer, ForeignKey("veiculos.id"), nullable=False)
+    imagem_link = Column(String, nullable=False)  # maior versão (public/blobs/...); as demais saem de variant_links
+    largura = Column(Integer, nullable=False)  # px da maior versão
+    altura = Column(Integer, nullable=False)
+    bytes = Column(Integer, nullable=False)  # soma das versões em disco
+    nome_arquivo = Column(String)  # nome do arquivo enviado
+    criado_em = Column(String, nullable=False)  # YYYY-MM-DD HH:MM:SS
+    
+    __table_args__ = (
+        Index("ix_veiculo_fotos_veiculo", "veiculo_id", "id"),
+    )
@@ -0,0 +1,153 @@
+"""
+Projeções das listagens de controles (``?fields=`` e ``?include=``).
+
+Telas que mostram poucos campos (o painel do motorista, por exemplo) não
+precisam do motorista, do veículo e de todas as colunas das rotas em cada
+controle:
+
+- ``fields``: campos do controle (ex.: ``fields=status,data_inicio,km_inicial``);
+  ``id`` vem sempre
+- ``include``: relações a carregar, entre ``motorista``, ``veiculo`` e ``rotas``
+  (``include=`` vazio: nenhuma); sem o parâmetro, as três
+- ``fields[motorista]``, ``fields[veiculo]`` e ``fields[rotas]``: campos de
+  cada relação incluída
+
+A mesma projeção escolhe as colunas dos SELECTs (``crud.controle_options``,
+com ``load_only``) e o modelo Pydantic da resposta, gerado só com os campos
+pedidos: um campo que não foi pedido não é lido do banco nem serializado.
+Campos calculados (``avatar_links``, ``imagem_links``) só vêm quando a relação
+é pedida sem ``fields[...]``.
+"""
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+import schemas
+
+# Relação -> schema completo
+RELACOES = {
+    "motorista": schemas.UsuarioResponse,
+    "veiculo": schemas.VeiculoResponse,
+    "rotas": schemas.RotaResponse,
+}
+# Chave estrangeira de cada relação no controle (many-to-one)
+CHAVES_RELACOES = {"motorista": "motorista_id", "veiculo": "veiculo_id"}
+CAMPOS_CONTROLE = tuple(
+    name for name in schemas.ControleUtilizacaoVeiculoResumo.model_fields if name not in RELACOES
+)
+
+
+class ProjecaoInvalida(ValueError):
+    """Campo ou relação desconhecida em ``fields``/``include``"""
+
+
+def _parse(value: str, allowed, what: str) -> FrozenSet[str]:
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+    unknown = names - set(allowed)
+    if unknown:
+        raise ProjecaoInvalida(f"{what} inválido(s): {', '.join(sorted(unknown))}. Use: {', '.join(allowed)}")
+    return names
+
+
+class Projecao:
+    """Campos do controle e relações (com seus campos) pedidos; None em qualquer nível significa "todos" """
+
+    def __init__(self, campos: Optional[FrozenSet[str]] = None,
+                 relacoes: Optional[Dict[str, Optional[FrozenSet[str]]]] = None):
+        self.campos = campos
+        self.relacoes = dict.fromkeys(RELACOES) if relacoes is None else dict(relacoes)
+
+    @classmethod
+    def parse(cls, fields: Optional[str] = None, include: Optional[str] = None,
+              relation_fields: Optional[Dict[str, Optional[str]]] = None) -> "Projecao":
+        """Projeção a partir dos parâmetros da requisição (lança ProjecaoInvalida)"""
+        relation_fields = relation_fields or {}
+        campos = None if fields is None else _parse(fields, CAMPOS_CONTROLE, "Campo(s)") | {"id"}
+        incluidas = RELACOES.keys() if include is None else _parse(include, tuple(RELACOES), "Relação(ões)")
+        relacoes = {}
+        for name, schema in RELACOES.items():
+            value = relation_fields.get(name)
+            if name not in incluidas:
+                if value is not None:
+                    raise ProjecaoInvalida(f"fields[{name}] exige '{name}' em include")
+                continue
+            relacoes[name] = None if value is None else (
+                _parse(value, tuple(schema.model_fields), f"Campo(s) de {name}") | {"id"}
+            )
+        return cls(campos, relacoes)
+
+    @property
+    def completa(self) -> bool:
+        """Sem restrição nenhuma (equivale à resposta padrão)"""
+        return (self.campos is None and self.relacoes.keys() == RELACOES.keys()
+                and all(campos is None for campos in self.relacoes.values()))
+
+    def columns(self) -> Optional[FrozenSet[str]]:
+        """Colunas do controle a ler do banco (None: todas); inclui as chaves das relações carregadas"""
+        if self.campos is None:
+            return None
+        return self.campos | {CHAVES_RELACOES[name] for name in self.relacoes if name in CHAVES_RELACOES}
+
+    def relation_columns(self, name: str) -> Optional[FrozenSet[str]]:
+        """Colunas de uma relação a ler do banco (None: todas)"""
+        campos = self.relacoes[name]
+        if campos is None or name != "rotas":
+            return campos
+        # selectinload agrupa as rotas pelo controle
+        return campos | {"controle_utilizacao_id"}
+
+    def dump(self, controles, normalizado: bool = False) -> List[Dict[str, Any]]:
+        """
+        Controles serializados só com os campos pedidos. ``normalizado``: sem
+        motorista e veículo aninhados (vão em ``dump_relation``), com as chaves
+        para encontrá-los.
+        """
+        adapter = _list_adapter(self._key(), normalizado)
+        return adapter.dump_python(adapter.validate_python(controles), mode="json")
+
+    def dump_relation(self, name: str, objects: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Objetos de uma relação (por id) serializados com os campos pedidos"""
+        adapter = _dict_adapter(name, self.relacoes[name])
+        return adapter.dump_python(adapter.validate_python(objects), mode="json")
+
+    def _key(self) -> Tuple:
+        # Hashable para o cache dos modelos gerados
+        return self.campos, tuple((name, self.relacoes[name]) for name in RELACOES if name in self.relacoes)
+
+
+# Caches limitados: as combinações de campos vêm do cliente (fields[rotas] sozinho tem 2^17)
+@lru_cache(maxsize=256)
+def _relation_model(name: str, campos: Optional[FrozenSet[str]]) -> Type[BaseModel]:
+    schema = RELACOES[name]
+    if campos is None:
+        return schema
+    fields = {field: (info.annotation, info) for field, info in schema.model_fields.items() if field in campos}
+    return create_model(f"{schema.__name__}Parcial", __config__=ConfigDict(from_attributes=True), **fields)
+
+
+@lru_cache(maxsize=256)
+def _control_model(key: Tuple, normalizado: bool) -> Type[BaseModel]:
+    campos, relacoes = key
+    relacoes = dict(relacoes)
+    names = set(CAMPOS_CONTROLE if campos is None else campos)
+    if normalizado:
+        names |= {CHAVES_RELACOES[name] for name in relacoes if name in CHAVES_RELACOES}
+    model_fields = schemas.ControleUtilizacaoVeiculoResumo.model_fields
+    fields = {name: (model_fields[name].annotation, model_fields[name]) for name in CAMPOS_CONTROLE if name in names}
+    for name, relation_campos in relacoes.items():
+        if normalizado and name in CHAVES_RELACOES:
+            continue
+        model = _relation_model(name, relation_campos)
+        fields[name] = (List[model], []) if name == "rotas" else (model, ...)
+    return create_model("ControleUtilizacaoVeiculoParcial", __config__=ConfigDict(from_attributes=True), **fields)
+
+
+@lru_cache(maxsize=256)
+def _list_adapter(key: Tuple, normalizado: bool) -> TypeAdapter:
+    return TypeAdapter(List[_control_model(key, normalizado)])
+
+
+@lru_cache(maxsize=256)
+def _dict_adapter(name: str, campos: Optional[FrozenSet[str]]) -> TypeAdapter:
+    return TypeAdapter(Dict[str, _relation_model(name, campos)])
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, computed_field
+from typing import Dict, Optional, List
+from datetime import date, datetime
+from services.images import VEHICLE_IMAGE_SIZES, contained_size, variant_links
 
 # Schemas para Usuario
 class UsuarioBase(BaseModel):
@@ -17,17 +18,25 @@ class UsuarioCreate(UsuarioBase):
     senha: str
 
 class UsuarioUpdate(BaseModel):
+    # Sem avatar_link: o avatar só muda pelos endpoints de upload/remoção, que contam as referências
     matricula: Optional[str] = None
     nome: Optional[str] = None
     email: Optional[str] = None
     celular: Optional[str] = None
     unidade: Optional[str] = None
-    avatar_link: Optional[str] = None
     status: Optional[str] = None
     perfil: Optional[str] = None
+    version: Optional[int] = None  # Versão lida pelo cliente; se o registro mudou desde então, a API responde 409
 
 class UsuarioResponse(UsuarioBase):
     id: int
+    version: int = 1
+    
+    @computed_field
+    @property
+    def avatar_links(self) -> Dict[str, str]:
+        """Miniatura do avatar por tamanho em px (ex.: {"48": "public/avatar/..._48.webp"})"""
+        return variant_links(self.avatar_link)
     
     class Config:
         from_attributes = True
@@ -47,6 +56,7 @@ class VeiculoCreate(VeiculoBase):
     pass
 
 class VeiculoUpdate(BaseModel):
+    # Sem imagem_link: a capa só muda pelos endpoints de imagem e de fotos, que contam as referências
     marca: Optional[str] = None
     modelo: Optional[str] = None
     placa: Optional[str] = None
@@ -54,10 +64,42 @@ class VeiculoUpdate(BaseModel):
     motor: Optional[str] = None
     tipo: Optional[str] = None
     status: Optional[str] = None
-    imagem_link: Optional[str] = None
+    version: Optional[int] = None
 
 class VeiculoResponse(VeiculoBase):
     id: int
+    version: int = 1
+    
+    @computed_field
+    @property
+    def imagem_links(self) -> Dict[str, str]:
+        """Foto de capa por tamanho do lado maior em px (ex.: {"160": "public/blobs/3f/..._160.webp"})"""
+        return variant_links(self.imagem_link, VEHICLE_IMAGE_SIZES)
+    
+    class Config:
+        from_attributes = True
+
+class FotoVeiculoResponse(BaseModel):
+    id: int
+    veiculo_id: int
+    imagem_link: str
+    largura: int
+    altura: int
+    bytes: int
+    nome_arquivo: Optional[str] = None
+    criado_em: str
+    
+    @computed_field
+    @property
+    def imagem_links(self) -> Dict[str, str]:
+        """Caminho de cada versão, por tamanho do lado maior em px"""
+        return variant_links(self.imagem_link, VEHICLE_IMAGE_SIZES)
+    
+    @computed_field
+    @property
+    def dimensoes(self) -> Dict[str, List[int]]:
+        """Largura e altura de cada versão (a proporção original é mantida), para reservar o espaço antes de baixar"""
+        return {str(size): list(contained_size(self.largura, self.altura, size)) for size in VEHICLE_IMAGE_SIZES}
     
     class Config:
         from_attributes = True
@@ -77,6 +119,14 @@ class RotaBase(BaseModel):
 
 class RotaCreate(RotaBase):
     controle_utilizacao_id: int
+    client_id: Optional[str] = None
+
+class RotaBulkItem(RotaCreate):
+    client_id: str
+
+class RotaBulkRejeitada(BaseModel):
+    client_id: str
+    detail: str
 
 class RotaUpdate(BaseModel):
     data_hora_saida: Optional[str] = None
@@ -89,14 +139,27 @@ class RotaUpdate(BaseModel):
     logradouro_chegada: Optional[str] = None
     latitude_chegada: Optional[float] = None
     longitude_chegada: Optional[float] = None
+    version: Optional[int] = None
 
 class RotaResponse(RotaBase):
     id: int
     controle_utilizacao_id: int
+    distancia_km: Optional[float] = None
+    km_percorrido: Optional[float] = None
+    duracao_minutos: Optional[float] = None
+    velocidade_media_kmh: Optional[float] = None
+    client_id: Optional[str] = None
+    version: int = 1
     
     class Config:
         from_attributes = True
 
+class RotaBulkResponse(BaseModel):
+    criadas: int
+    duplicadas: int
+    rotas: List[RotaResponse]
+    rejeitadas: List[RotaBulkRejeitada] = []
+
 # Schemas para ControleUtilizacaoVeiculo
 class ControleUtilizacaoVeiculoBase(BaseModel):
     veiculo_id: int
@@ -108,24 +171,87 @@ class ControleUtilizacaoVeiculoBase(BaseModel):
     status: str = "aberto"
 
 class ControleUtilizacaoVeiculoCreate(ControleUtilizacaoVeiculoBase):
-    pass
+    client_id: Optional[str] = None
 
 class ControleUtilizacaoVeiculoUpdate(BaseModel):
     km_final: Optional[float] = None
     data_fim: Optional[str] = None
     assinatura_eletronica: Optional[str] = None
     status: Optional[str] = None
+    version: Optional[int] = None
 
-class ControleUtilizacaoVeiculoResponse(ControleUtilizacaoVeiculoBase):
+class ControleUtilizacaoVeiculoResumo(ControleUtilizacaoVeiculoBase):
+    """Controle com motorista e veículo referenciados só pelo id (ver ControleUtilizacaoNormalizadoResponse)"""
     id: int
     motorista_id: int
+    client_id: Optional[str] = None
+    version: int = 1
+    rotas: List[RotaResponse] = []
+    
+    class Config:
+        from_attributes = True
+
+class ControleUtilizacaoVeiculoResponse(ControleUtilizacaoVeiculoResumo):
     motorista: UsuarioResponse
     veiculo: VeiculoResponse
-    rotas: List[RotaResponse] = []
+
+class ControleUtilizacaoNormalizadoResponse(BaseModel):
+    """
+    Listagem de controles com cada motorista e veículo uma única vez, em
+    dicionários por id, em vez de repetidos dentro de cada controle
+    """
+    total: int
+    controles: List[ControleUtilizacaoVeiculoResumo]
+    usuarios: Dict[str, UsuarioResponse]
+    veiculos: Dict[str, VeiculoResponse]
+
+class ControleUtilizacaoFiltro(BaseModel):
+    """Filtros da listagem de controles (parâmetros de query)"""
+    status: Optional[str] = None
+    motorista_id: Optional[int] = None
+    veiculo_id: Optional[int] = None
+    unidade: Optional[str] = None  # Unidade do motorista
+    data_de: Optional[date] = None  # data_inicio a partir deste dia (inclusive)
+    data_ate: Optional[date] = None  # data_inicio até este dia (inclusive)
+    finalizado_em: Optional[date] = None  # data_fim neste dia
+    busca: Optional[str] = None  # Nome/matrícula do motorista, placa/marca/modelo do veículo
+    ordenar: str = "-data_inicio"  # Campo de ordenação; prefixo "-" para decrescente
+
+# Schemas para Auditoria de Hodômetro
+class InconsistenciaOdometroResponse(BaseModel):
+    id: int
+    veiculo_id: int
+    controle_id: int
+    rota_id: Optional[int] = None
+    tipo: str
+    data: Optional[str] = None
+    km_esperado: Optional[float] = None
+    km_encontrado: Optional[float] = None
+    diferenca: Optional[float] = None
+    detectado_em: str
     
     class Config:
         from_attributes = True
 
+# Schemas para Busca textual
+class BuscaResultado(BaseModel):
+    tipo: str  # usuarios, veiculos ou rotas
+    id: int
+    titulo: str
+    subtitulo: Optional[str] = None
+    controle_id: Optional[int] = None  # Controle da rota (só para tipo "rotas")
+    score: float  # Relevância BM25: quanto menor, mais relevante
+
+# Schemas para Importação em lote (CSV/XLSX)
+class ImportacaoErro(BaseModel):
+    linha: int  # Linha da planilha (a linha 1 é o cabeçalho)
+    erro: str
+
+class ImportacaoResponse(BaseModel):
+    total: int
+    importados: int
+    erros: List[ImportacaoErro] = []
+
 # Schemas para Autenticação
 class UserLogin(BaseModel):
     email: str
@@ -0,0 +1,220 @@
+"""
+Armazenamento das imagens endereçado pelo conteúdo.
+
+As miniaturas de cada upload são gravadas com o hash do arquivo enviado no
+nome (``public/blobs/3f/3fa9..._96.webp``, ver ``images.content_digest``):
+
+- o mesmo arquivo enviado de novo (por outro usuário, ou para outro veículo)
+  reaproveita as miniaturas que já existem, sem decodificar nem gravar nada
+- o conteúdo de um nome nunca muda, então ``/public/blobs`` é servido com
+  ``Cache-Control: immutable`` de um ano e o próprio hash como ETag: o cliente
+  guarda as imagens e não pergunta de novo (``BlobStaticFiles``)
+
+Cada conjunto de miniaturas tem uma linha em ``imagens_blob`` com a contagem de
+referências (avatares e fotos de veículos que apontam para ele), atualizada na
+mesma transação que troca o link. Nada é apagado durante a requisição: a coleta
+(``collect_garbage``) roda em segundo plano a cada ``BLOB_GC_INTERVAL``
+segundos e remove os conjuntos sem referências há mais de
+``BLOB_GC_GRACE_SECONDS``.
+
+Coleta manual (a partir do diretório ``app``):
+    python -m services.blob_store --gc
+"""
+import asyncio
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from models import ImagemBlob
+from services.images import IMAGE_FORMAT, content_digest, make_variants, run_in_image_pool
+
+load_dotenv()
+
+BLOB_GC_INTERVAL = float(os.getenv("SGUV_BLOB_GC_INTERVAL", "3600"))
+BLOB_GC_GRACE_SECONDS = float(os.getenv("SGUV_BLOB_GC_GRACE_SECONDS", "3600"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+BLOBS_DIR = PROJECT_ROOT / "public" / "blobs"
+
+# "public/blobs/3f/<hash>_96.webp" -> hash
+_BLOB_LINK = re.compile(r"^public/blobs/[0-9a-f]{2}/(?P<hash>[0-9a-f]{64})_\d+\.\w+$")
+_BLOB_FILE = re.compile(r"^[0-9a-f]{64}_\d+\.\w+$")
+
+
+def blob_hash(link: Optional[str]) -> Optional[str]:
+    """Hash do conjunto de miniaturas de um link salvo (None para links de outro tipo)"""
+    match = _BLOB_LINK.match(link or "")
+    return match["hash"] if match else None
+
+
+def blob_links(digest: str, sizes: Sequence[int]) -> Dict[int, str]:
+    """Caminho (relativo à raiz do projeto) de cada miniatura do conjunto"""
+    return {size: f"public/blobs/{digest[:2]}/{digest}_{size}.{IMAGE_FORMAT}" for size in sizes}
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Gravação
+def _write_atomic(path: Path, content: bytes):
+    # Arquivo temporário + rename: quem lê nunca vê uma miniatura pela metade
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp:
+            temp.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _store(source: BinaryIO, sizes: Sequence[int], crop: bool, digest: Optional[str]) -> Tuple[str, int]:
+    digest = digest or content_digest(source, crop)
+    paths = {size: PROJECT_ROOT / link for size, link in blob_links(digest, sizes).items()}
+    missing = [size for size, path in paths.items() if not path.exists()]
+    if missing:
+        variants = make_variants(source, sizes, crop)
+        for size in missing:
+            _write_atomic(paths[size], variants[size])
+    return digest, sum(path.stat().st_size for path in paths.values())
+
+
+async def store_image(source: BinaryIO, sizes: Sequence[int], crop: bool, digest: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Grava as miniaturas que ainda não existem para o arquivo enviado e devolve
+    o hash e o total de bytes em disco. Arquivos repetidos não são decodificados.
+    Chamada de novo depois de ``acquire`` (com o hash já calculado), garante que
+    a coleta não removeu o conjunto no meio tempo.
+    """
+    return await run_in_image_pool(_store, source, sizes, crop, digest)
+
+
+# Referências
+def acquire(db: Session, digest: str, size_bytes: int):
+    """Soma uma referência ao conjunto (sem commit: vai junto com a troca do link)"""
+    values = {"bytes": size_bytes, "atualizado_em": _now()}
+    result = db.execute(
+        update(ImagemBlob).where(ImagemBlob.hash == digest)
+        .values(referencias=ImagemBlob.referencias + 1, **values)
+    )
+    if not result.rowcount:
+        # O UPDATE já abriu a transação de escrita: ninguém cria a mesma linha até o commit
+        db.execute(insert(ImagemBlob).values(hash=digest, referencias=1, **values))
+
+
+def track(db: Session, digest: str, size_bytes: int):
+    """
+    Registra sem referências um conjunto gravado que não chegou a ser usado (sem
+    commit): sem a linha em ``imagens_blob``, a coleta nunca removeria os arquivos
+    """
+    result = db.execute(update(ImagemBlob).where(ImagemBlob.hash == digest).values(atualizado_em=_now()))
+    if not result.rowcount:
+        db.execute(insert(ImagemBlob).values(hash=digest, referencias=0, bytes=size_bytes, atualizado_em=_now()))
+
+
+def release(db: Session, link: Optional[str]):
+    """Tira uma referência do conjunto de um link salvo (sem commit); links antigos são ignorados"""
+    digest = blob_hash(link)
+    if digest is None:
+        return
+    db.execute(
+        update(ImagemBlob).where(ImagemBlob.hash == digest, ImagemBlob.referencias > 0)
+        .values(referencias=ImagemBlob.referencias - 1, atualizado_em=_now())
+    )
+
+
+# Coleta
+def collect_garbage(db: Session, grace_seconds: float = BLOB_GC_GRACE_SECONDS) -> int:
+    """
+    Remove os conjuntos sem referências há mais de ``grace_seconds``. Cada um é
+    apagado do banco e do disco dentro da mesma transação: um upload do mesmo
+    arquivo que chega nesse momento espera o commit e grava as miniaturas de novo.
+    """
+    cutoff = (datetime.now() - timedelta(seconds=grace_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+    candidates = db.execute(
+        select(ImagemBlob.hash).where(ImagemBlob.referencias <= 0, ImagemBlob.atualizado_em <= cutoff)
+    ).scalars().all()
+    removed = 0
+    for digest in candidates:
+        result = db.execute(delete(ImagemBlob).where(ImagemBlob.hash == digest, ImagemBlob.referencias <= 0))
+        if result.rowcount:
+            for path in (BLOBS_DIR / digest[:2]).glob(f"{digest}_*"):
+                path.unlink(missing_ok=True)
+            removed += 1
+        db.commit()
+    return removed
+
+
+async def run_garbage_collector(session_factory, interval: float = BLOB_GC_INTERVAL):
+    """Laço da coleta em segundo plano (iniciado no startup da API)"""
+    def collect():
+        db = session_factory()
+        try:
+            return collect_garbage(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            removed = await asyncio.get_running_loop().run_in_executor(None, collect)
+            if removed:
+                print(f"🧹 {removed} conjunto(s) de imagens sem uso removido(s)")
+        except Exception as e:
+            print(f"❌ Erro na coleta de imagens: {e}")
+        await asyncio.sleep(interval)
+
+
+# Entrega
+class BlobStaticFiles(StaticFiles):
+    """
+    StaticFiles que entrega as miniaturas endereçadas pelo conteúdo como
+    imutáveis, com o nome do arquivo (hash e tamanho) como ETag. Os demais
+    arquivos seguem o comportamento padrão.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        name = os.path.basename(full_path)
+        if not _BLOB_FILE.match(name):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        headers = {"etag": f'"{name.rsplit(".", 1)[0]}"', "cache-control": IMMUTABLE_CACHE_CONTROL}
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result,
+                                method=scope["method"], headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="Armazenamento das imagens endereçado pelo conteúdo")
+    parser.add_argument("--gc", action="store_true", help="Remove os conjuntos sem referências")
+    parser.add_argument("--grace", type=float, default=BLOB_GC_GRACE_SECONDS,
+                        help="Segundos sem referências antes de um conjunto ser removido")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        if args.gc:
+            print(f"{collect_garbage(db, args.grace)} conjunto(s) removido(s)")
+        blobs = db.execute(select(ImagemBlob)).scalars().all()
+        print(f"{len(blobs)} conjunto(s), {sum(blob.bytes for blob in blobs) / 1024:.0f} KB, "
+              f"{sum(1 for blob in blobs if blob.referencias <= 0)} sem referências")
+    finally:
+        db.close()
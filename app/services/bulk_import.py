@@ -0,0 +1,276 @@
+"""
+Importação em lote de veículos e usuários a partir de planilhas CSV ou XLSX.
+
+O arquivo é lido linha a linha (sem carregar a planilha inteira em memória) e
+processado em lotes de ``IMPORT_BATCH_SIZE`` linhas:
+
+1. cada linha é validada com o mesmo schema dos cadastros individuais;
+2. placas, emails e matrículas repetidos no arquivo ou já cadastrados são
+   recusados (um único SELECT por campo para o lote inteiro);
+3. as senhas dos usuários são convertidas em hash em paralelo (o bcrypt
+   libera o GIL, então um pool de threads usa todos os núcleos);
+4. o lote é gravado com um único INSERT em uma transação.
+
+Linhas recusadas não interrompem a importação: cada uma volta no relatório
+com o número da linha na planilha e o motivo.
+"""
+import codecs
+import csv
+import io
+import os
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from auth import get_password_hash
+from metrics import BCRYPT_QUEUED
+from models import Usuario, Veiculo
+from schemas import UsuarioCreate, VeiculoCreate
+
+load_dotenv()
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", str(os.cpu_count() or 2)))
+
+PERFIS = {"admin", "gestor", "operador", "motorista"}
+STATUS_USUARIO = {"pendente", "ativo", "inativo"}
+STATUS_VEICULO = {"disponivel", "em_uso", "manutencao", "inativo"}
+
+_hash_pool = ThreadPoolExecutor(max_workers=IMPORT_HASH_WORKERS, thread_name_prefix="sguv-import-hash")
+
+
+class ArquivoInvalido(ValueError):
+    """Planilha em formato não suportado ou sem as colunas obrigatórias"""
+
+
+# Leitura da planilha
+def _normalize_header(name: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode()
+    return "_".join(text.strip().lower().split())
+
+
+def _cell_text(value: Any) -> str:
+    # Números inteiros vindos do Excel (ex.: matrícula 1234 ou ano 2020.0) viram "1234"/"2020"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+
+def _detect_encoding(sample: bytes) -> str:
+    try:
+        # Ignora um possível caractere multibyte cortado no fim da amostra
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        # CSV salvo pelo Excel em português costuma vir em Windows-1252
+        return "cp1252"
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[Tuple[int, List[str]]]:
+    sample = file.read(64 * 1024)
+    file.seek(0)
+    encoding = _detect_encoding(sample)
+    try:
+        dialect = csv.Sniffer().sniff(sample.decode(encoding, errors="ignore"), delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.TextIOWrapper(file, encoding=encoding, newline=""), dialect)
+    for values in reader:
+        yield reader.line_num, values
+
+
+def _xlsx_rows(file: BinaryIO) -> Iterator[Tuple[int, List[Any]]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ArquivoInvalido("Leitura de XLSX requer o pacote openpyxl (pip install openpyxl)")
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ArquivoInvalido("Arquivo XLSX inválido")
+    try:
+        for line, values in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+            yield line, list(values)
+    finally:
+        workbook.close()
+
+
+def read_rows(file: BinaryIO, filename: str, required: Iterable[str]) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Lê a planilha e gera (número da linha, {coluna: valor}) para cada linha não vazia.
+    A primeira linha é o cabeçalho; os nomes das colunas são comparados sem
+    acentos e sem diferenciar maiúsculas (ex.: "Matrícula" == "matricula").
+    """
+    extension = Path(filename or "").suffix.lower()
+    if extension == ".csv":
+        rows = _csv_rows(file)
+    elif extension == ".xlsx":
+        rows = _xlsx_rows(file)
+    else:
+        raise ArquivoInvalido("Formato de arquivo não suportado. Use CSV ou XLSX")
+
+    header_line = next(rows, None)
+    if header_line is None:
+        raise ArquivoInvalido("Arquivo vazio")
+    header = [_normalize_header(name) for name in header_line[1]]
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ArquivoInvalido(f"Colunas obrigatórias ausentes: {', '.join(missing)}")
+
+    for line, values in rows:
+        # Células vazias ficam de fora para que os valores padrão do schema sejam usados
+        row = {
+            column: text
+            for column, text in zip(header, map(_cell_text, values))
+            if column and text
+        }
+        if row:
+            yield line, row
+
+
+# Importação
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def _batches(rows: Iterator, size: int) -> Iterator[list]:
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert_batch(db: Session, model, lines: List[int], values: List[Dict[str, Any]], erros: List[Dict[str, Any]]) -> int:
+    """Grava o lote em uma transação; se outra requisição gravou a mesma chave no meio tempo, isola as linhas"""
+    if not values:
+        return 0
+    try:
+        db.execute(insert(model), values)
+        db.commit()
+        return len(values)
+    except IntegrityError:
+        db.rollback()
+
+    inserted = 0
+    for line, row in zip(lines, values):
+        try:
+            db.execute(insert(model), [row])
+            db.commit()
+            inserted += 1
+        except IntegrityError:
+            db.rollback()
+            erros.append({"linha": line, "erro": "Registro já cadastrado"})
+    return inserted
+
+
+def _import(
+    db: Session,
+    rows: Iterator[Tuple[int, Dict[str, str]]],
+    schema: type,
+    model,
+    unique_messages: Dict[str, str],
+    check: Callable[[BaseModel], str],
+    prepare: Callable[[List[BaseModel]], List[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    total = importados = 0
+    erros: List[Dict[str, Any]] = []
+    seen: Dict[str, Dict[Any, int]] = {field: {} for field in unique_messages}
+
+    for batch in _batches(rows, IMPORT_BATCH_SIZE):
+        total += len(batch)
+        valid: List[Tuple[int, BaseModel]] = []
+        for line, row in batch:
+            try:
+                item = schema.model_validate(row)
+            except ValidationError as e:
+                erros.append({"linha": line, "erro": _validation_message(e)})
+                continue
+            problem = check(item)
+            if not problem:
+                for field, message in unique_messages.items():
+                    first_line = seen[field].get(getattr(item, field))
+                    if first_line is not None:
+                        problem = f"{message} na linha {first_line} do arquivo"
+                        break
+            if problem:
+                erros.append({"linha": line, "erro": problem})
+                continue
+            for field in unique_messages:
+                seen[field][getattr(item, field)] = line
+            valid.append((line, item))
+
+        # Chaves que já existem no banco: um SELECT por campo para o lote inteiro
+        for field, message in unique_messages.items():
+            if not valid:
+                break
+            column = getattr(model, field)
+            existing = set(db.scalars(select(column).where(column.in_([getattr(item, field) for _, item in valid]))))
+            if existing:
+                erros.extend({"linha": line, "erro": message} for line, item in valid if getattr(item, field) in existing)
+                valid = [(line, item) for line, item in valid if getattr(item, field) not in existing]
+
+        importados += _insert_batch(db, model, [line for line, _ in valid], prepare([item for _, item in valid]), erros)
+
+    erros.sort(key=lambda erro: erro["linha"])
+    return {"total": total, "importados": importados, "erros": erros}
+
+
+def _check_veiculo(item: VeiculoCreate) -> str:
+    if item.status not in STATUS_VEICULO:
+        return f"status inválido: {item.status}"
+    return ""
+
+
+def _check_usuario(item: UsuarioCreate) -> str:
+    if item.perfil not in PERFIS:
+        return f"perfil inválido: {item.perfil}"
+    if item.status not in STATUS_USUARIO:
+        return f"status inválido: {item.status}"
+    return ""
+
+
+def _hash_queued(senha: str) -> str:
+    # Saiu da fila do pool: a partir daqui conta em sguv_bcrypt_in_progress
+    BCRYPT_QUEUED.dec()
+    return get_password_hash(senha)
+
+
+def _prepare_usuarios(items: List[UsuarioCreate]) -> List[Dict[str, Any]]:
+    BCRYPT_QUEUED.inc(len(items))
+    hashes = _hash_pool.map(_hash_queued, [item.senha for item in items])
+    return [
+        {**item.model_dump(exclude={"senha"}), "senha_hash": senha_hash}
+        for item, senha_hash in zip(items, hashes)
+    ]
+
+
+def import_veiculos(db: Session, file: BinaryIO, filename: str) -> Dict[str, Any]:
+    return _import(
+        db, read_rows(file, filename, required=("marca", "modelo", "placa")),
+        VeiculoCreate, Veiculo,
+        unique_messages={"placa": "Placa já cadastrada"},
+        check=_check_veiculo,
+        prepare=lambda items: [item.model_dump() for item in items],
+    )
+
+
+def import_usuarios(db: Session, file: BinaryIO, filename: str) -> Dict[str, Any]:
+    return _import(
+        db, read_rows(file, filename, required=("matricula", "nome", "email", "senha")),
+        UsuarioCreate, Usuario,
+        unique_messages={"email": "Email já cadastrado", "matricula": "Matrícula já cadastrada"},
+        check=_check_usuario,
+        prepare=_prepare_usuarios,
+    )
@@ -0,0 +1,265 @@
+"""
+Provedores de geocodificação.
+
+O provedor ativo é escolhido pela variável ``GEOCODER_PROVIDER``:
+
+- ``google``  (padrão) – Google Maps Geocoding API (requer ``GOOGLE_MAPS_API_KEY``)
+- ``offline`` – gazetteer local em CSV (``GEOCODER_GAZETTEER_PATH``), sem rede
+- ``fake``    – respostas determinísticas, para testes e benchmarks
+
+O gazetteer offline é um CSV com cabeçalho ``latitude,longitude,endereco``,
+por exemplo gerado a partir de um extrato do OpenStreetMap (nós com
+``addr:*``). Os pontos são indexados em uma grade regular para que a busca
+reversa consulte apenas as células vizinhas da coordenada.
+
+Todos os provedores expõem métodos ``async`` para que as rotas da API não
+ocupem o threadpool enquanto aguardam um serviço externo.
+"""
+import asyncio
+import csv
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from metrics import GEOCODING_REQUESTS, GEOCODING_SECONDS
+
+load_dotenv()
+
+GEOCODER_PROVIDER = os.getenv("GEOCODER_PROVIDER", "google").lower()
+GEOCODER_GAZETTEER_PATH = os.getenv("GEOCODER_GAZETTEER_PATH", "gazetteer.csv")
+GEOCODER_OFFLINE_MAX_DISTANCE_M = float(os.getenv("GEOCODER_OFFLINE_MAX_DISTANCE_M", "200"))
+
+EARTH_RADIUS_M = 6_371_000
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância em metros entre dois pontos (fórmula de haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def normalize_address(address: str) -> str:
+    """Remove acentos, caixa e espaços repetidos para comparar endereços"""
+    text = unicodedata.normalize("NFKD", address)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().replace(",", " ").split())
+
+
+class Geocoder(ABC):
+    """Interface comum dos provedores de geocodificação"""
+
+    name = "base"
+
+    def is_available(self) -> bool:
+        """Indica se o provedor está configurado e pode ser usado"""
+        return True
+
+    async def close(self):
+        """Libera recursos do provedor (conexões, arquivos)"""
+
+    @abstractmethod
+    async def get_address_from_coordinates(self, latitude: float, longitude: float) -> Optional[str]:
+        """Converte coordenadas (lat, lng) em endereço"""
+
+    @abstractmethod
+    async def get_coordinates_from_address(self, address: str) -> Optional[Dict[str, float]]:
+        """Converte endereço em coordenadas (lat, lng)"""
+
+
+class OfflineGeocoder(Geocoder):
+    """Geocodificação a partir de um gazetteer local indexado em grade"""
+
+    name = "offline"
+
+    def __init__(
+        self,
+        gazetteer_path: str = GEOCODER_GAZETTEER_PATH,
+        max_distance_m: float = GEOCODER_OFFLINE_MAX_DISTANCE_M,
+        cell_size_deg: float = 0.01,
+    ):
+        self.gazetteer_path = gazetteer_path
+        self.max_distance_m = max_distance_m
+        self.cell_size_deg = cell_size_deg
+        self.points: List[Tuple[float, float, str]] = []
+        self.grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.by_address: Dict[str, int] = {}
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size_deg), math.floor(longitude / self.cell_size_deg))
+
+    def add_point(self, latitude: float, longitude: float, address: str):
+        """Adiciona um ponto ao índice"""
+        index = len(self.points)
+        self.points.append((latitude, longitude, address))
+        self.grid[self._cell(latitude, longitude)].append(index)
+        self.by_address.setdefault(normalize_address(address), index)
+
+    def load(self):
+        """Carrega o gazetteer do disco (executado uma única vez, sob demanda)"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            if not os.path.exists(self.gazetteer_path):
+                print(f"Gazetteer não encontrado: {self.gazetteer_path}")
+            else:
+                with open(self.gazetteer_path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        try:
+                            self.add_point(float(row["latitude"]), float(row["longitude"]), row["endereco"])
+                        except (KeyError, TypeError, ValueError):
+                            continue
+            self._loaded = True
+
+    def is_available(self) -> bool:
+        self.load()
+        return bool(self.points)
+
+    async def get_address_from_coordinates(self, latitude: float, longitude: float) -> Optional[str]:
+        self.load()
+        if not self.points:
+            return None
+
+        # Quantas células é preciso olhar em cada direção para cobrir a distância máxima
+        # (a longitude encolhe com o cosseno da latitude)
+        lat_span = self.max_distance_m / 111_320
+        lon_span = lat_span / max(math.cos(math.radians(latitude)), 0.01)
+        row, col = self._cell(latitude, longitude)
+        rows = math.ceil(lat_span / self.cell_size_deg)
+        cols = math.ceil(lon_span / self.cell_size_deg)
+
+        best_address, best_distance = None, self.max_distance_m
+        for r in range(row - rows, row + rows + 1):
+            for c in range(col - cols, col + cols + 1):
+                for index in self.grid.get((r, c), ()):
+                    p_lat, p_lon, address = self.points[index]
+                    distance = haversine_m(latitude, longitude, p_lat, p_lon)
+                    if distance <= best_distance:
+                        best_address, best_distance = address, distance
+        return best_address
+
+    async def get_coordinates_from_address(self, address: str) -> Optional[Dict[str, float]]:
+        self.load()
+        index = self.by_address.get(normalize_address(address))
+        if index is None:
+            return None
+        latitude, longitude, _ = self.points[index]
+        return {"latitude": latitude, "longitude": longitude}
+
+
+class FakeGeocoder(Geocoder):
+    """Provedor determinístico: mesma entrada, mesma saída, sem I/O"""
+
+    name = "fake"
+
+    async def get_address_from_coordinates(self, latitude: float, longitude: float) -> Optional[str]:
+        return f"Endereço simulado ({latitude:.6f}, {longitude:.6f})"
+
+    async def get_coordinates_from_address(self, address: str) -> Optional[Dict[str, float]]:
+        digest = hashlib.sha256(normalize_address(address).encode("utf-8")).digest()
+        # Mapeia o hash para um ponto dentro do território brasileiro
+        lat_fraction = int.from_bytes(digest[:4], "big") / 0xFFFFFFFF
+        lon_fraction = int.from_bytes(digest[4:8], "big") / 0xFFFFFFFF
+        return {
+            "latitude": round(-33.0 + lat_fraction * 38.0, 6),
+            "longitude": round(-73.0 + lon_fraction * 39.0, 6),
+        }
+
+
+class MeteredGeocoder(Geocoder):
+    """
+    Repassa as consultas a outro provedor registrando a latência e se houve
+    resultado (``sguv_geocoding_*``, ver ``metrics``)
+    """
+
+    def __init__(self, provider: Geocoder):
+        self.provider = provider
+        self.name = provider.name
+
+    def __getattr__(self, attribute):
+        # Demais atributos do provedor (ex.: validate_api_key do Google Maps)
+        return getattr(self.provider, attribute)
+
+    def is_available(self) -> bool:
+        return self.provider.is_available()
+
+    async def close(self):
+        await self.provider.close()
+
+    async def _observe(self, operation: str, call):
+        start = time.perf_counter()
+        result = await call
+        GEOCODING_SECONDS.labels(self.name, operation).observe(time.perf_counter() - start)
+        GEOCODING_REQUESTS.labels(self.name, operation, "hit" if result else "miss").inc()
+        return result
+
+    async def get_address_from_coordinates(self, latitude: float, longitude: float) -> Optional[str]:
+        return await self._observe("reverse", self.provider.get_address_from_coordinates(latitude, longitude))
+
+    async def get_coordinates_from_address(self, address: str) -> Optional[Dict[str, float]]:
+        return await self._observe("forward", self.provider.get_coordinates_from_address(address))
+
+
+def create_geocoder(provider: str = GEOCODER_PROVIDER) -> Geocoder:
+    """Cria uma instância do provedor de geocodificação informado"""
+    if provider == "offline":
+        return OfflineGeocoder()
+    if provider == "fake":
+        return FakeGeocoder()
+    if provider != "google":
+        print(f"Provedor de geocodificação desconhecido '{provider}', usando Google Maps")
+    from services.google_maps import google_maps_service
+    return google_maps_service
+
+
+@lru_cache(maxsize=1)
+def get_geocoder() -> Geocoder:
+    """Provedor configurado em GEOCODER_PROVIDER (instância única, criada sob demanda, com métricas)"""
+    return MeteredGeocoder(create_geocoder(GEOCODER_PROVIDER))
+
+
+if __name__ == "__main__":
+    # Benchmark simples de geocodificação reversa com o provedor configurado
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mede a latência da geocodificação reversa")
+    parser.add_argument("--provider", default=GEOCODER_PROVIDER)
+    parser.add_argument("-n", type=int, default=1000, help="Quantidade de consultas")
+    args = parser.parse_args()
+
+    bench_geocoder = create_geocoder(args.provider)
+    if not bench_geocoder.is_available():
+        print(f"Provedor '{bench_geocoder.name}' não está disponível")
+    else:
+        rng = random.Random(42)
+        samples = [(rng.uniform(-23.7, -23.4), rng.uniform(-46.8, -46.4)) for _ in range(args.n)]
+
+        async def run_benchmark() -> int:
+            hits = 0
+            for lat, lon in samples:
+                if await bench_geocoder.get_address_from_coordinates(lat, lon):
+                    hits += 1
+            await bench_geocoder.close()
+            return hits
+
+        start = time.perf_counter()
+        hits = asyncio.run(run_benchmark())
+        elapsed = time.perf_counter() - start
+        print(f"{bench_geocoder.name}: {args.n} consultas em {elapsed:.3f}s "
+              f"({elapsed / args.n * 1e6:.1f} µs/consulta, {hits} encontradas)")
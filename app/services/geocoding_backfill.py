@@ -0,0 +1,242 @@
+"""
+Backfill de endereços para rotas históricas.
+
+Percorre a tabela ``rotas`` procurando trechos com latitude/longitude
+preenchidas mas sem ``logradouro_*``, resolve as coordenadas pelo provedor
+de geocodificação configurado respeitando um limite de requisições por
+segundo (``--qps 0`` desativa o limite, útil no provedor offline) e grava os
+endereços em transações em lote. O progresso é salvo em um arquivo de
+checkpoint para que a execução possa ser retomada.
+
+Uso (a partir do diretório ``app``):
+    python -m services.geocoding_backfill --qps 10 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from models import Rota
+from services.geocoding import get_geocoder
+
+load_dotenv()
+
+GEOCODING_QPS = float(os.getenv("GEOCODING_QPS", "10"))
+GEOCODING_WORKERS = int(os.getenv("GEOCODING_WORKERS", "4"))
+GEOCODING_BATCH_SIZE = int(os.getenv("GEOCODING_BATCH_SIZE", "500"))
+GEOCODING_CHECKPOINT = os.getenv("GEOCODING_CHECKPOINT", "geocoding_backfill.checkpoint.json")
+
+# Casas decimais usadas para deduplicar coordenadas (~0,1 m)
+COORD_PRECISION = 6
+
+# Máximo de coordenadas já resolvidas mantidas em memória entre lotes
+MAX_CACHED_COORDINATES = 100_000
+
+Coordenada = Tuple[float, float]
+
+
+class RateLimiter:
+    """Limita a quantidade de chamadas por segundo entre várias tarefas"""
+
+    def __init__(self, qps: float):
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self.next_slot = time.monotonic()
+
+    async def acquire(self):
+        # Reserva o próximo horário livre antes de aguardar, sem precisar de lock
+        now = time.monotonic()
+        wait = self.next_slot - now
+        self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def load_checkpoint(path: str) -> int:
+    """Retorna o último id de rota processado (0 se não houver checkpoint)"""
+    checkpoint = Path(path)
+    if not checkpoint.exists():
+        return 0
+    try:
+        return int(json.loads(checkpoint.read_text()).get("last_rota_id", 0))
+    except (ValueError, OSError):
+        return 0
+
+
+def save_checkpoint(path: str, last_rota_id: int, stats: Dict[str, int]):
+    """Grava o checkpoint de forma atômica"""
+    checkpoint = Path(path)
+    tmp_path = checkpoint.with_suffix(checkpoint.suffix + ".tmp")
+    tmp_path.write_text(json.dumps({"last_rota_id": last_rota_id, **stats}))
+    os.replace(tmp_path, checkpoint)
+
+
+def _coord_key(latitude: float, longitude: float) -> Coordenada:
+    return (round(latitude, COORD_PRECISION), round(longitude, COORD_PRECISION))
+
+
+def fetch_pending_routes(db: Session, after_id: int, limit: int) -> List[Rota]:
+    """Busca rotas com coordenadas e sem endereço, em ordem de id"""
+    saida_pendente = and_(
+        Rota.logradouro_saida.is_(None) | (Rota.logradouro_saida == ""),
+        Rota.latitude_saida.isnot(None),
+        Rota.longitude_saida.isnot(None),
+    )
+    chegada_pendente = and_(
+        Rota.logradouro_chegada.is_(None) | (Rota.logradouro_chegada == ""),
+        Rota.latitude_chegada.isnot(None),
+        Rota.longitude_chegada.isnot(None),
+    )
+    return (
+        db.query(Rota)
+        .filter(Rota.id > after_id, or_(saida_pendente, chegada_pendente))
+        .order_by(Rota.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def _pending_coordinates(rotas: List[Rota]) -> Dict[Coordenada, Coordenada]:
+    """Coordenadas únicas que precisam ser resolvidas no lote"""
+    pending = {}
+    for rota in rotas:
+        if not rota.logradouro_saida and rota.latitude_saida is not None and rota.longitude_saida is not None:
+            pending[_coord_key(rota.latitude_saida, rota.longitude_saida)] = (rota.latitude_saida, rota.longitude_saida)
+        if not rota.logradouro_chegada and rota.latitude_chegada is not None and rota.longitude_chegada is not None:
+            pending[_coord_key(rota.latitude_chegada, rota.longitude_chegada)] = (rota.latitude_chegada, rota.longitude_chegada)
+    return pending
+
+
+async def resolve_coordinates(
+    coordinates: Dict[Coordenada, Coordenada],
+    limiter: RateLimiter,
+    semaphore: asyncio.Semaphore,
+) -> Dict[Coordenada, Optional[str]]:
+    """Resolve as coordenadas concorrentemente respeitando o limite de QPS"""
+    geocoder = get_geocoder()
+
+    async def resolve(key: Coordenada, latitude: float, longitude: float):
+        async with semaphore:
+            await limiter.acquire()
+            return key, await geocoder.get_address_from_coordinates(latitude, longitude)
+
+    results = await asyncio.gather(
+        *(resolve(key, latitude, longitude) for key, (latitude, longitude) in coordinates.items())
+    )
+    return dict(results)
+
+
+def _build_updates(rotas: List[Rota], addresses: Dict[Coordenada, Optional[str]]) -> List[Dict]:
+    updates = []
+    for rota in rotas:
+        values = {}
+        if not rota.logradouro_saida and rota.latitude_saida is not None and rota.longitude_saida is not None:
+            address = addresses.get(_coord_key(rota.latitude_saida, rota.longitude_saida))
+            if address:
+                values["logradouro_saida"] = address
+        if not rota.logradouro_chegada and rota.latitude_chegada is not None and rota.longitude_chegada is not None:
+            address = addresses.get(_coord_key(rota.latitude_chegada, rota.longitude_chegada))
+            if address:
+                values["logradouro_chegada"] = address
+        if values:
+            updates.append({"id": rota.id, **values})
+    return updates
+
+
+async def backfill_addresses(
+    db: Session,
+    qps: float = GEOCODING_QPS,
+    workers: int = GEOCODING_WORKERS,
+    batch_size: int = GEOCODING_BATCH_SIZE,
+    checkpoint_path: str = GEOCODING_CHECKPOINT,
+    resume: bool = True,
+) -> Dict[str, int]:
+    """
+    Preenche os logradouros faltantes das rotas.
+
+    Cada lote é gravado em uma única transação e o checkpoint só avança
+    depois do commit, de modo que uma interrupção reprocessa no máximo um lote.
+    """
+    last_id = load_checkpoint(checkpoint_path) if resume else 0
+    stats = {"rotas_lidas": 0, "coordenadas_unicas": 0, "enderecos_resolvidos": 0, "rotas_atualizadas": 0}
+    limiter = RateLimiter(qps)
+    semaphore = asyncio.Semaphore(workers)
+    resolved: Dict[Coordenada, Optional[str]] = {}
+
+    while True:
+        rotas = fetch_pending_routes(db, after_id=last_id, limit=batch_size)
+        if not rotas:
+            break
+
+        if len(resolved) > MAX_CACHED_COORDINATES:
+            resolved.clear()
+        coordinates = _pending_coordinates(rotas)
+        missing = {key: coord for key, coord in coordinates.items() if key not in resolved}
+        fetched = await resolve_coordinates(missing, limiter, semaphore)
+        resolved.update(fetched)
+        updates = _build_updates(rotas, resolved)
+
+        if updates:
+            db.execute(update(Rota), updates)
+        db.commit()
+
+        last_id = rotas[-1].id
+        stats["rotas_lidas"] += len(rotas)
+        stats["coordenadas_unicas"] += len(missing)
+        stats["enderecos_resolvidos"] += sum(1 for address in fetched.values() if address)
+        stats["rotas_atualizadas"] += len(updates)
+        save_checkpoint(checkpoint_path, last_id, stats)
+
+        print(f"Lote até rota {last_id}: {len(updates)} rotas atualizadas ({len(missing)} coordenadas consultadas)")
+
+        # Libera os objetos do lote para não acumular memória
+        db.expunge_all()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geocodifica rotas históricas sem logradouro")
+    parser.add_argument("--qps", type=float, default=GEOCODING_QPS, help="Máximo de requisições por segundo")
+    parser.add_argument("--workers", type=int, default=GEOCODING_WORKERS, help="Requisições simultâneas")
+    parser.add_argument("--batch-size", type=int, default=GEOCODING_BATCH_SIZE, help="Rotas por transação")
+    parser.add_argument("--checkpoint", default=GEOCODING_CHECKPOINT, help="Arquivo de checkpoint")
+    parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint e recomeça do início")
+    args = parser.parse_args()
+
+    geocoder = get_geocoder()
+    if not geocoder.is_available():
+        print(f"❌ Provedor de geocodificação '{geocoder.name}' não está configurado")
+        return
+
+    from database import SessionLocal
+
+    async def run():
+        try:
+            return await backfill_addresses(
+                db,
+                qps=args.qps,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                checkpoint_path=args.checkpoint,
+                resume=not args.restart,
+            )
+        finally:
+            await geocoder.close()
+
+    db = SessionLocal()
+    try:
+        stats = asyncio.run(run())
+        print(f"✅ Backfill concluído: {stats}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
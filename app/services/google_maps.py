@@ -1,88 +1,170 @@
-import requests
+import asyncio
+import httpx
 import os
+import time
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
+from services.geocoding import Geocoder
 
 load_dotenv()
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
-class GoogleMapsService:
+# Limites do cliente HTTP compartilhado
+GOOGLE_MAPS_CONNECT_TIMEOUT = float(os.getenv("GOOGLE_MAPS_CONNECT_TIMEOUT", "3"))
+GOOGLE_MAPS_READ_TIMEOUT = float(os.getenv("GOOGLE_MAPS_READ_TIMEOUT", "5"))
+GOOGLE_MAPS_MAX_CONNECTIONS = int(os.getenv("GOOGLE_MAPS_MAX_CONNECTIONS", "20"))
+GOOGLE_MAPS_MAX_CONCURRENCY = int(os.getenv("GOOGLE_MAPS_MAX_CONCURRENCY", "10"))
+
+# Circuit breaker: após N falhas seguidas, para de chamar a API por alguns segundos
+GOOGLE_MAPS_FAILURE_THRESHOLD = int(os.getenv("GOOGLE_MAPS_FAILURE_THRESHOLD", "5"))
+GOOGLE_MAPS_RESET_TIMEOUT = float(os.getenv("GOOGLE_MAPS_RESET_TIMEOUT", "30"))
+
+# Status da API que indicam problema no serviço (e não ausência de resultado)
+FAILURE_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+class CircuitBreaker:
+    """Circuit breaker simples: fechado -> aberto após falhas seguidas -> meio-aberto após o tempo de espera"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        # Depois do tempo de espera, deixa passar uma tentativa (meio-aberto)
+        return time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+class GoogleMapsService(Geocoder):
+    name = "google"
+
     def __init__(self):
         self.api_key = GOOGLE_MAPS_API_KEY
         self.geocoding_url = "https://maps.googleapis.com/maps/api/geocode/json"
         self.reverse_geocoding_url = "https://maps.googleapis.com/maps/api/geocode/json"
-    
-    def get_address_from_coordinates(self, latitude: float, longitude: float) -> Optional[str]:
+        self.circuit_breaker = CircuitBreaker(GOOGLE_MAPS_FAILURE_THRESHOLD, GOOGLE_MAPS_RESET_TIMEOUT)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Cliente HTTP compartilhado, com pool de conexões keep-alive (criado sob demanda)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    GOOGLE_MAPS_READ_TIMEOUT,
+                    connect=GOOGLE_MAPS_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=GOOGLE_MAPS_MAX_CONNECTIONS,
+                    max_keepalive_connections=GOOGLE_MAPS_MAX_CONNECTIONS
+                )
+            )
+            self._semaphore = asyncio.Semaphore(GOOGLE_MAPS_MAX_CONCURRENCY)
+        return self._client
+
+    async def close(self):
+        """Fecha o cliente HTTP (chamado no desligamento da aplicação)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    async def _geocode(self, url: str, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Faz a chamada à API respeitando o limite de concorrência e o circuit breaker.
+        Retorna o primeiro resultado ou None.
+        """
+        if self.circuit_breaker.is_open:
+            print("Google Maps API indisponível (circuit breaker aberto)")
+            return None
+
+        client = self._get_client()
+        try:
+            async with self._semaphore:
+                response = await client.get(url, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            self.circuit_breaker.record_failure()
+            print(f"Erro ao consultar Google Maps API: {e}")
+            return None
+
+        if data.get("status") in FAILURE_STATUSES:
+            self.circuit_breaker.record_failure()
+            print(f"Erro ao consultar Google Maps API: {data.get('status')}")
+            return None
+
+        self.circuit_breaker.record_success()
+        if data.get("status") == "OK" and data.get("results"):
+            return data["results"][0]
+        return None
+
+    async def get_address_from_coordinates(self, latitude: float, longitude: float) -> Optional[str]:
         """
         Converte coordenadas (lat, lng) em endereço usando a API do Google Maps
         """
         if not self.api_key:
             return None
-            
+
         params = {
             "latlng": f"{latitude},{longitude}",
             "key": self.api_key,
             "language": "pt-BR"
         }
-        
-        try:
-            response = requests.get(self.reverse_geocoding_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if data["status"] == "OK" and data["results"]:
-                # Retorna o endereço formatado mais detalhado
-                return data["results"][0]["formatted_address"]
-            else:
-                return None
-                
-        except requests.RequestException as e:
-            print(f"Erro ao consultar Google Maps API: {e}")
-            return None
-    
-    def get_coordinates_from_address(self, address: str) -> Optional[Dict[str, float]]:
+
+        result = await self._geocode(self.reverse_geocoding_url, params)
+        if result:
+            # Retorna o endereço formatado mais detalhado
+            return result["formatted_address"]
+        return None
+
+    async def get_coordinates_from_address(self, address: str) -> Optional[Dict[str, float]]:
         """
         Converte endereço em coordenadas (lat, lng) usando a API do Google Maps
         """
         if not self.api_key:
             return None
-            
+
         params = {
             "address": address,
             "key": self.api_key,
             "language": "pt-BR"
         }
-        
-        try:
-            response = requests.get(self.geocoding_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if data["status"] == "OK" and data["results"]:
-                location = data["results"][0]["geometry"]["location"]
-                return {
-                    "latitude": location["lat"],
-                    "longitude": location["lng"]
-                }
-            else:
-                return None
-                
-        except requests.RequestException as e:
-            print(f"Erro ao consultar Google Maps API: {e}")
-            return None
-    
-    def validate_api_key(self) -> bool:
+
+        result = await self._geocode(self.geocoding_url, params)
+        if result:
+            location = result["geometry"]["location"]
+            return {
+                "latitude": location["lat"],
+                "longitude": location["lng"]
+            }
+        return None
+
+    async def validate_api_key(self) -> bool:
         """
         Valida se a chave da API do Google Maps está funcionando
         """
         if not self.api_key:
             return False
-            
+
         # Testa com coordenadas conhecidas (Brasília)
-        result = self.get_address_from_coordinates(-15.7942, -47.8822)
+        result = await self.get_address_from_coordinates(-15.7942, -47.8822)
         return result is not None
 
 # Instância global do serviço
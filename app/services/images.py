@@ -0,0 +1,193 @@
+"""
+Processamento de imagens enviadas (avatares e fotos de veículos).
+
+A imagem original não é guardada: cada upload vira miniaturas de tamanho fixo
+em WebP, então a tabela de usuários baixa alguns KB para mostrar um círculo de
+45 px em vez do arquivo enviado (até 5 MB).
+
+- avatares: quadrados com recorte central (``AVATAR_SIZES``, ex.: 48, 96 e 256 px)
+- veículos: proporção original, limitada ao lado maior (``VEHICLE_IMAGE_SIZES``)
+- a orientação do EXIF é aplicada aos pixels e os metadados (EXIF, GPS, perfil
+  ICC) não são copiados para as miniaturas
+- o arquivo enviado não é lido inteiro para a memória: o Starlette o recebe em
+  partes para um temporário (em disco acima de 1 MB) e, em um pool de threads
+  fora do event loop, o tipo é conferido pelos primeiros bytes (o
+  ``Content-Type`` do cliente não é confiável) antes do Pillow decodificar
+- imagens com mais de ``MAX_IMAGE_PIXELS`` pixels são recusadas antes de serem
+  decodificadas (proteção contra "bombas" de descompressão)
+
+O limite de bytes (``IMAGE_MAX_BYTES``) é aplicado enquanto o corpo chega, pelo
+``UploadLimitMiddleware``.
+
+As miniaturas ficam lado a lado com o mesmo prefixo e o tamanho no nome
+(``public/blobs/3f/<hash>_96.webp``, gravadas por ``services.blob_store``); o
+link salvo no banco aponta para a maior e ``variant_links`` deriva as demais a
+partir dele.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+load_dotenv()
+
+
+def _sizes(value: str) -> tuple:
+    return tuple(sorted(int(size) for size in value.split(",")))
+
+
+AVATAR_SIZES = _sizes(os.getenv("SGUV_AVATAR_SIZES", "48,96,256"))
+VEHICLE_IMAGE_SIZES = _sizes(os.getenv("SGUV_VEHICLE_IMAGE_SIZES", "160,640,1280"))
+# "webp" é lido pelo cliente Flet em todas as plataformas; "avif" fica menor, mas não é suportado pelo Flutter
+IMAGE_FORMAT = os.getenv("SGUV_IMAGE_FORMAT", "webp").lower()
+IMAGE_QUALITY = int(os.getenv("SGUV_IMAGE_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("SGUV_IMAGE_WORKERS", str(min(4, os.cpu_count() or 2))))
+IMAGE_MAX_BYTES = int(os.getenv("SGUV_IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("SGUV_MAX_IMAGE_PIXELS", str(40_000_000)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+_image_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="sguv-image")
+
+# Assinaturas (primeiros bytes) dos formatos aceitos
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+)
+
+# "..._256.webp" -> prefixo e tamanho
+_VARIANT_NAME = re.compile(r"^(?P<stem>.+)_(?P<size>\d+)\.(?:webp|avif)$")
+
+
+class ImagemInvalida(ValueError):
+    """Arquivo que não é uma imagem aceita, maior que o limite ou ilegível"""
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """Formato da imagem pelos primeiros bytes do arquivo (None se não é um formato aceito)"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    for signature, image_format in _SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+
+def _check_upload(source: BinaryIO, max_bytes: int) -> str:
+    # Tamanho pela posição final do arquivo, sem lê-lo
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    if size > max_bytes:
+        raise ImagemInvalida(f"Arquivo muito grande. Máximo {max_bytes // (1024 * 1024)}MB")
+    source.seek(0)
+    image_format = sniff_image_format(source.read(16))
+    source.seek(0)
+    if image_format is None:
+        raise ImagemInvalida("Formato de arquivo não suportado. Use: JPEG, PNG, GIF, BMP ou WebP")
+    return image_format
+
+
+def content_digest(source: BinaryIO, crop: bool) -> str:
+    """
+    sha256 do arquivo enviado e dos parâmetros de conversão: o mesmo arquivo
+    convertido do mesmo jeito gera as mesmas miniaturas, então o hash as identifica
+    """
+    digest = hashlib.sha256(f"{IMAGE_FORMAT}:{IMAGE_QUALITY}:{'crop' if crop else 'contain'}\n".encode())
+    source.seek(0)
+    for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def make_variants(source: BinaryIO, sizes: Sequence[int], crop: bool = True,
+                  max_bytes: int = IMAGE_MAX_BYTES) -> Dict[int, bytes]:
+    """
+    Gera uma miniatura para cada tamanho pedido: quadrada com recorte central
+    (``crop``) ou com a proporção original e o lado maior limitado ao tamanho.
+    """
+    image_format = _check_upload(source, max_bytes)
+    try:
+        with Image.open(source, formats=[image_format]) as image:
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                raise ImagemInvalida(f"Imagem muito grande ({image.width}x{image.height} pixels)")
+            # JPEG: decodifica direto em uma escala reduzida quando a maior miniatura cabe nela
+            image.draft("RGB", (max(sizes), max(sizes)))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            # Sem EXIF, XMP nem perfil ICC nas miniaturas (o Pillow os copiaria de image.info)
+            image.info.clear()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as error:
+        raise ImagemInvalida("Arquivo não é uma imagem válida") from error
+
+    variants = {}
+    # Do maior para o menor: cada miniatura é reduzida a partir da anterior
+    for size in sorted(sizes, reverse=True):
+        if crop:
+            image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        elif max(image.size) > size:
+            image = ImageOps.contain(image, (size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format=IMAGE_FORMAT.upper(), quality=IMAGE_QUALITY)
+        variants[size] = buffer.getvalue()
+    return variants
+
+
+def contained_size(width: int, height: int, size: int) -> Tuple[int, int]:
+    """Dimensões de uma imagem ``width`` x ``height`` reduzida para caber em ``size`` x ``size`` (como ``ImageOps.contain``)"""
+    if max(width, height) <= size:
+        return width, height
+    if width >= height:
+        return size, max(1, round(height * size / width))
+    return max(1, round(width * size / height)), size
+
+
+def image_dimensions(path: Path) -> Tuple[int, int]:
+    """Largura e altura de uma imagem já gravada (só o cabeçalho é lido)"""
+    with Image.open(path) as image:
+        return image.size
+
+
+async def run_in_image_pool(function: Callable[..., Any], *args) -> Any:
+    """Executa uma etapa de processamento de imagem no pool, fora do event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_image_pool, function, *args)
+
+
+def variant_links(link: Optional[str], sizes: Sequence[int] = AVATAR_SIZES) -> Dict[str, str]:
+    """
+    Caminho de cada tamanho a partir do link salvo (a maior miniatura).
+    Imagens enviadas antes das miniaturas existirem usam o mesmo arquivo em todos os tamanhos.
+    """
+    if not link:
+        return {}
+    directory, _, name = link.rpartition("/")
+    match = _VARIANT_NAME.match(name)
+    if not match:
+        return {str(size): link for size in sizes}
+    extension = name.rsplit(".", 1)[1]
+    prefix = f"{directory}/" if directory else ""
+    return {str(size): f"{prefix}{match['stem']}_{size}.{extension}" for size in sizes}
+
+
+def delete_variants(project_root: Path, link: Optional[str], sizes: Sequence[int] = AVATAR_SIZES):
+    """
+    Remove do disco todas as miniaturas (ou o arquivo único) de um link salvo por
+    versões anteriores. Imagens em ``public/blobs`` são removidas pela coleta do
+    ``blob_store``, quando ficam sem referências.
+    """
+    if not link or link.startswith(("http", "public/blobs/")):
+        return
+    for path in set(variant_links(link, sizes).values()):
+        file_path = project_root / path if path.startswith("public/") else Path(path)
+        if file_path.exists():
+            file_path.unlink()
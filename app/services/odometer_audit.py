@@ -0,0 +1,224 @@
+"""
+Auditoria de consistência do hodômetro.
+
+Varre todo o histórico de controles e rotas de uma vez, ordenado por
+veículo e data, e registra em ``inconsistencias_odometro``:
+
+- ``lacuna_entre_controles``: o ``km_inicial`` de um controle é maior que o
+  ``km_final`` do controle anterior do mesmo veículo (km sem registro)
+- ``regressao_entre_controles``: o ``km_inicial`` é menor que o ``km_final``
+  do controle anterior (hodômetro voltou)
+- ``controle_regressivo``: ``km_final`` menor que ``km_inicial`` no mesmo controle
+- ``rota_regressiva``: ``km_chegada`` menor que ``km_saida`` na mesma rota
+- ``rota_sobreposta``: ``km_saida`` menor que o ``km_chegada`` da rota anterior
+  do mesmo controle
+- ``rota_fora_do_controle``: rota com km fora do intervalo do controle
+
+As comparações são feitas com NumPy sobre colunas inteiras, sem laços por
+linha; a tabela de inconsistências é substituída em uma única transação.
+
+Execução manual (a partir do diretório ``app``):
+    python -m services.odometer_audit
+"""
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from models import ControleUtilizacaoVeiculo, InconsistenciaOdometro, Rota
+
+load_dotenv()
+
+# Diferenças menores que isso (em km) são ignoradas
+ODOMETER_TOLERANCE_KM = float(os.getenv("ODOMETER_TOLERANCE_KM", "0.1"))
+
+
+def _floats(values) -> np.ndarray:
+    # O NumPy converte None em NaN ao criar arrays float
+    return np.array(values, dtype=np.float64)
+
+
+def _texts(values) -> np.ndarray:
+    return np.array(["" if v is None else v for v in values], dtype=str)
+
+
+def _fetch_rows(db: Session, stmt) -> List[tuple]:
+    """
+    Executa o SELECT direto no cursor do driver.
+    Em milhões de linhas, a criação dos objetos Row do SQLAlchemy custa mais
+    que a própria leitura; aqui só precisamos das tuplas para montar as colunas.
+    """
+    compiled = stmt.compile(bind=db.get_bind(), compile_kwargs={"literal_binds": True})
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(str(compiled))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _findings(tipo: str, mask: np.ndarray, columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """Converte as linhas marcadas em ``mask`` em registros de inconsistência"""
+    indexes = np.flatnonzero(mask)
+    if indexes.size == 0:
+        return []
+    selected = {name: values[indexes].tolist() for name, values in columns.items()}
+    rows = []
+    for i in range(indexes.size):
+        row = {name: values[i] for name, values in selected.items()}
+        row["tipo"] = tipo
+        row["diferenca"] = round(row["km_encontrado"] - row["km_esperado"], 3)
+        rows.append(row)
+    return rows
+
+
+def audit_controls(db: Session, tolerance: float = ODOMETER_TOLERANCE_KM) -> List[Dict]:
+    """Compara cada controle com o anterior do mesmo veículo"""
+    stmt = select(
+        ControleUtilizacaoVeiculo.id,
+        ControleUtilizacaoVeiculo.veiculo_id,
+        ControleUtilizacaoVeiculo.data_inicio,
+        ControleUtilizacaoVeiculo.km_inicial,
+        ControleUtilizacaoVeiculo.km_final,
+    ).where(ControleUtilizacaoVeiculo.status != "cancelado")
+    rows = _fetch_rows(db, stmt)
+    if not rows:
+        return []
+
+    ids, veiculos, datas, km_inicial, km_final = zip(*rows)
+    ids = np.array(ids, dtype=np.int64)
+    veiculos = np.array(veiculos, dtype=np.int64)
+    datas = _texts(datas)
+    km_inicial = _floats(km_inicial)
+    km_final = _floats(km_final)
+
+    # Ordena por veículo, data de início e id (a última chave é a principal)
+    order = np.lexsort((ids, datas, veiculos))
+    ids, veiculos, datas = ids[order], veiculos[order], datas[order]
+    km_inicial, km_final = km_inicial[order], km_final[order]
+
+    findings = []
+
+    # Dentro do próprio controle
+    with np.errstate(invalid="ignore"):
+        regressivo = (km_final - km_inicial) < -tolerance
+    findings += _findings("controle_regressivo", regressivo, {
+        "veiculo_id": veiculos, "controle_id": ids, "data": datas,
+        "km_esperado": km_inicial, "km_encontrado": km_final,
+    })
+
+    # Entre controles consecutivos do mesmo veículo
+    mesmo_veiculo = veiculos[1:] == veiculos[:-1]
+    anterior_final = km_final[:-1]
+    with np.errstate(invalid="ignore"):
+        diferenca = km_inicial[1:] - anterior_final
+    consecutivos = {
+        "veiculo_id": veiculos[1:], "controle_id": ids[1:], "data": datas[1:],
+        "km_esperado": anterior_final, "km_encontrado": km_inicial[1:],
+    }
+    with np.errstate(invalid="ignore"):
+        findings += _findings("lacuna_entre_controles", mesmo_veiculo & (diferenca > tolerance), consecutivos)
+        findings += _findings("regressao_entre_controles", mesmo_veiculo & (diferenca < -tolerance), consecutivos)
+    return findings
+
+
+def audit_routes(db: Session, tolerance: float = ODOMETER_TOLERANCE_KM) -> List[Dict]:
+    """Verifica a monotonicidade das rotas dentro de cada controle"""
+    stmt = (
+        select(
+            Rota.id,
+            Rota.controle_utilizacao_id,
+            ControleUtilizacaoVeiculo.veiculo_id,
+            Rota.data_hora_saida,
+            Rota.km_saida,
+            Rota.km_chegada,
+            ControleUtilizacaoVeiculo.km_inicial,
+            ControleUtilizacaoVeiculo.km_final,
+        )
+        .join(ControleUtilizacaoVeiculo, Rota.controle_utilizacao_id == ControleUtilizacaoVeiculo.id)
+        .where(ControleUtilizacaoVeiculo.status != "cancelado")
+    )
+    rows = _fetch_rows(db, stmt)
+    if not rows:
+        return []
+
+    ids, controles, veiculos, datas, km_saida, km_chegada, ctrl_inicial, ctrl_final = zip(*rows)
+    ids = np.array(ids, dtype=np.int64)
+    controles = np.array(controles, dtype=np.int64)
+    veiculos = np.array(veiculos, dtype=np.int64)
+    datas = _texts(datas)
+    km_saida, km_chegada = _floats(km_saida), _floats(km_chegada)
+    ctrl_inicial, ctrl_final = _floats(ctrl_inicial), _floats(ctrl_final)
+
+    order = np.lexsort((ids, datas, controles))
+    ids, controles, veiculos, datas = ids[order], controles[order], veiculos[order], datas[order]
+    km_saida, km_chegada = km_saida[order], km_chegada[order]
+    ctrl_inicial, ctrl_final = ctrl_inicial[order], ctrl_final[order]
+
+    base = {"veiculo_id": veiculos, "controle_id": controles, "rota_id": ids, "data": datas}
+    findings = []
+
+    with np.errstate(invalid="ignore"):
+        # Dentro da própria rota
+        findings += _findings("rota_regressiva", (km_chegada - km_saida) < -tolerance, {
+            **base, "km_esperado": km_saida, "km_encontrado": km_chegada,
+        })
+
+        # Entre rotas consecutivas do mesmo controle
+        mesmo_controle = controles[1:] == controles[:-1]
+        sobreposta = mesmo_controle & ((km_saida[1:] - km_chegada[:-1]) < -tolerance)
+        findings += _findings("rota_sobreposta", sobreposta, {
+            **{name: values[1:] for name, values in base.items()},
+            "km_esperado": km_chegada[:-1], "km_encontrado": km_saida[1:],
+        })
+
+        # Fora do intervalo do controle
+        abaixo = (km_saida - ctrl_inicial) < -tolerance
+        findings += _findings("rota_fora_do_controle", abaixo, {
+            **base, "km_esperado": ctrl_inicial, "km_encontrado": km_saida,
+        })
+        acima = (km_chegada - ctrl_final) > tolerance
+        findings += _findings("rota_fora_do_controle", acima, {
+            **base, "km_esperado": ctrl_final, "km_encontrado": km_chegada,
+        })
+    return findings
+
+
+def run_audit(db: Session, tolerance: float = ODOMETER_TOLERANCE_KM) -> Dict[str, int]:
+    """
+    Executa a auditoria completa e substitui as inconsistências gravadas.
+    Retorna a contagem por tipo.
+    """
+    start = time.perf_counter()
+    findings = audit_controls(db, tolerance) + audit_routes(db, tolerance)
+
+    detectado_em = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for finding in findings:
+        finding.setdefault("rota_id", None)
+        finding["detectado_em"] = detectado_em
+
+    db.execute(delete(InconsistenciaOdometro))
+    if findings:
+        db.execute(insert(InconsistenciaOdometro), findings)
+    db.commit()
+
+    summary: Dict[str, int] = {}
+    for finding in findings:
+        summary[finding["tipo"]] = summary.get(finding["tipo"], 0) + 1
+    print(f"Auditoria de hodômetro: {len(findings)} inconsistências em {time.perf_counter() - start:.2f}s")
+    return summary
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"✅ {run_audit(db)}")
+    finally:
+        db.close()
@@ -0,0 +1,162 @@
+"""
+Cálculo das métricas derivadas das rotas.
+
+Para cada rota são calculados, de forma vetorizada (NumPy) sobre lotes
+inteiros:
+
+- ``distancia_km``: distância em linha reta (haversine) entre saída e chegada
+- ``km_percorrido``: diferença do hodômetro (``km_chegada - km_saida``)
+- ``duracao_minutos``: tempo entre ``data_hora_saida`` e ``data_hora_chegada``
+- ``velocidade_media_kmh``: ``km_percorrido`` dividido pela duração
+
+Valores que não podem ser calculados (rota ainda sem chegada, coordenadas
+ausentes, datas inválidas) ficam como ``None``.
+
+Recalcular todas as rotas (a partir do diretório ``app``):
+    python -m services.route_metrics --batch-size 5000
+"""
+import argparse
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from models import Rota
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Campos da rota usados no cálculo; alterar qualquer um deles exige recalcular
+INPUT_FIELDS = (
+    "data_hora_saida", "km_saida", "latitude_saida", "longitude_saida",
+    "data_hora_chegada", "km_chegada", "latitude_chegada", "longitude_chegada",
+)
+METRIC_FIELDS = ("distancia_km", "km_percorrido", "duracao_minutos", "velocidade_media_kmh")
+
+
+def _floats(values: Iterable[Optional[float]]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _datetimes(values: Iterable[Optional[str]]) -> np.ndarray:
+    """Converte textos 'YYYY-MM-DD HH:MM:SS' em datetime64 (NaT para vazios/inválidos)"""
+    texts = [v if v else "NaT" for v in values]
+    try:
+        return np.array(texts, dtype="datetime64[s]")
+    except ValueError:
+        # Algum valor inválido no lote: converte um a um
+        parsed = []
+        for text in texts:
+            try:
+                parsed.append(np.datetime64(text, "s"))
+            except ValueError:
+                parsed.append(np.datetime64("NaT"))
+        return np.array(parsed, dtype="datetime64[s]")
+
+
+def haversine_km(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Distância em km entre pares de pontos (arrays em graus)"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def compute_metrics(columns: Dict[str, Sequence]) -> Dict[str, np.ndarray]:
+    """
+    Calcula as métricas para um lote de rotas.
+
+    ``columns`` mapeia cada campo de ``INPUT_FIELDS`` para uma sequência com
+    um valor por rota. Retorna arrays float64 (NaN onde não há valor).
+    """
+    lat1 = _floats(columns["latitude_saida"])
+    lon1 = _floats(columns["longitude_saida"])
+    lat2 = _floats(columns["latitude_chegada"])
+    lon2 = _floats(columns["longitude_chegada"])
+    km_saida = _floats(columns["km_saida"])
+    km_chegada = _floats(columns["km_chegada"])
+    saida = _datetimes(columns["data_hora_saida"])
+    chegada = _datetimes(columns["data_hora_chegada"])
+
+    distancia = haversine_km(lat1, lon1, lat2, lon2)
+    km_percorrido = km_chegada - km_saida
+    duracao = (chegada - saida).astype("timedelta64[s]").astype(np.float64) / 60.0
+    duracao[np.isnat(chegada) | np.isnat(saida)] = np.nan
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        velocidade = np.where(duracao > 0, km_percorrido / (duracao / 60.0), np.nan)
+
+    return {
+        "distancia_km": distancia,
+        "km_percorrido": km_percorrido,
+        "duracao_minutos": duracao,
+        "velocidade_media_kmh": velocidade,
+    }
+
+
+def metrics_rows(columns: Dict[str, Sequence]) -> List[Dict[str, Optional[float]]]:
+    """Mesmo que compute_metrics, mas devolve uma lista de dicts prontos para gravar"""
+    metrics = compute_metrics(columns)
+    # Arredonda no NumPy e converte para listas Python de uma vez; NaN vira None
+    lists = {field: np.round(metrics[field], 3).tolist() for field in METRIC_FIELDS}
+    return [
+        {field: (value if value == value else None) for field, value in zip(METRIC_FIELDS, values)}
+        for values in zip(*(lists[field] for field in METRIC_FIELDS))
+    ]
+
+
+def apply_route_metrics(rotas: Sequence[Rota]):
+    """Recalcula as métricas de objetos Rota já carregados (antes do commit)"""
+    if not rotas:
+        return
+    columns = {field: [getattr(rota, field) for rota in rotas] for field in INPUT_FIELDS}
+    for rota, values in zip(rotas, metrics_rows(columns)):
+        for field, value in values.items():
+            setattr(rota, field, value)
+
+
+def recompute_all(db: Session, batch_size: int = 5000, only_missing: bool = False) -> int:
+    """
+    Recalcula as métricas de todas as rotas, em lotes ordenados por id.
+    Cada lote é lido com um único SELECT de colunas e gravado com um UPDATE em lote.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        query = select(Rota.id, *(getattr(Rota, field) for field in INPUT_FIELDS)).where(Rota.id > last_id)
+        if only_missing:
+            query = query.where(Rota.km_chegada.isnot(None), Rota.km_percorrido.is_(None))
+        rows = db.execute(query.order_by(Rota.id).limit(batch_size)).all()
+        if not rows:
+            break
+
+        ids = [row[0] for row in rows]
+        columns = {field: [row[i + 1] for row in rows] for i, field in enumerate(INPUT_FIELDS)}
+        updates = [{"id": rota_id, **values} for rota_id, values in zip(ids, metrics_rows(columns))]
+        db.execute(update(Rota), updates)
+        db.commit()
+
+        total += len(rows)
+        last_id = ids[-1]
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula distância, duração e velocidade das rotas")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--only-missing", action="store_true", help="Apenas rotas finalizadas ainda sem métricas")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        total = recompute_all(db, batch_size=args.batch_size, only_missing=args.only_missing)
+        print(f"✅ Métricas recalculadas para {total} rotas")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
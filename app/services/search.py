@@ -0,0 +1,172 @@
+"""
+Busca textual (SQLite FTS5) em usuários, veículos e endereços das rotas.
+
+Cada tabela tem um índice FTS5 de conteúdo externo (o texto fica só na tabela
+original; o índice guarda os termos) mantido por triggers, então qualquer
+escrita — ORM, INSERT em lote, UPDATE ... RETURNING — atualiza a busca sem
+passar pelo CRUD:
+
+- ``usuarios_fts``: nome, matrícula e email
+- ``veiculos_fts``: placa, marca e modelo
+- ``rotas_fts``: logradouros de saída e de chegada
+
+A tokenização ignora acentos e maiúsculas ("joão" encontra "JOAO") e cada
+termo digitado é buscado como prefixo ("rua flo" encontra "Rua das Flores");
+termos de uma letra só casam com a palavra inteira. Os índices de prefixo de
+2 a 4 letras evitam juntar as listas de todos os termos com o mesmo início.
+
+Ordenação: o BM25 do SQLite precisa pontuar todos os documentos encontrados,
+o que custa dezenas de ms quando a consulta é genérica ("jo" em 200 mil
+rotas). Por isso, se um índice encontra mais de ``BROAD_QUERY_THRESHOLD``
+documentos, a consulta é considerada ampla e devolve os mais recentes (maior
+id), com score 0; abaixo disso, os resultados vêm ordenados por relevância.
+
+Medir a latência em uma base grande (a partir da raiz do projeto):
+    python bench_search.py --rows 200000
+"""
+import re
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+TOKENIZE = "unicode61 remove_diacritics 2"
+PREFIX_INDEXES = "2 3 4"
+
+# Acima desta quantidade de documentos encontrados em um índice, não ordena por relevância
+BROAD_QUERY_THRESHOLD = 1000
+
+# tabela FTS -> (tabela de origem, colunas indexadas, pesos do BM25)
+INDICES = {
+    "usuarios_fts": ("usuarios", ("nome", "matricula", "email"), (10.0, 8.0, 2.0)),
+    "veiculos_fts": ("veiculos", ("placa", "marca", "modelo"), (10.0, 3.0, 3.0)),
+    "rotas_fts": ("rotas", ("logradouro_saida", "logradouro_chegada"), (1.0, 1.0)),
+}
+
+TIPOS = {"usuarios": "usuarios_fts", "veiculos": "veiculos_fts", "rotas": "rotas_fts"}
+
+# Colunas devolvidas para cada tipo (a partir da tabela de origem, apelidada "t")
+_SELECTS = {
+    "usuarios": "t.nome AS titulo, t.matricula || ' · ' || t.email AS subtitulo, NULL AS controle_id",
+    "veiculos": "t.placa AS titulo, t.marca || ' ' || t.modelo AS subtitulo, NULL AS controle_id",
+    "rotas": (
+        "coalesce(t.logradouro_saida, '?') || ' → ' || coalesce(t.logradouro_chegada, '?') AS titulo, "
+        "t.data_hora_saida AS subtitulo, t.controle_utilizacao_id AS controle_id"
+    ),
+}
+
+
+def _ddl(fts: str, source: str, columns: Sequence[str]) -> List[str]:
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{source}', content_rowid='id', tokenize='{TOKENIZE}', prefix='{PREFIX_INDEXES}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN {delete} END",
+        # Só reindexa quando uma coluna pesquisável muda (ex.: não a cada troca de status)
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {source} BEGIN {delete} {insert} END",
+    ]
+
+
+def create_search_index(engine: Engine):
+    """Cria índices e triggers que faltam; índices novos em bancos já populados são reconstruídos"""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        existing = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+        for fts, (source, columns, _) in INDICES.items():
+            for ddl in _ddl(fts, source, columns):
+                conn.execute(text(ddl))
+            if fts not in existing:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def rebuild_search_index(conn: Connection):
+    """Reconstrói todos os índices a partir das tabelas de origem"""
+    for fts in INDICES:
+        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def match_query(query: str) -> Optional[str]:
+    """
+    Converte o texto digitado em uma consulta FTS5: cada palavra vira um termo
+    entre aspas, buscado como prefixo se tiver mais de uma letra (todas precisam
+    aparecer). Operadores e aspas do usuário são descartados, então a consulta
+    nunca é inválida. None se não há palavras.
+    """
+    terms = re.findall(r"\w+", query or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' if len(term) > 1 else f'"{term}"' for term in terms)
+
+
+def search(db: Session, query: str, tipos: Sequence[str] = tuple(TIPOS), limit: int = 20) -> List[Dict]:
+    """
+    Busca em cada índice pedido e junta os resultados pela relevância.
+    Cada índice devolve no máximo ``limit`` linhas; só essas são lidas da
+    tabela de origem.
+    """
+    match = match_query(query)
+    if match is None:
+        return []
+
+    results = []
+    for tipo in tipos:
+        fts = TIPOS[tipo]
+        source, _, weights = INDICES[fts]
+        # Percorrer os ids em ordem decrescente é barato e para no N-ésimo documento
+        broad = db.execute(
+            text(f"SELECT rowid FROM {fts} WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT 1 OFFSET :offset"),
+            {"match": match, "offset": BROAD_QUERY_THRESHOLD - 1}
+        ).first() is not None
+        if broad:
+            ranked = f"SELECT rowid AS id, 0.0 AS score FROM {fts} WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT :limit"
+        else:
+            ranked = (
+                f"SELECT rowid AS id, bm25({fts}, {', '.join(map(str, weights))}) AS score "
+                f"FROM {fts} WHERE {fts} MATCH :match ORDER BY score LIMIT :limit"
+            )
+        sql = text(
+            f"SELECT '{tipo}' AS tipo, t.id AS id, {_SELECTS[tipo]}, m.score AS score "
+            f"FROM ({ranked}) m JOIN {source} t ON t.id = m.id ORDER BY m.score"
+        )
+        results.extend(dict(row._mapping) for row in db.execute(sql, {"match": match, "limit": limit}))
+
+    # BM25 do SQLite: quanto menor (mais negativo), mais relevante
+    results.sort(key=lambda row: row["score"])
+    return results[:limit]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Busca textual em usuários, veículos e rotas")
+    parser.add_argument("query", nargs="?", help="Texto a buscar")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstrói os índices antes de buscar")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    create_search_index(engine)
+    if args.rebuild:
+        with engine.begin() as conn:
+            rebuild_search_index(conn)
+        print("Índices de busca reconstruídos")
+    if args.query:
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            rows = search(db, args.query, limit=args.limit)
+            elapsed = (time.perf_counter() - start) * 1000
+        finally:
+            db.close()
+        for row in rows:
+            print(f"{row['score']:8.2f}  {row['tipo']:<9} #{row['id']:<7} {row['titulo']}  ({row['subtitulo']})")
+        print(f"{len(rows)} resultado(s) em {elapsed:.1f} ms")
@@ -0,0 +1,76 @@
+"""
+Limite de tamanho dos uploads, aplicado enquanto o corpo chega.
+
+O FastAPI só chama o endpoint depois de receber o formulário inteiro (o
+arquivo vai para um temporário em disco acima de 1 MB), então um limite
+verificado dentro do endpoint chega tarde: o servidor já recebeu e gravou o
+arquivo todo. Este middleware confere o tamanho antes:
+
+- ``Content-Length`` acima do limite responde 413 sem ler o corpo
+- sem ``Content-Length`` (envio em partes), os bytes são contados à medida que
+  chegam e o envio é interrompido com 413 assim que passam do limite
+
+Cada limite vale para os caminhos que casam com a expressão regular
+correspondente (ex.: ``^/api/users/\\d+/avatar$``).
+"""
+import re
+from typing import Optional, Sequence, Tuple
+
+from starlette.requests import ClientDisconnect
+
+from idempotency import _send_json
+
+
+class UploadLimitMiddleware:
+    """Middleware ASGI que recusa corpos maiores que o limite do caminho (ver docstring do módulo)"""
+
+    def __init__(self, app, limits: Sequence[Tuple[str, int]]):
+        self.app = app
+        self.limits = [(re.compile(pattern), max_bytes) for pattern, max_bytes in limits]
+
+    def _limit_for(self, path: str) -> Optional[int]:
+        for pattern, max_bytes in self.limits:
+            if pattern.match(path):
+                return max_bytes
+        return None
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Arquivo muito grande. Máximo {max_bytes // (1024 * 1024)}MB"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            await _send_json(send, 413, detail)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Para de ler: o parser do formulário vê a conexão encerrada e desiste
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limited_send(message):
+            # Depois do limite, a resposta do endpoint (erro ao ler o formulário) é trocada pelo 413
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except ClientDisconnect:
+            if not exceeded:
+                raise
+        if exceeded:
+            await _send_json(send, 413, detail)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark da troca de telas do painel administrativo (Flet).
+
+Popula um banco SQLite temporário, abre o AdminDashboardView contra a API
+(TestClient, sem rede) em uma página Flet ligada a uma conexão que só
+registra as mensagens, e simula cliques no menu lateral. Para cada tela mede:
+
+- latência do clique até as mensagens de atualização estarem serializadas
+  para o cliente Flet (o que vai pelo websocket)
+- bytes enviados ao cliente por clique
+
+Depois mede ações feitas por diálogos na tela de usuários (editar e ativar/
+desativar): do clique no botão de confirmação até a tabela atualizada.
+
+Uso:
+    python bench_admin_ui.py --users 2000 --rounds 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Banco temporário (precisa ser definido antes de importar o módulo database)
+_tmp_dir = tempfile.mkdtemp(prefix="sguv_bench_ui_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("GEOCODER_PROVIDER", "fake")
+os.environ["SGUV_OFFLINE_QUEUE"] = os.path.join(_tmp_dir, "rotas_pendentes.json")
+os.environ["SGUV_IMAGE_CACHE_DIR"] = os.path.join(_tmp_dir, "imagens")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+os.chdir(os.path.join(ROOT, "app"))
+
+import flet as ft  # noqa: E402
+from flet_core.local_connection import LocalConnection  # noqa: E402
+from flet_core.protocol import ClientActions, ClientMessage, CommandEncoder, PageCommandsBatchResponsePayload  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from database import engine  # noqa: E402
+from models import Usuario, Veiculo, ControleUtilizacaoVeiculo  # noqa: E402
+import main  # noqa: E402
+from flet_app.api_client import SGUVApiClient  # noqa: E402
+from flet_app.views.admin_dashboard_view import AdminDashboardView  # noqa: E402
+
+VIEWS = ["users", "vehicles", "usage", "dashboard", "reports"]
+# ação -> método que abre o diálogo (o último botão do diálogo confirma)
+ACTIONS = {"editar": "edit_user", "ativar/desativar": "toggle_user_status"}
+
+
+class RecordingConnection(LocalConnection):
+    """Conexão Flet que, em vez de enviar, só conta as mensagens e os bytes"""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_sent = 0
+        self.messages_sent = 0
+
+    def _record(self, message):
+        self.bytes_sent += len(json.dumps(message, cls=CommandEncoder, separators=(",", ":")))
+        self.messages_sent += 1
+
+    def send_command(self, session_id, command):
+        return self.send_commands(session_id, [command])
+
+    def send_commands(self, session_id, commands):
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ["add", "get"]:
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self._record(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+
+def setup(users: int):
+    with engine.begin() as conn:
+        conn.execute(insert(Usuario), [{
+            "matricula": f"M{i:07d}", "nome": f"Motorista {i}", "email": f"motorista{i}@sguv.com",
+            "status": "ativo", "perfil": "motorista", "senha_hash": "x",
+        } for i in range(users)])
+        conn.execute(insert(Veiculo), [{
+            "marca": "Fiat", "modelo": "Strada", "placa": f"BEN{i:05d}", "status": "disponivel",
+        } for i in range(max(users // 2, 1))])
+        conn.execute(insert(ControleUtilizacaoVeiculo), [{
+            "motorista_id": 2 + i % users, "veiculo_id": 1 + i % max(users // 2, 1),
+            "data_inicio": "2024-01-01 08:00:00", "km_inicial": 0, "status": "finalizado",
+        } for i in range(users)])
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Latência e tráfego da troca de telas do painel administrativo")
+    parser.add_argument("--users", type=int, default=2000, help="Usuários cadastrados (veículos: metade; controles: o mesmo número)")
+    parser.add_argument("--rounds", type=int, default=20, help="Voltas completas pelo menu")
+    args = parser.parse_args()
+
+    with TestClient(main.app) as client:
+        setup(args.users)
+        api_client = SGUVApiClient(base_url="http://testserver")
+        api_client.session = client
+        if not api_client.login("admin@sguv.com", "admin123"):
+            raise SystemExit("❌ Falha no login do administrador")
+
+        conn = RecordingConnection()
+        page = ft.Page(conn, "bench", loop=asyncio.new_event_loop())
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):
+            start = time.perf_counter()
+            view = AdminDashboardView(page, api_client, api_client.current_user)
+            page.add(view.get_view())
+            print(f"Painel aberto em {(time.perf_counter() - start) * 1000:.0f} ms, "
+                  f"{conn.bytes_sent / 1024:.0f} KB enviados", file=sys.stderr)
+
+            timings = {view_id: [] for view_id in VIEWS}
+            traffic = {view_id: [] for view_id in VIEWS}
+            for _ in range(args.rounds):
+                for view_id in VIEWS:
+                    sent = conn.bytes_sent
+                    start = time.perf_counter()
+                    view.change_view(view_id)
+                    timings[view_id].append((time.perf_counter() - start) * 1000)
+                    traffic[view_id].append(conn.bytes_sent - sent)
+                    quiet.seek(0)
+                    quiet.truncate()
+
+            view.change_view("users")
+            actions = {action: ([], []) for action in ACTIONS}
+            for round_index in range(args.rounds):
+                user = view.users_data[1 + round_index % (len(view.users_data) - 1)]
+                for action, method in ACTIONS.items():
+                    getattr(view, method)(dict(user))
+                    button = page.dialog.actions[-1]
+                    sent = conn.bytes_sent
+                    start = time.perf_counter()
+                    button.on_click(None)
+                    actions[action][0].append((time.perf_counter() - start) * 1000)
+                    actions[action][1].append(conn.bytes_sent - sent)
+                    user = next(item for item in view.users_data if item["id"] == user["id"])
+                    quiet.seek(0)
+                    quiet.truncate()
+
+    # O primeiro clique em cada tela inclui montá-la; os seguintes mostram o custo de voltar a ela
+    print(f"{'tela':<10} {'1º ms':>8} {'1º KB':>8} {'p50 ms':>8} {'máx ms':>8} {'KB/clique':>10}")
+    for view_id in VIEWS:
+        first_ms, *rest_ms = timings[view_id]
+        first_kb, *rest_bytes = traffic[view_id]
+        print(f"{view_id:<10} {first_ms:>8.1f} {first_kb / 1024:>8.1f} {statistics.median(rest_ms or [first_ms]):>8.1f} "
+              f"{max(rest_ms or [first_ms]):>8.1f} {statistics.mean(rest_bytes or [first_kb]) / 1024:>10.2f}")
+
+    print(f"\n{'ação':<18} {'p50 ms':>8} {'máx ms':>8} {'KB/ação':>10}")
+    for action, (action_ms, action_bytes) in actions.items():
+        print(f"{action:<18} {statistics.median(action_ms):>8.1f} {max(action_ms):>8.1f} "
+              f"{statistics.mean(action_bytes) / 1024:>10.2f}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tamanho e da serialização da listagem de controles.
+
+Popula um banco SQLite temporário com N controles (cada um com rotas, de
+N/50 motoristas e N/100 veículos) e compara, para os N controles de uma vez:
+
+- formato completo (motorista e veículo dentro de cada controle), normalizado
+  (``formato=normalizado``: motoristas e veículos uma vez cada, por id) e uma
+  projeção estreita (``fields``/``include``: só os campos de uma tela de resumo)
+- tempo de serialização: validação/dump do Pydantic e geração do JSON com o
+  ``json`` da biblioteca padrão e com ``orjson``
+- tamanho do corpo sem compressão, com gzip e com brotli (se instalado)
+
+Depois mede a latência de ``GET /api/usage-control/`` (página de 500) pela API
+(TestClient), com e sem ``Accept-Encoding``.
+
+Uso:
+    python bench_list_payload.py --controls 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+
+# Banco temporário (precisa ser definido antes de importar o módulo database)
+_tmp_dir = tempfile.mkdtemp(prefix="sguv_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("GEOCODER_PROVIDER", "fake")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+import orjson  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from compression import BROTLI_QUALITY, GZIP_LEVEL, brotli  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import Usuario, Veiculo, ControleUtilizacaoVeiculo, Rota  # noqa: E402
+import crud  # noqa: E402
+import main  # noqa: E402
+import schemas  # noqa: E402
+from projection import Projecao  # noqa: E402
+
+ROUTES_PER_CONTROL = 3
+# Projeção de uma tela de resumo: situação, datas e km do controle e a placa do veículo
+PROJECTION_PARAMS = {
+    "fields": "status,data_inicio,data_fim,km_inicial,km_final",
+    "include": "veiculo",
+    "fields[veiculo]": "placa",
+}
+
+
+def setup(controls: int):
+    users = max(controls // 50, 1)
+    vehicles = max(controls // 100, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Usuario), [{
+            "matricula": f"M{i:07d}", "nome": f"Motorista {i}", "email": f"motorista{i}@sguv.com",
+            "unidade": f"Unidade {i % 10}", "status": "ativo", "perfil": "motorista", "senha_hash": "x",
+        } for i in range(users)])
+        conn.execute(insert(Veiculo), [{
+            "marca": "Fiat", "modelo": "Strada", "placa": f"BEN{i:05d}", "ano": 2020, "tipo": "pickup",
+            "status": "disponivel",
+        } for i in range(vehicles)])
+        conn.execute(insert(ControleUtilizacaoVeiculo), [{
+            "motorista_id": 2 + i % users, "veiculo_id": 1 + i % vehicles,
+            "data_inicio": f"2024-01-{1 + i % 28:02d} 08:00:00", "km_inicial": i * 10.0, "km_final": i * 10.0 + 50,
+            "data_fim": f"2024-01-{1 + i % 28:02d} 17:00:00", "status": "finalizado",
+        } for i in range(controls)])
+        conn.execute(insert(Rota), [{
+            "controle_utilizacao_id": 1 + i // ROUTES_PER_CONTROL,
+            "data_hora_saida": "2024-01-01 09:00:00", "km_saida": 100.0 + i, "km_chegada": 110.0 + i,
+            "data_hora_chegada": "2024-01-01 09:30:00", "logradouro_saida": "Rua das Flores, 123",
+            "logradouro_chegada": "Avenida Brasil, 4500", "latitude_saida": -23.55, "longitude_saida": -46.63,
+            "latitude_chegada": -23.56, "longitude_chegada": -46.64,
+        } for i in range(controls * ROUTES_PER_CONTROL)])
+
+
+def _best(function, repeat: int = 3):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, min(timings)
+
+
+def serialization(controls: int):
+    projecao = Projecao.parse(PROJECTION_PARAMS["fields"], PROJECTION_PARAMS["include"],
+                              {"veiculo": PROJECTION_PARAMS["fields[veiculo]"]})
+    db = SessionLocal()
+    try:
+        rows, total = crud.search_controles(db, schemas.ControleUtilizacaoFiltro(), skip=0, limit=controls)
+        projected_rows, _ = crud.search_controles(db, schemas.ControleUtilizacaoFiltro(), skip=0, limit=controls,
+                                                  projecao=projecao)
+    finally:
+        db.close()
+
+    nested = TypeAdapter(list[schemas.ControleUtilizacaoVeiculoResponse])
+    shapes = {
+        "completo": lambda: nested.dump_python(nested.validate_python(rows), mode="json"),
+        "normalizado": lambda: schemas.ControleUtilizacaoNormalizadoResponse(
+            total=total,
+            controles=rows,
+            usuarios={str(row.motorista_id): row.motorista for row in rows},
+            veiculos={str(row.veiculo_id): row.veiculo for row in rows},
+        ).model_dump(mode="json"),
+        "projecao": lambda: projecao.dump(projected_rows),
+    }
+    print(f"\n{len(rows)} controles, {ROUTES_PER_CONTROL} rotas cada")
+    header = f"{'formato':<12} {'pydantic ms':>12} {'json ms':>9} {'orjson ms':>10} {'KB':>9} {'gzip KB':>9}"
+    if brotli is not None:
+        header += f" {'br KB':>8}"
+    print(header)
+    for name, dump in shapes.items():
+        data, dump_ms = _best(dump)
+        body, json_ms = _best(lambda: json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode())
+        _, orjson_ms = _best(lambda: orjson.dumps(data))
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        gzip_body = compressor.compress(body) + compressor.flush()
+        line = (f"{name:<12} {dump_ms:>12.0f} {json_ms:>9.0f} {orjson_ms:>10.0f} "
+                f"{len(body) / 1024:>9.0f} {len(gzip_body) / 1024:>9.0f}")
+        if brotli is not None:
+            line += f" {len(brotli.compress(body, quality=BROTLI_QUALITY)) / 1024:>8.0f}"
+        print(line)
+
+
+def http(rounds: int):
+    token = create_access_token(data={"sub": "admin@sguv.com"})
+    print(f"\nGET /api/usage-control/?limit=500 ({rounds} requisições)")
+    print(f"{'formato':<12} {'encoding':<10} {'p50 ms':>8} {'KB':>8}")
+    with TestClient(main.app) as client:
+        for formato in ("completo", "normalizado", "projecao"):
+            params = {"limit": 500}
+            params.update(PROJECTION_PARAMS if formato == "projecao" else {"formato": formato})
+            for encoding in ("identity", "gzip", "br"):
+                if encoding == "br" and brotli is None:
+                    continue
+                headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": encoding}
+                timings = []
+                size = 0
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    # stream: o corpo é lido como chegou, sem o httpx descomprimir
+                    with client.stream("GET", "/api/usage-control/", params=params,
+                                       headers=headers) as response:
+                        size = len(b"".join(response.iter_raw()))
+                    timings.append((time.perf_counter() - start) * 1000)
+                print(f"{formato:<12} {encoding:<10} {statistics.median(timings):>8.1f} {size / 1024:>8.0f}")
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Tamanho e serialização da listagem de controles")
+    parser.add_argument("--controls", type=int, default=10000, help="Controles cadastrados")
+    parser.add_argument("--rounds", type=int, default=20, help="Requisições por combinação na etapa HTTP")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with TestClient(main.app):
+        setup(args.controls)
+    print(f"Base criada em {time.perf_counter() - start:.1f}s")
+    serialization(args.controls)
+    http(args.rounds)
+
+
+if __name__ == "__main__":
+    main_bench()
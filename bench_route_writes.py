@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark das escritas no endpoint de rotas.
+
+Cria um motorista com um controle em aberto e N rotas em um banco SQLite
+temporário e mede, pela API (TestClient), quantas escritas por segundo os
+endpoints PUT /api/routes/{id} e DELETE /api/routes/{id} sustentam, além de
+quantos comandos SQL cada requisição executa.
+
+Uso:
+    python bench_route_writes.py --routes 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Banco temporário (precisa ser definido antes de importar o módulo database)
+_tmp_dir = tempfile.mkdtemp(prefix="sguv_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("GEOCODER_PROVIDER", "fake")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+from auth import create_access_token, get_password_hash  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import Usuario, Veiculo, ControleUtilizacaoVeiculo, Rota  # noqa: E402
+import main  # noqa: E402
+
+
+def setup(routes: int):
+    """Cria motorista, veículo, controle em aberto e as rotas; retorna (token, ids das rotas)"""
+    with engine.begin() as conn:
+        conn.execute(insert(Usuario), [{
+            "matricula": "B0001", "nome": "Motorista Bench", "email": "bench@sguv.com",
+            "status": "ativo", "perfil": "motorista", "senha_hash": get_password_hash("bench"),
+        }])
+        conn.execute(insert(Veiculo), [{"marca": "Fiat", "modelo": "Uno", "placa": "BEN0001", "status": "em_uso"}])
+    db = SessionLocal()
+    try:
+        motorista = db.query(Usuario).filter(Usuario.email == "bench@sguv.com").one()
+        veiculo = db.query(Veiculo).filter(Veiculo.placa == "BEN0001").one()
+        controle = ControleUtilizacaoVeiculo(
+            motorista_id=motorista.id, veiculo_id=veiculo.id,
+            data_inicio="2024-01-01 08:00:00", km_inicial=1000, status="aberto"
+        )
+        db.add(controle)
+        db.commit()
+        db.execute(insert(Rota), [
+            {
+                "controle_utilizacao_id": controle.id,
+                "data_hora_saida": "2024-01-01 08:10:00",
+                "km_saida": 1000 + i,
+                "latitude_saida": -23.55,
+                "longitude_saida": -46.63,
+            }
+            for i in range(routes)
+        ])
+        db.commit()
+        route_ids = [row[0] for row in db.query(Rota.id).order_by(Rota.id).all()]
+        token = create_access_token(data={"sub": motorista.email})
+        return token, route_ids
+    finally:
+        db.close()
+
+
+def run(label: str, client_call, route_ids, statements: list):
+    statements.clear()
+    start = time.perf_counter()
+    for route_id in route_ids:
+        response = client_call(route_id)
+        if response.status_code != 200:
+            raise SystemExit(f"❌ {label} falhou para a rota {route_id}: {response.status_code} {response.text}")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<8} {len(route_ids)} requisições em {elapsed:.2f}s "
+        f"-> {len(route_ids) / elapsed:,.0f} escritas/s "
+        f"({len(statements) / len(route_ids):.1f} comandos SQL por requisição)"
+    )
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Escritas por segundo no endpoint de rotas")
+    parser.add_argument("--routes", type=int, default=2000)
+    args = parser.parse_args()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *rest: statements.append(statement))
+
+    with TestClient(main.app) as client:
+        token, route_ids = setup(args.routes)
+        headers = {"Authorization": f"Bearer {token}"}
+        arrival = {
+            "data_hora_chegada": "2024-01-01 08:40:00",
+            "km_chegada": 5000,
+            "latitude_chegada": -23.45,
+            "longitude_chegada": -46.53,
+        }
+
+        run("PUT", lambda route_id: client.put(f"/api/routes/{route_id}", json=arrival, headers=headers), route_ids, statements)
+        run("PUT", lambda route_id: client.put(f"/api/routes/{route_id}", json={"logradouro_saida": "Rua A"}, headers=headers), route_ids, statements)
+        run("DELETE", lambda route_id: client.delete(f"/api/routes/{route_id}", headers=headers), route_ids, statements)
+
+
+if __name__ == "__main__":
+    main_bench()
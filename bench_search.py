@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca textual (GET /api/search).
+
+Popula um banco SQLite temporário com N rotas com endereços, N/2 usuários e
+N/4 veículos (os índices FTS5 são alimentados pelas triggers durante os
+INSERTs) e mede a latência da busca para consultas de prefixo curtas e com
+várias palavras, diretamente no serviço e pela API (TestClient).
+
+Uso:
+    python bench_search.py --rows 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Banco temporário (precisa ser definido antes de importar o módulo database)
+_tmp_dir = tempfile.mkdtemp(prefix="sguv_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("GEOCODER_PROVIDER", "fake")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import Usuario, Veiculo, ControleUtilizacaoVeiculo, Rota  # noqa: E402
+from services.search import search  # noqa: E402
+import main  # noqa: E402
+
+NOMES = ["João", "Maria", "José", "Ana", "Carlos", "Fernanda", "Paulo", "Luíza", "Marcos", "Beatriz", "Antônio", "Cláudia"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Conceição", "Pereira", "Lima", "Gonçalves", "Araújo", "Ribeiro"]
+LOGRADOUROS = ["Rua", "Avenida", "Travessa", "Alameda", "Praça", "Estrada"]
+NOMES_RUA = ["das Flores", "Brasil", "Paulista", "São João", "Getúlio Vargas", "XV de Novembro", "dos Andradas",
+             "Sete de Setembro", "Marechal Deodoro", "da Liberdade", "Tiradentes", "Santos Dumont"]
+MARCAS = [("Fiat", ["Uno", "Strada", "Toro"]), ("Volkswagen", ["Gol", "Saveiro", "Amarok"]), ("Chevrolet", ["Onix", "S10"])]
+
+CONSULTAS = ["jo", "mar", "silva", "conceicao", "maria sou", "rua flo", "av paulista", "getulio",
+             "xv nov", "abc", "fiat str", "gol", "s10", "tiradentes 1", "sete set"]
+
+
+def _endereco(rng: random.Random) -> str:
+    return f"{rng.choice(LOGRADOUROS)} {rng.choice(NOMES_RUA)}, {rng.randint(1, 3000)}"
+
+
+def setup(rows: int, seed: int = 42):
+    rng = random.Random(seed)
+    batch = 10000
+    with engine.begin() as conn:
+        users = rows // 2
+        for start in range(0, users, batch):
+            conn.execute(insert(Usuario), [{
+                "matricula": f"M{i:07d}",
+                "nome": f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}",
+                "email": f"usuario{i}@sguv.com", "status": "ativo", "perfil": "motorista", "senha_hash": "x",
+            } for i in range(start, min(start + batch, users))])
+        vehicles = max(rows // 4, 1)
+        for start in range(0, vehicles, batch):
+            rows_v = []
+            for i in range(start, min(start + batch, vehicles)):
+                marca, modelos = rng.choice(MARCAS)
+                placa = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3)) + f"{i:06d}"
+                rows_v.append({"marca": marca, "modelo": rng.choice(modelos), "placa": placa, "status": "disponivel"})
+            conn.execute(insert(Veiculo), rows_v)
+        conn.execute(insert(ControleUtilizacaoVeiculo), [{
+            "motorista_id": 1, "veiculo_id": 1, "data_inicio": "2024-01-01 08:00:00", "km_inicial": 0, "status": "finalizado",
+        }])
+        for start in range(0, rows, batch):
+            conn.execute(insert(Rota), [{
+                "controle_utilizacao_id": 1, "data_hora_saida": "2024-01-01 08:10:00", "km_saida": i,
+                "logradouro_saida": _endereco(rng), "logradouro_chegada": _endereco(rng),
+            } for i in range(start, min(start + batch, rows))])
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<8} {len(timings)} buscas: p50 {statistics.median(timings):.2f} ms, "
+          f"p95 {p95:.2f} ms, máx {timings[-1]:.2f} ms")
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Latência da busca textual")
+    parser.add_argument("--rows", type=int, default=200000, help="Quantidade de rotas (usuários: metade, veículos: um quarto)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with TestClient(main.app) as client:
+        start = time.perf_counter()
+        setup(args.rows)
+        print(f"Base criada e indexada em {time.perf_counter() - start:.1f}s")
+
+        db = SessionLocal()
+        try:
+            timings = []
+            for _ in range(args.repeat):
+                for consulta in CONSULTAS:
+                    start = time.perf_counter()
+                    search(db, consulta, limit=20)
+                    timings.append((time.perf_counter() - start) * 1000)
+            report("serviço", timings)
+        finally:
+            db.close()
+
+        headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'admin@sguv.com'})}"}
+        timings = []
+        for _ in range(args.repeat):
+            for consulta in CONSULTAS:
+                start = time.perf_counter()
+                response = client.get("/api/search/", params={"q": consulta}, headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise SystemExit(f"❌ Busca falhou: {response.status_code} {response.text}")
+        report("API", timings)
+
+
+if __name__ == "__main__":
+    main_bench()
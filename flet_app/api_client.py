@@ -1,13 +1,24 @@
 import requests
 import json
+import os
+import uuid
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 
+# Tempo máximo de espera por resposta; sem ele, uma rede sem sinal trava a requisição
+REQUEST_TIMEOUT = float(os.getenv("SGUV_REQUEST_TIMEOUT", "15"))
+# Importações grandes (hash de centenas de senhas) levam bem mais que uma requisição comum
+IMPORT_TIMEOUT = float(os.getenv("SGUV_IMPORT_TIMEOUT", "600"))
+# Novas tentativas após timeout, só para requisições com Idempotency-Key (não duplicam escritas)
+IDEMPOTENT_RETRIES = int(os.getenv("SGUV_IDEMPOTENT_RETRIES", "2"))
+
 class SGUVApiClient:
     def __init__(self, base_url: str = "http://127.0.0.1:8000"):
         self.base_url = base_url
         self.token = None
         self.current_user = None
+        # Reaproveita as conexões HTTP (keep-alive) entre requisições
+        self.session = requests.Session()
     
     def _get_headers(self) -> Dict[str, str]:
         """Retorna headers com token de autenticação se disponível"""
@@ -16,45 +27,60 @@ class SGUVApiClient:
             headers["Authorization"] = f"Bearer {self.token}"
         return headers
     
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict[str, Any]:
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Faz requisição HTTP para a API"""
         url = f"{self.base_url}{endpoint}"
         headers = self._get_headers()
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        
+        if method.upper() not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"Método HTTP não suportado: {method}")
         
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=headers, params=params)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=headers, json=data)
-            elif method.upper() == "PUT":
-                response = requests.put(url, headers=headers, json=data)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Método HTTP não suportado: {method}")
+            attempts = 1 + (IDEMPOTENT_RETRIES if idempotency_key else 0)
+            for attempt in range(attempts):
+                try:
+                    response = self.session.request(
+                        method.upper(), url, headers=headers, params=params,
+                        json=data if method.upper() in ("POST", "PUT") else None,
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    break
+                except requests.exceptions.Timeout:
+                    # Com a chave, repetir é seguro: a API devolve a resposta do envio original
+                    if attempt == attempts - 1:
+                        raise
             
             response.raise_for_status()
             result = response.json()
             
             # Retornar formato padronizado
             if isinstance(result, list):
-                return {"success": True, "data": result}
+                # Listagens paginadas informam no cabeçalho o total de registros dos filtros
+                total = response.headers.get("X-Total-Count")
+                return {"success": True, "data": result, "total": int(total) if total is not None else len(result)}
             elif isinstance(result, dict):
                 return {"success": True, "data": result}
             else:
                 return {"success": True, "data": result}
             
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            print(f"Sem conexão com a API: {e}")
+            return {"success": False, "offline": True, "message": "Sem conexão com o servidor", "data": None}
         except requests.exceptions.RequestException as e:
             print(f"Erro na requisição: {e}")
             error_message = str(e)
+            status_code = None
             if hasattr(e, 'response') and e.response is not None:
+                status_code = e.response.status_code
                 try:
                     error_detail = e.response.json()
                     error_message = error_detail.get('detail', str(e))
                 except:
                     error_message = f"Erro HTTP {e.response.status_code}"
             
-            return {"success": False, "message": error_message, "data": None}
+            return {"success": False, "message": error_message, "status_code": status_code, "data": None}
     
     # Métodos de Autenticação
     def register(self, matricula: str, nome: str, email: str, senha: str, celular: str = "", unidade: str = "") -> Dict[str, Any]:
@@ -98,9 +124,24 @@ class SGUVApiClient:
         return self._make_request("GET", "/api/users/me")
     
     # Métodos de Usuários
-    def get_users(self) -> List[Dict[str, Any]]:
-        """Lista todos os usuários"""
-        return self._make_request("GET", "/api/users/")
+    def get_users(self, skip: int = 0, limit: int = 100, perfil: Optional[str] = None) -> Dict[str, Any]:
+        """Lista uma página de usuários, opcionalmente só de alguns perfis (o total vem em "total")"""
+        params = {"skip": skip, "limit": limit}
+        if perfil:
+            params["perfil"] = perfil
+        return self._make_request("GET", "/api/users/", params=params)
+    
+    def get_drivers(self) -> Dict[str, Any]:
+        """Todos os motoristas e gestores (quem pode receber um veículo), buscados página a página"""
+        drivers = []
+        while True:
+            response = self.get_users(skip=len(drivers), limit=500, perfil="motorista,gestor")
+            if not response.get('success'):
+                return response
+            page = response.get('data') or []
+            drivers.extend(page)
+            if not page or len(drivers) >= response.get('total', 0):
+                return {"success": True, "data": drivers, "total": len(drivers)}
     
     def get_user(self, user_id: int) -> Dict[str, Any]:
         """Obtém dados de um usuário específico"""
@@ -119,9 +160,9 @@ class SGUVApiClient:
         return self._make_request("PUT", f"/api/users/{user_id}/deactivate")
     
     # Métodos de Veículos
-    def get_vehicles(self) -> List[Dict[str, Any]]:
-        """Lista todos os veículos"""
-        return self._make_request("GET", "/api/vehicles/")
+    def get_vehicles(self, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """Lista uma página de veículos (o total cadastrado vem em "total")"""
+        return self._make_request("GET", "/api/vehicles/", params={"skip": skip, "limit": limit})
     
     def get_available_vehicles(self) -> List[Dict[str, Any]]:
         """Lista veículos disponíveis"""
@@ -144,31 +185,42 @@ class SGUVApiClient:
         """Lista controles de utilização"""
         return self._make_request("GET", "/api/usage-control/")
     
-    def get_my_usage_controls(self) -> List[Dict[str, Any]]:
-        """Lista meus controles de utilização"""
-        return self._make_request("GET", "/api/usage-control/meus")
+    def get_my_usage_controls(self, projection: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Lista meus controles de utilização. ``projection``: parâmetros ``fields``,
+        ``include`` e ``fields[<relação>]`` para a API devolver só esses campos
+        """
+        return self._make_request("GET", "/api/usage-control/meus", params=projection)
     
     def get_open_usage_controls(self) -> List[Dict[str, Any]]:
         """Lista controles de utilização em aberto"""
         return self._make_request("GET", "/api/usage-control/abertos")
     
-    def create_usage_control(self, veiculo_id: int, km_inicial: float) -> Dict[str, Any]:
+    def get_usage_control(self, control_id: int) -> Dict[str, Any]:
+        """Obtém um controle de utilização"""
+        return self._make_request("GET", f"/api/usage-control/{control_id}")
+    
+    def create_usage_control(self, veiculo_id: int, km_inicial: float, data_inicio: str = None, client_id: str = None) -> Dict[str, Any]:
         """Cria um novo controle de utilização"""
         data = {
             "veiculo_id": veiculo_id,
-            "data_inicio": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "data_inicio": data_inicio or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "km_inicial": km_inicial
         }
-        return self._make_request("POST", "/api/usage-control/", data)
+        if client_id:
+            data["client_id"] = client_id
+        return self._make_request("POST", "/api/usage-control/", data, idempotency_key=client_id)
     
-    def finalize_usage_control(self, control_id: int, km_final: float, assinatura: str = "") -> Dict[str, Any]:
+    def finalize_usage_control(self, control_id: int, km_final: float, assinatura: str = "", data_fim: str = None, version: int = None, idempotency_key: str = None) -> Dict[str, Any]:
         """Finaliza um controle de utilização"""
         data = {
             "km_final": km_final,
-            "data_fim": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "data_fim": data_fim or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "assinatura_eletronica": assinatura
         }
-        return self._make_request("PUT", f"/api/usage-control/{control_id}/finalizar", data)
+        if version is not None:
+            data["version"] = version
+        return self._make_request("PUT", f"/api/usage-control/{control_id}/finalizar", data, idempotency_key=idempotency_key)
     
     # Métodos de Rotas
     def get_routes_by_control(self, control_id: int) -> List[Dict[str, Any]]:
@@ -176,8 +228,9 @@ class SGUVApiClient:
         return self._make_request("GET", f"/api/routes/controle/{control_id}")
     
     def create_route(self, control_id: int, km_saida: float, latitude_saida: float = None, longitude_saida: float = None, logradouro_saida: str = "") -> Dict[str, Any]:
-        """Cria uma nova rota"""
+        """Cria uma nova rota (o client_id evita duplicá-la se a requisição for repetida)"""
         data = {
+            "client_id": str(uuid.uuid4()),
             "controle_utilizacao_id": control_id,
             "data_hora_saida": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "km_saida": km_saida,
@@ -185,7 +238,7 @@ class SGUVApiClient:
             "longitude_saida": longitude_saida,
             "logradouro_saida": logradouro_saida
         }
-        return self._make_request("POST", "/api/routes/", data)
+        return self._make_request("POST", "/api/routes/", data, idempotency_key=data["client_id"])
     
     def update_route_arrival(self, route_id: int, km_chegada: float, latitude_chegada: float = None, longitude_chegada: float = None, logradouro_chegada: str = "") -> Dict[str, Any]:
         """Atualiza dados de chegada de uma rota"""
@@ -198,6 +251,10 @@ class SGUVApiClient:
         }
         return self._make_request("PUT", f"/api/routes/{route_id}", data)
     
+    def create_routes_bulk(self, routes: List[Dict[str, Any]], idempotency_key: str = None) -> Dict[str, Any]:
+        """Envia um lote de rotas (cada uma com client_id) para /api/routes/bulk"""
+        return self._make_request("POST", "/api/routes/bulk", routes, idempotency_key=idempotency_key)
+    
     def geocode_departure(self, route_id: int, latitude: float, longitude: float) -> Dict[str, Any]:
         """Obtém endereço a partir das coordenadas de saída"""
         return self._make_request("POST", f"/api/routes/{route_id}/geocode-saida", {
@@ -212,6 +269,20 @@ class SGUVApiClient:
             "longitude": longitude
         })
     
+    # Métodos de Auditoria
+    def get_odometer_findings(self, veiculo_id: int = None, tipo: str = None, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """Lista inconsistências de hodômetro encontradas pela auditoria"""
+        params = {"skip": skip, "limit": limit}
+        if veiculo_id is not None:
+            params["veiculo_id"] = veiculo_id
+        if tipo:
+            params["tipo"] = tipo
+        return self._make_request("GET", "/api/audit/odometro", params=params)
+    
+    def run_odometer_audit(self) -> Dict[str, Any]:
+        """Executa a auditoria de hodômetro sobre todo o histórico (admin only)"""
+        return self._make_request("POST", "/api/audit/odometro/executar")
+    
     # Verificação de conectividade
     def check_connection(self) -> bool:
         """Verifica se a API está acessível"""
@@ -234,9 +305,33 @@ class SGUVApiClient:
         """Exclui um veículo (admin only)"""
         return self._make_request("DELETE", f"/api/vehicles/{vehicle_id}")
     
-    def get_usage_records(self) -> List[Dict[str, Any]]:
-        """Lista todos os registros de utilização"""
-        return self._make_request("GET", "/api/usage-control/")
+    def get_usage_records(self, filtros: Optional[Dict[str, Any]] = None, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """
+        Lista uma página de registros de utilização, filtrada e ordenada pela API.
+        Filtros: status, motorista_id, veiculo_id, unidade, data_de, data_ate (YYYY-MM-DD),
+        busca e ordenar (ex.: "-data_inicio"). O total filtrado vem em "total".
+        """
+        params = {key: value for key, value in (filtros or {}).items() if value not in (None, "")}
+        # Formato normalizado: cada motorista e veículo vem uma vez só; os registros são montados aqui
+        params.update(skip=skip, limit=limit, formato="normalizado")
+        response = self._make_request("GET", "/api/usage-control/", params=params)
+        if not response.get('success'):
+            return response
+        data = response['data']
+        usuarios, veiculos = data['usuarios'], data['veiculos']
+        records = [
+            dict(controle, motorista=usuarios.get(str(controle['motorista_id'])), veiculo=veiculos.get(str(controle['veiculo_id'])))
+            for controle in data['controles']
+        ]
+        return {"success": True, "data": records, "total": data['total']}
+    
+    def count_usage_records(self, filtros: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Total de registros de utilização com os filtros (do X-Total-Count); None se a consulta falhar"""
+        params = {key: value for key, value in (filtros or {}).items() if value not in (None, "")}
+        # Uma linha só com o id: o que interessa é o cabeçalho
+        params.update(limit=1, fields="id", include="")
+        response = self._make_request("GET", "/api/usage-control/", params=params)
+        return response.get('total') if response.get('success') else None
     
     def create_usage_record(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Cria um novo registro de utilização"""
@@ -250,6 +345,33 @@ class SGUVApiClient:
         """Lista todas as rotas"""
         return self._make_request("GET", "/api/routes/")
     
+    def _variant_url(self, links: Dict[str, str], link: Optional[str], size: int, legacy_dir: str) -> Optional[str]:
+        # Menor versão com pelo menos ``size`` px (ou a maior, se nenhuma chega lá)
+        sizes = sorted(int(available) for available in links or {})
+        if sizes:
+            link = links[str(next((available for available in sizes if available >= size), sizes[-1]))]
+        if not link:
+            return None
+        if link.startswith('http'):
+            return link
+        if link.startswith('public/'):
+            return f"{self.base_url}/{link}"
+        return f"{self.base_url}/public/{legacy_dir}/{os.path.basename(link)}"
+    
+    def avatar_url(self, user: Dict[str, Any], size: int) -> Optional[str]:
+        """
+        URL da menor miniatura do avatar com pelo menos ``size`` px (a API gera
+        alguns tamanhos fixos em "avatar_links"); None se o usuário não tem avatar.
+        """
+        return self._variant_url(user.get('avatar_links'), user.get('avatar_link'), size, "avatar")
+    
+    def vehicle_image_url(self, image: Dict[str, Any], size: int) -> Optional[str]:
+        """
+        URL da menor versão com lado maior de pelo menos ``size`` px da capa de um
+        veículo ou de uma foto da galeria ("imagem_links"); None se não há imagem.
+        """
+        return self._variant_url(image.get('imagem_links'), image.get('imagem_link'), size, "veiculos")
+    
     def upload_avatar(self, user_id: int, file_path: str) -> Dict[str, Any]:
         """Faz upload do avatar do usuário"""
         import os
@@ -267,7 +389,7 @@ class SGUVApiClient:
             return {"success": False, "message": "Arquivo não encontrado"}
         
         # Verificar se é uma imagem válida
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
+        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
         file_extension = Path(file_path).suffix.lower()
         print(f"[DEBUG] Extensão do arquivo: {file_extension}")
         if file_extension not in valid_extensions:
@@ -329,6 +451,89 @@ class SGUVApiClient:
             print(f"[DEBUG] Tipo do erro: {type(e)}")
             return {"success": False, "message": str(e)}
     
+    def _import_file(self, endpoint: str, file_path: str) -> Dict[str, Any]:
+        """Envia uma planilha CSV/XLSX para um endpoint de importação em lote"""
+        if not file_path or not os.path.exists(file_path):
+            return {"success": False, "message": "Arquivo não encontrado"}
+        
+        try:
+            headers = {}
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            with open(file_path, 'rb') as file:
+                files = {'arquivo': (os.path.basename(file_path), file, 'application/octet-stream')}
+                response = requests.post(f"{self.base_url}{endpoint}", headers=headers, files=files, timeout=IMPORT_TIMEOUT)
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            print(f"Erro na importação: {e}")
+            error_message = str(e)
+            if getattr(e, 'response', None) is not None:
+                try:
+                    error_message = e.response.json().get('detail', error_message)
+                except ValueError:
+                    error_message = f"Erro HTTP {e.response.status_code}"
+            return {"success": False, "message": error_message}
+    
+    def import_users(self, file_path: str) -> Dict[str, Any]:
+        """Importa usuários de uma planilha CSV/XLSX"""
+        return self._import_file("/api/users/import", file_path)
+    
+    def import_vehicles(self, file_path: str) -> Dict[str, Any]:
+        """Importa veículos de uma planilha CSV/XLSX"""
+        return self._import_file("/api/vehicles/import", file_path)
+    
+    def _upload_image(self, endpoint: str, file_path: str) -> Dict[str, Any]:
+        """Envia uma imagem de veículo no campo "imagem" (a API grava as versões reduzidas)"""
+        if not file_path or not os.path.exists(file_path):
+            return {"success": False, "message": "Arquivo não encontrado"}
+        
+        try:
+            headers = {}
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            with open(file_path, 'rb') as file:
+                files = {'imagem': (os.path.basename(file_path), file, 'application/octet-stream')}
+                response = requests.post(f"{self.base_url}{endpoint}", headers=headers, files=files)
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            print(f"Erro no envio da imagem: {e}")
+            error_message = str(e)
+            if getattr(e, 'response', None) is not None:
+                try:
+                    error_message = e.response.json().get('detail', error_message)
+                except ValueError:
+                    error_message = f"Erro HTTP {e.response.status_code}"
+            return {"success": False, "message": error_message}
+    
+    def upload_vehicle_image(self, vehicle_id: int, file_path: str) -> Dict[str, Any]:
+        """Envia a foto de capa de um veículo (a API devolve os caminhos em "imagem_links")"""
+        result = self._upload_image(f"/api/vehicles/{vehicle_id}/imagem", file_path)
+        if result.get('success'):
+            result['data'] = result['data'].get('data')
+        return result
+    
+    def delete_vehicle_image(self, vehicle_id: int) -> Dict[str, Any]:
+        """Remove a foto de um veículo"""
+        return self._make_request("DELETE", f"/api/vehicles/{vehicle_id}/imagem")
+    
+    def get_vehicle_photos(self, vehicle_id: int) -> Dict[str, Any]:
+        """Fotos da galeria de um veículo, com dimensões e caminhos de cada versão"""
+        return self._make_request("GET", f"/api/vehicles/{vehicle_id}/fotos")
+    
+    def upload_vehicle_photo(self, vehicle_id: int, file_path: str) -> Dict[str, Any]:
+        """Acrescenta uma foto à galeria do veículo"""
+        return self._upload_image(f"/api/vehicles/{vehicle_id}/fotos", file_path)
+    
+    def set_vehicle_cover(self, vehicle_id: int, foto_id: int) -> Dict[str, Any]:
+        """Usa uma foto da galeria como capa do veículo"""
+        return self._make_request("PUT", f"/api/vehicles/{vehicle_id}/fotos/{foto_id}/capa")
+    
+    def delete_vehicle_photo(self, vehicle_id: int, foto_id: int) -> Dict[str, Any]:
+        """Remove uma foto da galeria do veículo"""
+        return self._make_request("DELETE", f"/api/vehicles/{vehicle_id}/fotos/{foto_id}")
+    
     def delete_avatar(self, user_id: int) -> Dict[str, Any]:
         """Remove o avatar do usuário"""
         try:
@@ -0,0 +1,213 @@
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+import requests
+
+# Cache das imagens baixadas da API (avatares e fotos de veículos)
+IMAGE_CACHE_DIR = os.getenv(
+    "SGUV_IMAGE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".sguv", "imagens")
+)
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("SGUV_IMAGE_CACHE_MB", "100")) * 1024 * 1024
+IMAGE_MEMORY_MAX_BYTES = int(os.getenv("SGUV_IMAGE_MEMORY_MB", "16")) * 1024 * 1024
+IMAGE_FETCH_WORKERS = int(os.getenv("SGUV_IMAGE_FETCH_WORKERS", "8"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("SGUV_IMAGE_FETCH_TIMEOUT", "10"))
+# Por quantos segundos uma URL que falhou (erro, timeout ou status != 200) não é baixada de novo
+IMAGE_FAILURE_TTL = float(os.getenv("SGUV_IMAGE_FAILURE_TTL", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS imagens (
+    url TEXT PRIMARY KEY,
+    arquivo TEXT NOT NULL,
+    etag TEXT,
+    imutavel INTEGER NOT NULL DEFAULT 0,   -- Cache-Control: immutable (nunca revalidada)
+    bytes INTEGER NOT NULL,
+    usado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_imagens_usado_em ON imagens (usado_em);
+"""
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+class ImageCache:
+    """
+    Cache de imagens em memória e em disco do cliente Flet.
+
+    As imagens são entregues aos controles em ``src_base64`` a partir daqui, então
+    reconstruir a tabela, rolar ou trocar de tela não baixa a mesma imagem de novo:
+
+    - memória: os bytes mais usados, até ``IMAGE_MEMORY_MAX_BYTES`` (LRU)
+    - disco: um arquivo por URL, com o ETag, até ``IMAGE_CACHE_MAX_BYTES``; os
+      menos usados recentemente são apagados quando o limite é passado
+    - imagens servidas como imutáveis (``public/blobs``, o nome muda quando o
+      conteúdo muda) nunca são revalidadas; as demais são conferidas uma vez por
+      sessão com ``If-None-Match``
+
+    ``prefetch`` baixa em paralelo as imagens de uma página da tabela antes das
+    linhas serem preenchidas. Downloads que falham não são repetidos por
+    ``IMAGE_FAILURE_TTL`` segundos, então uma imagem fora do ar não trava cada
+    nova renderização por um timeout inteiro.
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 memory_max_bytes: int = IMAGE_MEMORY_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+        self._memory: "OrderedDict[str, str]" = OrderedDict()  # url -> base64
+        self._memory_bytes = 0
+        self._validated = set()  # URLs revalidadas nesta sessão
+        self._failed: Dict[str, float] = {}  # url -> instante (monotonic) da última falha
+        self._session = requests.Session()
+        self._pool = ThreadPoolExecutor(max_workers=IMAGE_FETCH_WORKERS, thread_name_prefix="sguv-image-cache")
+
+    def get(self, url: Optional[str]) -> Optional[str]:
+        """Imagem em base64 (para ``src_base64``) se já está no cache e válida; None caso contrário"""
+        if not url:
+            return None
+        with self._lock:
+            encoded = self._memory.get(url)
+            if encoded is not None:
+                self._memory.move_to_end(url)
+                return encoded
+            row = self._conn.execute("SELECT * FROM imagens WHERE url = ?", (url,)).fetchone()
+            if row is None or not (row["imutavel"] or url in self._validated):
+                return None
+            content = self._read(row["arquivo"])
+            if content is None:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE imagens SET usado_em = ? WHERE url = ?", (_now(), url))
+            return self._remember(url, content)
+
+    def fetch(self, url: Optional[str]) -> Optional[str]:
+        """Como ``get``, mas baixa (ou revalida) a imagem quando necessário; None se falhar"""
+        encoded = self.get(url)
+        if encoded is not None or not url or self._recently_failed(url):
+            return encoded
+        with self._lock:
+            row = self._conn.execute("SELECT etag, arquivo FROM imagens WHERE url = ?", (url,)).fetchone()
+        headers = {"If-None-Match": row["etag"]} if row and row["etag"] else {}
+        try:
+            response = self._session.get(url, headers=headers, timeout=IMAGE_FETCH_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"Erro ao baixar imagem {url}: {e}")
+            return self._fail(url)
+        if response.status_code == 304 and row is not None:
+            self._validated.add(url)
+            return self.get(url)
+        if response.status_code != 200:
+            return self._fail(url)
+        self._store(url, response)
+        with self._lock:
+            self._failed.pop(url, None)
+        return self._remember(url, response.content)
+
+    def prefetch(self, urls: Iterable[Optional[str]]):
+        """Baixa em paralelo as imagens que faltam no cache e espera terminarem"""
+        missing = list(dict.fromkeys(
+            url for url in urls if url and not self._recently_failed(url) and self.get(url) is None
+        ))
+        if missing:
+            list(self._pool.map(self.fetch, missing))
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM imagens").fetchone()
+            return {"disk_items": row[0], "disk_bytes": row[1],
+                    "memory_items": len(self._memory), "memory_bytes": self._memory_bytes}
+
+    def _recently_failed(self, url: str) -> bool:
+        with self._lock:
+            failed_at = self._failed.get(url)
+            if failed_at is None:
+                return False
+            if time.monotonic() - failed_at < IMAGE_FAILURE_TTL:
+                return True
+            del self._failed[url]
+            return False
+
+    def _fail(self, url: str) -> None:
+        with self._lock:
+            self._failed[url] = time.monotonic()
+        return None
+
+    def _remember(self, url: str, content: bytes) -> str:
+        encoded = base64.b64encode(content).decode("ascii")
+        with self._lock:
+            previous = self._memory.pop(url, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[url] = encoded
+            self._memory_bytes += len(encoded)
+            while self._memory_bytes > self.memory_max_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+        return encoded
+
+    def _read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.directory, name), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _store(self, url: str, response: requests.Response):
+        name = hashlib.sha256(url.encode()).hexdigest()
+        path = os.path.join(self.directory, name)
+        # Arquivo temporário + rename: outra thread nunca lê uma imagem pela metade
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(response.content)
+        os.replace(temp_path, path)
+        immutable = "immutable" in response.headers.get("Cache-Control", "")
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO imagens (url, arquivo, etag, imutavel, bytes, usado_em)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (url, name, response.headers.get("ETag"), int(immutable), len(response.content), _now())
+            )
+            self._validated.add(url)
+            self._evict()
+
+    def _evict(self):
+        # Apaga as imagens usadas há mais tempo até o total caber no limite
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM imagens").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self._conn.execute("SELECT url, arquivo, bytes FROM imagens ORDER BY usado_em").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM imagens WHERE url = ?", (row["url"],))
+            try:
+                os.remove(os.path.join(self.directory, row["arquivo"]))
+            except OSError:
+                pass
+            total -= row["bytes"]
+
+
+@lru_cache(maxsize=1)
+def get_image_cache() -> ImageCache:
+    """Cache compartilhado pelas telas (instância única: uma conexão SQLite e um pool de threads por processo)"""
+    return ImageCache()
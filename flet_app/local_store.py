@@ -0,0 +1,406 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Banco local do aplicativo do motorista
+LOCAL_DB_PATH = os.getenv(
+    "SGUV_LOCAL_DB",
+    os.path.join(os.path.expanduser("~"), ".sguv", "motorista.db")
+)
+
+# Estados de sincronização dos registros locais
+PENDENTE = "pendente"
+SINCRONIZADO = "sincronizado"
+CONFLITO = "conflito"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS controles (
+    local_id TEXT PRIMARY KEY,              -- também é o client_id enviado à API
+    server_id INTEGER UNIQUE,
+    motorista_id INTEGER NOT NULL,
+    veiculo_id INTEGER NOT NULL,
+    veiculo_descricao TEXT,
+    data_inicio TEXT NOT NULL,
+    km_inicial REAL NOT NULL,
+    km_final REAL,
+    data_fim TEXT,
+    assinatura_eletronica TEXT,
+    status TEXT NOT NULL DEFAULT 'aberto',
+    version INTEGER,
+    sync_status TEXT NOT NULL DEFAULT 'pendente',
+    sync_message TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_controles_motorista ON controles (motorista_id, data_inicio);
+
+CREATE TABLE IF NOT EXISTS rotas (
+    local_id TEXT PRIMARY KEY,              -- também é o client_id enviado à API
+    server_id INTEGER UNIQUE,
+    controle_local_id TEXT NOT NULL,
+    data_hora_saida TEXT NOT NULL,
+    km_saida REAL NOT NULL,
+    logradouro_saida TEXT,
+    latitude_saida REAL,
+    longitude_saida REAL,
+    data_hora_chegada TEXT,
+    km_chegada REAL,
+    logradouro_chegada TEXT,
+    latitude_chegada REAL,
+    longitude_chegada REAL,
+    sync_status TEXT NOT NULL DEFAULT 'pendente',
+    sync_message TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_rotas_controle ON rotas (controle_local_id);
+
+-- Operações gravadas localmente e ainda não confirmadas pela API, na ordem em que ocorreram
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,                     -- criar_controle, criar_rota, finalizar_controle
+    local_id TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    ultimo_erro TEXT
+);
+
+-- Cópia dos veículos disponíveis, para iniciar controles sem conexão
+CREATE TABLE IF NOT EXISTS veiculos (
+    id INTEGER PRIMARY KEY,
+    descricao TEXT NOT NULL,
+    dados TEXT NOT NULL
+);
+"""
+
+ROTA_FIELDS = (
+    "data_hora_saida", "km_saida", "logradouro_saida", "latitude_saida", "longitude_saida",
+    "data_hora_chegada", "km_chegada", "logradouro_chegada", "latitude_chegada", "longitude_chegada",
+)
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def vehicle_description(vehicle: Dict[str, Any]) -> str:
+    return f"{vehicle.get('marca', '')} {vehicle.get('modelo', '')} - {vehicle.get('placa', '')}"
+
+class LocalStore:
+    """
+    Armazenamento local (SQLite) do aplicativo do motorista.
+
+    Toda ação do motorista é gravada aqui primeiro, junto com uma entrada na
+    outbox; a interface lê sempre deste banco e a sincronização com a API
+    acontece depois, em segundo plano (ver sync.py).
+    """
+
+    def __init__(self, path: str = LOCAL_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    # Controles
+    def create_control(self, motorista_id: int, vehicle: Dict[str, Any], km_inicial: float) -> Dict[str, Any]:
+        local_id = str(uuid.uuid4())
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO controles (local_id, motorista_id, veiculo_id, veiculo_descricao, data_inicio, km_inicial)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (local_id, motorista_id, vehicle["id"], vehicle_description(vehicle), _now(), km_inicial)
+            )
+            self._enqueue("criar_controle", local_id, local_id)
+            # O veículo deixa de aparecer como disponível neste aparelho
+            self._conn.execute("DELETE FROM veiculos WHERE id = ?", (vehicle["id"],))
+        return self.get_control(local_id)
+
+    def finalize_control(self, local_id: str, km_final: float, assinatura: str) -> Dict[str, Any]:
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE controles SET km_final = ?, data_fim = ?, assinatura_eletronica = ?,
+                   status = 'finalizado', sync_status = ? WHERE local_id = ?""",
+                (km_final, _now(), assinatura, PENDENTE, local_id)
+            )
+            self._enqueue("finalizar_controle", local_id, f"{local_id}:finalizar")
+        return self.get_control(local_id)
+
+    def get_control(self, local_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM controles WHERE local_id = ?", (local_id,))
+        return rows[0] if rows else None
+
+    def list_controls(self, motorista_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT * FROM controles WHERE motorista_id = ? ORDER BY data_inicio DESC LIMIT ?",
+            (motorista_id, limit)
+        )
+
+    def get_open_control(self, motorista_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            """SELECT * FROM controles WHERE motorista_id = ? AND status = 'aberto' AND sync_status != ?
+               ORDER BY data_inicio DESC LIMIT 1""",
+            (motorista_id, CONFLITO)
+        )
+        return rows[0] if rows else None
+
+    def discard_control(self, local_id: str):
+        """Remove um controle em conflito (e suas rotas) do aparelho"""
+        with self._lock, self._conn:
+            route_ids = [row[0] for row in self._conn.execute(
+                "SELECT local_id FROM rotas WHERE controle_local_id = ?", (local_id,)
+            )]
+            self._conn.execute("DELETE FROM rotas WHERE controle_local_id = ?", (local_id,))
+            self._conn.execute("DELETE FROM controles WHERE local_id = ?", (local_id,))
+            self._conn.executemany("DELETE FROM outbox WHERE local_id = ?", [(i,) for i in [local_id, *route_ids]])
+
+    def today_summary(self, motorista_id: int) -> Dict[str, Any]:
+        """Totais do dia para os cards de status"""
+        today = datetime.now().strftime("%Y-%m-%d") + "%"
+        with self._lock:
+            abertos = self._conn.execute(
+                "SELECT COUNT(*) FROM controles WHERE motorista_id = ? AND status = 'aberto' AND sync_status != ?",
+                (motorista_id, CONFLITO)
+            ).fetchone()[0]
+            km = self._conn.execute(
+                """SELECT COALESCE(SUM(COALESCE(km_final, km_inicial) - km_inicial), 0) FROM controles
+                   WHERE motorista_id = ? AND data_inicio LIKE ?""",
+                (motorista_id, today)
+            ).fetchone()[0]
+            rotas = self._conn.execute(
+                """SELECT COUNT(*) FROM rotas r JOIN controles c ON c.local_id = r.controle_local_id
+                   WHERE c.motorista_id = ? AND c.data_inicio LIKE ?""",
+                (motorista_id, today)
+            ).fetchone()[0]
+        return {"controles_abertos": abertos, "km_hoje": km, "rotas_hoje": rotas}
+
+    # Rotas
+    def create_route(self, controle_local_id: str, km_saida: float, logradouro_saida: str = "") -> Dict[str, Any]:
+        local_id = str(uuid.uuid4())
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO rotas (local_id, controle_local_id, data_hora_saida, km_saida, logradouro_saida)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (local_id, controle_local_id, _now(), km_saida, logradouro_saida or None)
+            )
+            self._enqueue("criar_rota", local_id, local_id)
+        return self._query("SELECT * FROM rotas WHERE local_id = ?", (local_id,))[0]
+
+    def import_legacy_routes(self, motorista_id: int, routes: List[Dict[str, Any]]) -> List[str]:
+        """
+        Traz para a outbox as rotas da antiga fila JSON (``rotas_pendentes.json``),
+        mantendo o client_id, então uma rota que já tinha chegado ao servidor não
+        é duplicada. Retorna os client_ids resolvidos; rotas de controles que
+        ainda não estão no aparelho ficam de fora.
+        """
+        imported = []
+        with self._lock, self._conn:
+            for route in routes:
+                control = self._conn.execute(
+                    "SELECT local_id FROM controles WHERE server_id = ? AND motorista_id = ?",
+                    (route["controle_utilizacao_id"], motorista_id)
+                ).fetchone()
+                if not control:
+                    continue
+                inserted = self._conn.execute(
+                    f"""INSERT OR IGNORE INTO rotas (local_id, controle_local_id, {", ".join(ROTA_FIELDS)})
+                        VALUES (?, ?, {", ".join("?" for _ in ROTA_FIELDS)})""",
+                    (route["client_id"], control[0], *[route.get(field) for field in ROTA_FIELDS])
+                ).rowcount
+                if inserted:
+                    self._enqueue("criar_rota", route["client_id"], route["client_id"])
+                imported.append(route["client_id"])
+        return imported
+
+    def routes_payload(self, local_ids: List[str]) -> List[Dict[str, Any]]:
+        """Rotas no formato de POST /api/routes/bulk (o local_id vai como client_id)"""
+        placeholders = ", ".join("?" for _ in local_ids)
+        rows = self._query(
+            f"""SELECT r.*, c.server_id AS controle_server_id FROM rotas r
+                JOIN controles c ON c.local_id = r.controle_local_id
+                WHERE r.local_id IN ({placeholders})""",
+            local_ids
+        )
+        return [
+            {
+                "client_id": row["local_id"],
+                "controle_utilizacao_id": row["controle_server_id"],
+                **{field: row[field] for field in ROTA_FIELDS}
+            }
+            for row in rows
+        ]
+
+    def list_routes(self, controle_local_id: str) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT * FROM rotas WHERE controle_local_id = ? ORDER BY data_hora_saida",
+            (controle_local_id,)
+        )
+
+    # Veículos
+    def available_vehicles(self) -> List[Dict[str, Any]]:
+        return [json.loads(row["dados"]) for row in self._query("SELECT dados FROM veiculos ORDER BY descricao")]
+
+    def replace_vehicles(self, vehicles: List[Dict[str, Any]]):
+        # Veículos com controle local ainda não enviado continuam fora da lista
+        with self._lock, self._conn:
+            reservados = {row[0] for row in self._conn.execute(
+                "SELECT veiculo_id FROM controles WHERE status = 'aberto' AND server_id IS NULL"
+            )}
+            self._conn.execute("DELETE FROM veiculos")
+            self._conn.executemany(
+                "INSERT INTO veiculos (id, descricao, dados) VALUES (?, ?, ?)",
+                [(v["id"], vehicle_description(v), json.dumps(v)) for v in vehicles if v["id"] not in reservados]
+            )
+
+    # Outbox
+    def _enqueue(self, tipo: str, local_id: str, idempotency_key: str):
+        self._conn.execute(
+            "INSERT OR IGNORE INTO outbox (tipo, local_id, idempotency_key) VALUES (?, ?, ?)",
+            (tipo, local_id, idempotency_key)
+        )
+
+    def outbox_head(self, limit: int) -> List[Dict[str, Any]]:
+        return self._query("SELECT * FROM outbox ORDER BY id LIMIT ?", (limit,))
+
+    def outbox_failed(self, entry_ids: List[int], error: str):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE outbox SET tentativas = tentativas + 1, ultimo_erro = ? WHERE id = ?",
+                [(error, entry_id) for entry_id in entry_ids]
+            )
+
+    def pending_count(self, motorista_id: int) -> Dict[str, int]:
+        with self._lock:
+            pendentes = self._conn.execute(
+                """SELECT COUNT(*) FROM outbox o
+                   LEFT JOIN rotas r ON r.local_id = o.local_id
+                   JOIN controles c ON c.local_id = COALESCE(r.controle_local_id, o.local_id)
+                   WHERE c.motorista_id = ?""",
+                (motorista_id,)
+            ).fetchone()[0]
+            conflitos = self._conn.execute(
+                """SELECT (SELECT COUNT(*) FROM controles WHERE motorista_id = ? AND sync_status = ?)
+                        + (SELECT COUNT(*) FROM rotas r JOIN controles c ON c.local_id = r.controle_local_id
+                           WHERE c.motorista_id = ? AND r.sync_status = ?)""",
+                (motorista_id, CONFLITO, motorista_id, CONFLITO)
+            ).fetchone()[0]
+        return {"pendentes": pendentes, "conflitos": conflitos}
+
+    def control_synced(self, entry_id: int, local_id: str, server: Dict[str, Any]):
+        """A API confirmou a criação/finalização do controle"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE controles SET server_id = ?, version = ?, sync_status = ?, sync_message = NULL WHERE local_id = ?",
+                (server["id"], server.get("version"), SINCRONIZADO, local_id)
+            )
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def routes_synced(self, entry_ids: Dict[str, int], servers: List[Dict[str, Any]]):
+        """A API confirmou (criou ou já tinha) as rotas do lote"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE rotas SET server_id = ?, sync_status = ?, sync_message = NULL WHERE local_id = ?",
+                [(server["id"], SINCRONIZADO, server["client_id"]) for server in servers]
+            )
+            self._conn.executemany(
+                "DELETE FROM outbox WHERE id = ?",
+                [(entry_ids[server["client_id"]],) for server in servers if server["client_id"] in entry_ids]
+            )
+
+    def mark_conflict(self, entry_id: int, table: str, local_id: str, message: str):
+        """
+        A API recusou a operação (ex.: veículo já em uso, controle alterado por outro usuário).
+        O registro fica marcado para o motorista ver e a operação sai da outbox; se for um
+        controle, as operações pendentes das suas rotas também não poderão ser enviadas.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE {table} SET sync_status = ?, sync_message = ? WHERE local_id = ?",
+                (CONFLITO, message, local_id)
+            )
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+            if table == "controles":
+                self._conn.execute(
+                    """UPDATE rotas SET sync_status = ?, sync_message = ?
+                       WHERE controle_local_id = ? AND server_id IS NULL""",
+                    (CONFLITO, message, local_id)
+                )
+                self._conn.execute(
+                    """DELETE FROM outbox WHERE local_id = ?
+                       OR local_id IN (SELECT local_id FROM rotas WHERE controle_local_id = ?)""",
+                    (local_id, local_id)
+                )
+
+    # Dados vindos do servidor
+    def apply_server_controls(self, motorista_id: int, controls: List[Dict[str, Any]]):
+        """
+        Atualiza a cópia local com os controles (e rotas) do servidor.
+        Registros com operações ainda na outbox ou em conflito mantêm a versão
+        local (o conflito fica visível até o motorista descartar o registro).
+        """
+        with self._lock, self._conn:
+            pendentes = {row[0] for row in self._conn.execute(
+                """SELECT local_id FROM outbox
+                   UNION SELECT local_id FROM controles WHERE sync_status = ?
+                   UNION SELECT local_id FROM rotas WHERE sync_status = ?""",
+                (CONFLITO, CONFLITO)
+            )}
+            for control in controls:
+                row = self._conn.execute(
+                    "SELECT local_id FROM controles WHERE server_id = ? OR local_id = ?",
+                    (control["id"], control.get("client_id") or "")
+                ).fetchone()
+                local_id = row[0] if row else (control.get("client_id") or f"srv-{control['id']}")
+                if local_id not in pendentes:
+                    self._conn.execute(
+                        """INSERT INTO controles (local_id, server_id, motorista_id, veiculo_id, veiculo_descricao,
+                               data_inicio, km_inicial, km_final, data_fim, assinatura_eletronica, status, version,
+                               sync_status, sync_message)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)
+                           ON CONFLICT (local_id) DO UPDATE SET
+                               server_id = excluded.server_id, veiculo_descricao = excluded.veiculo_descricao,
+                               data_inicio = excluded.data_inicio, km_inicial = excluded.km_inicial,
+                               km_final = excluded.km_final, data_fim = excluded.data_fim,
+                               assinatura_eletronica = excluded.assinatura_eletronica, status = excluded.status,
+                               version = excluded.version, sync_status = excluded.sync_status, sync_message = NULL""",
+                        (
+                            local_id, control["id"], motorista_id, control["veiculo_id"],
+                            vehicle_description(control.get("veiculo") or {}), control["data_inicio"],
+                            control["km_inicial"], control.get("km_final"), control.get("data_fim"),
+                            control.get("assinatura_eletronica"), control["status"], control.get("version"),
+                            SINCRONIZADO
+                        )
+                    )
+                self._apply_server_routes(local_id, control.get("rotas") or [], pendentes)
+
+    def _apply_server_routes(self, controle_local_id: str, routes: List[Dict[str, Any]], pendentes: set):
+        server_ids = []
+        for route in routes:
+            server_ids.append(route["id"])
+            row = self._conn.execute(
+                "SELECT local_id FROM rotas WHERE server_id = ? OR local_id = ?",
+                (route["id"], route.get("client_id") or "")
+            ).fetchone()
+            local_id = row[0] if row else (route.get("client_id") or f"srv-{route['id']}")
+            if local_id in pendentes:
+                continue
+            values = [route.get(field) for field in ROTA_FIELDS]
+            self._conn.execute(
+                f"""INSERT INTO rotas (local_id, server_id, controle_local_id, {", ".join(ROTA_FIELDS)}, sync_status)
+                    VALUES (?, ?, ?, {", ".join("?" for _ in ROTA_FIELDS)}, ?)
+                    ON CONFLICT (local_id) DO UPDATE SET server_id = excluded.server_id,
+                        {", ".join(f"{field} = excluded.{field}" for field in ROTA_FIELDS)},
+                        sync_status = excluded.sync_status, sync_message = NULL""",
+                (local_id, route["id"], controle_local_id, *values, SINCRONIZADO)
+            )
+        # Rotas já sincronizadas que não existem mais no servidor foram excluídas lá
+        placeholders = ", ".join("?" for _ in server_ids)
+        self._conn.execute(
+            f"""DELETE FROM rotas WHERE controle_local_id = ? AND sync_status = ?
+                AND server_id NOT IN ({placeholders})""",
+            (controle_local_id, SINCRONIZADO, *server_ids)
+        )
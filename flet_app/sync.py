@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+from itertools import takewhile
+from typing import Any, Callable, Dict, List, Optional
+
+from api_client import SGUVApiClient
+from local_store import ROTA_FIELDS, LocalStore
+
+# Quantas operações da outbox são lidas (e quantas rotas são enviadas) por vez
+OUTBOX_BATCH_SIZE = 200
+
+# Intervalo entre tentativas automáticas de sincronização, em segundos
+SYNC_INTERVAL = float(os.getenv("SGUV_SYNC_INTERVAL", "30"))
+
+# Fila JSON de rotas offline das versões anteriores; migrada para a outbox e apagada
+LEGACY_QUEUE_PATH = os.getenv(
+    "SGUV_OFFLINE_QUEUE",
+    os.path.join(os.path.expanduser("~"), ".sguv", "rotas_pendentes.json")
+)
+
+# Controles baixados só com os campos que LocalStore.apply_server_controls grava
+PULL_PROJECTION = {
+    "fields": "client_id,veiculo_id,data_inicio,km_inicial,km_final,data_fim,assinatura_eletronica,status,version",
+    "include": "veiculo,rotas",
+    "fields[veiculo]": "marca,modelo,placa",
+    "fields[rotas]": ",".join(("client_id",) + ROTA_FIELDS),
+}
+
+# Respostas em que a API recusou a operação em definitivo; reenviar não adianta
+CONFLICT_STATUS_CODES = {400, 403, 404, 409, 422}
+
+class SyncService:
+    """
+    Sincroniza o banco local do motorista com a API.
+
+    A outbox é reenviada na ordem em que as ações aconteceram; rotas
+    consecutivas vão juntas em um único POST /api/routes/bulk. Cada operação
+    leva uma chave de idempotência (o client_id do registro), então reenviar
+    depois de uma resposta perdida não duplica nada. Operações recusadas pela
+    API viram conflitos visíveis para o motorista; falhas de rede deixam a
+    operação na outbox para a próxima tentativa.
+    """
+
+    def __init__(self, api_client: SGUVApiClient, store: LocalStore, motorista_id: int):
+        self.api_client = api_client
+        self.store = store
+        self.motorista_id = motorista_id
+        self._sync_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._running = False
+        self._rerun = False
+        self._stop = threading.Event()
+
+    def sync(self) -> Dict[str, int]:
+        """Envia a outbox e, se tudo foi enviado, atualiza a cópia local com o servidor"""
+        with self._sync_lock:
+            if self.push():
+                self.pull()
+        return self.store.pending_count(self.motorista_id)
+
+    def sync_in_background(self, on_done: Optional[Callable[[Dict[str, int]], None]] = None):
+        """Sincroniza em uma thread; pedidos feitos durante uma sincronização são agrupados na próxima rodada"""
+        with self._state_lock:
+            if self._running:
+                self._rerun = True
+                return
+            self._running = True
+
+        def run():
+            while True:
+                try:
+                    summary = self.sync()
+                except Exception as e:
+                    print(f"Erro na sincronização: {e}")
+                    summary = self.store.pending_count(self.motorista_id)
+                with self._state_lock:
+                    if not self._rerun:
+                        self._running = False
+                        break
+                    self._rerun = False
+            if on_done:
+                on_done(summary)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def start(self, on_done: Optional[Callable[[Dict[str, int]], None]] = None, interval: float = SYNC_INTERVAL):
+        """Sincroniza agora e depois a cada ``interval`` segundos, até stop()"""
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                self.sync_in_background(on_done)
+                self._stop.wait(interval)
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    # Envio da outbox
+    def push(self) -> bool:
+        """Retorna False se parou antes do fim (sem conexão, sessão expirada ou erro do servidor)"""
+        while True:
+            entries = self.store.outbox_head(OUTBOX_BATCH_SIZE)
+            if not entries:
+                return True
+
+            tipo = entries[0]["tipo"]
+            if tipo == "criar_rota":
+                sent = self._push_routes(list(takewhile(lambda entry: entry["tipo"] == "criar_rota", entries)))
+            elif tipo == "criar_controle":
+                sent = self._push_control(entries[0])
+            else:
+                sent = self._push_finalize(entries[0])
+            if not sent:
+                return False
+
+    def _handle_failure(self, entries: List[Dict[str, Any]], table: str, result: Dict[str, Any]) -> bool:
+        message = result.get("message") or "Erro desconhecido"
+        if result.get("status_code") in CONFLICT_STATUS_CODES:
+            for entry in entries:
+                self.store.mark_conflict(entry["id"], table, entry["local_id"], message)
+            return True
+        self.store.outbox_failed([entry["id"] for entry in entries], message)
+        return False
+
+    def _push_control(self, entry: Dict[str, Any]) -> bool:
+        control = self.store.get_control(entry["local_id"])
+        result = self.api_client.create_usage_control(
+            control["veiculo_id"],
+            control["km_inicial"],
+            data_inicio=control["data_inicio"],
+            client_id=control["local_id"]
+        )
+        if result.get("success"):
+            self.store.control_synced(entry["id"], control["local_id"], result["data"])
+            return True
+        return self._handle_failure([entry], "controles", result)
+
+    def _push_finalize(self, entry: Dict[str, Any]) -> bool:
+        control = self.store.get_control(entry["local_id"])
+        result = self.api_client.finalize_usage_control(
+            control["server_id"],
+            control["km_final"],
+            control["assinatura_eletronica"] or "",
+            data_fim=control["data_fim"],
+            version=control["version"],
+            idempotency_key=entry["idempotency_key"]
+        )
+        if result.get("success"):
+            self.store.control_synced(entry["id"], control["local_id"], result["data"])
+            return True
+        if result.get("status_code") in (400, 409):
+            # A resposta de um envio anterior pode ter se perdido: se o servidor já
+            # tem o controle finalizado com a mesma quilometragem, está sincronizado
+            server = self.api_client.get_usage_control(control["server_id"])
+            if (server.get("success") and server["data"]["status"] == "finalizado"
+                    and server["data"]["km_final"] == control["km_final"]):
+                self.store.control_synced(entry["id"], control["local_id"], server["data"])
+                return True
+        return self._handle_failure([entry], "controles", result)
+
+    def _push_routes(self, entries: List[Dict[str, Any]]) -> bool:
+        by_client_id = {entry["local_id"]: entry for entry in entries}
+        routes = self.store.routes_payload(list(by_client_id))
+        # A chave de idempotência de cada rota é o próprio client_id
+        result = self.api_client.create_routes_bulk(routes)
+        if not result.get("success"):
+            if result.get("status_code") == 409:
+                # Parte do lote foi gravada em paralelo: reenviar resolve (as gravadas voltam como duplicadas)
+                self.store.outbox_failed([entry["id"] for entry in entries], result.get("message"))
+                return False
+            return self._handle_failure(entries, "rotas", result)
+
+        data = result["data"]
+        self.store.routes_synced({cid: entry["id"] for cid, entry in by_client_id.items()}, data["rotas"])
+        for rejeitada in data["rejeitadas"]:
+            entry = by_client_id[rejeitada["client_id"]]
+            self.store.mark_conflict(entry["id"], "rotas", entry["local_id"], rejeitada["detail"])
+
+        resolved = {route["client_id"] for route in data["rotas"]} | {r["client_id"] for r in data["rejeitadas"]}
+        missing = [entry["id"] for cid, entry in by_client_id.items() if cid not in resolved]
+        if missing:
+            self.store.outbox_failed(missing, "Rota não confirmada pela API")
+            return False
+        return True
+
+    # Atualização a partir do servidor
+    def pull(self):
+        controls = self.api_client.get_my_usage_controls(PULL_PROJECTION)
+        if controls.get("success"):
+            self.store.apply_server_controls(self.motorista_id, controls["data"])
+            self.migrate_legacy_queue()
+        vehicles = self.api_client.get_available_vehicles()
+        if vehicles.get("success"):
+            self.store.replace_vehicles(vehicles["data"])
+
+    def migrate_legacy_queue(self, path: str = LEGACY_QUEUE_PATH):
+        """
+        Passa para a outbox as rotas do motorista na antiga fila JSON. Roda depois
+        de baixar os controles (as rotas apontam para o id do controle no
+        servidor); o arquivo é apagado quando não sobra nenhuma rota nele.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            items = []
+
+        mine = [item["rota"] for item in items if item["motorista_id"] == self.motorista_id]
+        imported = set(self.store.import_legacy_routes(self.motorista_id, mine))
+        remaining = [item for item in items if item["rota"]["client_id"] not in imported]
+        if not remaining:
+            os.remove(path)
+        elif len(remaining) < len(items):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(remaining, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
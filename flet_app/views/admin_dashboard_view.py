@@ -4,8 +4,29 @@ import os
 import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from api_client import SGUVApiClient
-from datetime import datetime
+from image_cache import get_image_cache
+from datetime import date, datetime
 from typing import Dict, Any, List
+from .paged_table import PagedTable
+from .state import RecordEvents
+
+# Telas do menu lateral, na ordem dos itens
+MENU_VIEWS = ("dashboard", "users", "vehicles", "usage", "routes", "reports")
+# Telas montadas a partir dos dados carregados (remontadas quando os dados mudam)
+DATA_VIEWS = ("dashboard", "reports")
+# Lado maior (px) pedido para as fotos de veículos em cada contexto; a API escolhe a versão mais próxima
+VEHICLE_THUMBNAIL_SIZE = 128  # miniatura de 64x40 da tabela, em telas de alta densidade
+VEHICLE_DETAIL_SIZE = 640  # foto no dialog de detalhes
+
+class CachedView(ft.Container):
+    """
+    Tela montada uma só vez e mantida na página (só alterna ``visible``).
+    Isolada: atualizar o container pai não percorre nem reenvia os controles
+    dela; o conteúdo é atualizado com ``update()`` na própria tela.
+    """
+    
+    def is_isolated(self):
+        return True
 
 class AdminDashboardView:
     def __init__(self, page: ft.Page, api_client: SGUVApiClient, user_data: dict, on_logout_callback=None):
@@ -16,17 +37,91 @@ class AdminDashboardView:
         
         # Estado da aplicação
         self.current_view = "dashboard"
-        self.users_data = []
-        self.vehicles_data = []
-        self.usage_data = []
+        
+        # Filtros da listagem de utilizações (aplicados pela API)
+        self.usage_filters = {"status": "", "busca": "", "unidade": "", "data_de": "", "data_ate": "", "ordenar": "-data_inicio"}
+        
+        # Imagens baixadas ficam em cache (memória e disco): rolar, trocar de tela ou
+        # entrar de novo depois do logout não as baixa de novo
+        self.image_cache = get_image_cache()
+        
+        # Tabelas paginadas: guardam os registros já carregados e reaproveitam as linhas
+        self.users_table = PagedTable(
+            columns=[("Avatar", 1), ("Nome", 2), ("Email", 2), ("Perfil", 1), ("Status", 1), ("Ações", 1)],
+            fetch_page=lambda skip, limit: self.api_client.get_users(skip=skip, limit=limit),
+            create_row=self.create_user_row,
+            bind_row=self.bind_user_row,
+            empty_content=ft.Container(
+                content=ft.Text("Nenhum usuário encontrado", text_align=ft.TextAlign.CENTER),
+                padding=ft.padding.all(50)
+            ),
+            row_height=60,
+            on_error=self.show_table_error,
+            prefetch=lambda users: self.image_cache.prefetch(self.api_client.avatar_url(user, 48) for user in users)
+        )
+        self.vehicles_table = PagedTable(
+            columns=[("Foto", 1), ("Modelo", 2), ("Placa", 1), ("Tipo", 1), ("Ano", 1), ("Status", 1), ("Ações", 1)],
+            fetch_page=lambda skip, limit: self.api_client.get_vehicles(skip=skip, limit=limit),
+            create_row=self.create_vehicle_row,
+            bind_row=self.bind_vehicle_row,
+            prefetch=lambda vehicles: self.image_cache.prefetch(
+                self.api_client.vehicle_image_url(vehicle, VEHICLE_THUMBNAIL_SIZE) for vehicle in vehicles
+            ),
+            empty_content=ft.Container(
+                content=ft.Column([
+                    ft.Icon(ft.icons.DIRECTIONS_CAR, size=64, color=ft.colors.GREY_400),
+                    ft.Text("Nenhum veículo cadastrado", size=18, color=ft.colors.GREY_600),
+                    ft.Text("Clique em 'Novo Veículo' para começar", size=14, color=ft.colors.GREY_500),
+                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                padding=ft.padding.all(50),
+                alignment=ft.alignment.center
+            ),
+            on_error=self.show_table_error
+        )
+        self.usage_table = PagedTable(
+            columns=[("Motorista", 2), ("Veículo", 2), ("Destino", 2), ("Data/Hora", 2), ("Status", 1), ("Ações", 1)],
+            fetch_page=lambda skip, limit: self.api_client.get_usage_records(self.usage_filters, skip=skip, limit=limit),
+            create_row=self.create_usage_row,
+            bind_row=self.bind_usage_row,
+            empty_content=ft.Container(
+                content=ft.Column([
+                    ft.Icon(ft.icons.ASSIGNMENT, size=64, color=ft.colors.GREY_400),
+                    ft.Text("Nenhuma utilização registrada", size=18, color=ft.colors.GREY_600),
+                    ft.Text("Clique em 'Nova Utilização' para começar", size=14, color=ft.colors.GREY_500),
+                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                padding=ft.padding.all(50),
+                alignment=ft.alignment.center
+            ),
+            on_error=self.show_table_error
+        )
+        
+        # Alterações feitas pelos diálogos: cada tabela atualiza só a linha afetada
+        self.users_state = RecordEvents()
+        self.vehicles_state = RecordEvents()
+        self.users_state.subscribe(self.users_table.apply)
+        self.vehicles_state.subscribe(self.vehicles_table.apply)
+        self.users_state.subscribe(self.mark_reports_stale)
+        self.vehicles_state.subscribe(self.mark_reports_stale)
+        
+        # Valores dos cards do dashboard que acompanham os totais das tabelas
+        self.stat_values: Dict[str, ft.Text] = {}
+        self.users_table.total_state.subscribe(lambda total: self.set_stat_value("users", total))
+        self.vehicles_table.total_state.subscribe(lambda total: self.set_stat_value("vehicles", total))
         
         # Estado do menu lateral (True = expandido, False = retraído)
         self.sidebar_expanded = True
         
         # Componentes principais
         self.main_container = ft.Container()
-        self.content_area = ft.Container(expand=True)
+        self.views_column = ft.Column(expand=True, spacing=0)
+        self.content_area = ft.Container(content=self.views_column, expand=True)
         self.sidebar = None  # Será criado após carregar dados
+        self.menu_items = {}  # view_id -> item do menu lateral
+        
+        # Telas já montadas, as que precisam ser remontadas e as que mudaram enquanto ocultas
+        self.view_cache: Dict[str, CachedView] = {}
+        self.stale_views = set()
+        self.outdated_views = set()
         
         # Inicializar dados primeiro
         self.load_initial_data()
@@ -37,62 +132,63 @@ class AdminDashboardView:
         # Criar sidebar após carregar dados
         self.sidebar = self.create_sidebar()
     
+    @property
+    def users_data(self) -> List[Dict[str, Any]]:
+        """Usuários já carregados na tabela"""
+        return self.users_table.items
+    
+    @property
+    def vehicles_data(self) -> List[Dict[str, Any]]:
+        """Veículos já carregados na tabela"""
+        return self.vehicles_table.items
+    
+    @property
+    def usage_data(self) -> List[Dict[str, Any]]:
+        """Utilizações já carregadas na tabela (com os filtros atuais)"""
+        return self.usage_table.items
+    
     def load_initial_data(self):
-        """Carrega dados iniciais do sistema"""
-        try:
-            print("Carregando dados iniciais...")
-            
-            # Inicializar com dados vazios para evitar erros
-            self.users_data = []
-            self.vehicles_data = []
-            self.usage_data = []
-            
-            # Tentar carregar usuários
+        """Carrega a primeira página de cada tabela"""
+        print("Carregando dados iniciais...")
+        for label, table in (("Usuários", self.users_table), ("Veículos", self.vehicles_table), ("Registros de uso", self.usage_table)):
             try:
-                users_response = self.api_client.get_users()
-                if users_response and users_response.get('success'):
-                    self.users_data = users_response.get('data', [])
-                    print(f"Usuários carregados: {len(self.users_data)}")
+                if table.reload():
+                    print(f"{label} carregados: {len(table.items)} de {table.total}")
                 else:
-                    print("Erro ao carregar usuários, usando dados mock")
-                    self.users_data = [{"nome": "Admin", "email": "admin@sguv.com", "perfil": "admin", "status": "ativo"}]
+                    print(f"Erro ao carregar {label.lower()}")
             except Exception as e:
-                print(f"Erro ao carregar usuários: {e}")
-                self.users_data = [{"nome": "Admin", "email": "admin@sguv.com", "perfil": "admin", "status": "ativo"}]
-            
-            # Tentar carregar veículos
-            try:
-                vehicles_response = self.api_client.get_vehicles()
-                if vehicles_response and vehicles_response.get('success'):
-                    self.vehicles_data = vehicles_response.get('data', [])
-                    print(f"Veículos carregados: {len(self.vehicles_data)}")
-                else:
-                    print("Erro ao carregar veículos")
-                    self.vehicles_data = []
-            except Exception as e:
-                print(f"Erro ao carregar veículos: {e}")
-                self.vehicles_data = []
-            
-            # Tentar carregar dados de utilização
-            try:
-                usage_response = self.api_client.get_usage_records()
-                if usage_response and usage_response.get('success'):
-                    self.usage_data = usage_response.get('data', [])
-                    print(f"Registros de uso carregados: {len(self.usage_data)}")
-                else:
-                    print("Erro ao carregar registros de uso")
-                    self.usage_data = []
-            except Exception as e:
-                print(f"Erro ao carregar registros de uso: {e}")
-                self.usage_data = []
-                
-            print("Dados carregados com sucesso!")
-                
-        except Exception as e:
-            print(f"Erro geral ao carregar dados iniciais: {e}")
-            self.users_data = [{"nome": "Admin", "email": "admin@sguv.com", "perfil": "admin", "status": "ativo"}]
-            self.vehicles_data = []
-            self.usage_data = []
+                print(f"Erro ao carregar {label.lower()}: {e}")
+        # Tabelas se atualizam sozinhas; telas com totais calculados precisam ser remontadas
+        self.stale_views.update(DATA_VIEWS)
+        self.outdated_views.update(self.view_cache)
+        print("Dados carregados com sucesso!")
+    
+    def mark_reports_stale(self, event: str, record: Dict[str, Any]):
+        """Relatórios mostram totais consultados na API: remonta (e consulta de novo) na próxima visita"""
+        self.stale_views.add("reports")
+    
+    def fetch_usage_counts(self) -> Dict[str, Any]:
+        """
+        Totais de utilização pedidos à API (X-Total-Count com filtros): as tabelas
+        só têm as páginas já carregadas. "-" quando a consulta falha.
+        """
+        counts = {
+            "total": self.api_client.count_usage_records(),
+            "abertas": self.api_client.count_usage_records({"status": "aberto"}),
+            "finalizadas_hoje": self.api_client.count_usage_records(
+                {"status": "finalizado", "finalizado_em": date.today().isoformat()}
+            ),
+        }
+        return {key: "-" if value is None else value for key, value in counts.items()}
+    
+    def set_stat_value(self, key: str, value: int):
+        """Atualiza o número de um card do dashboard, enviando só o texto"""
+        text = self.stat_values.get(key)
+        if text is None:
+            return
+        text.value = str(value)
+        if text.page:
+            text.update()
     
     def create_sidebar(self):
         """Cria a barra lateral de navegação extensível"""
@@ -229,6 +325,7 @@ class AdminDashboardView:
                 ),
             ]
         
+        self.menu_items = dict(zip(MENU_VIEWS, menu_items))
         print(f"[DEBUG] Criados {len(menu_items)} itens de menu")
         
         # Estrutura simplificada do sidebar
@@ -318,44 +415,33 @@ class AdminDashboardView:
         print(f"[DEBUG] Menu lateral {'expandido' if self.sidebar_expanded else 'retraído'}")
         
         # Recriar o menu lateral com o novo estado
+        self.refresh_sidebar()
+    
+    def refresh_sidebar(self):
+        """Recria o menu lateral e envia só ele (as telas ficam como estão)"""
         self.sidebar = self.create_sidebar()
-        
-        # Atualizar o container principal
-        if hasattr(self, 'main_container') and self.main_container.controls:
+        if isinstance(self.main_container, ft.Row) and self.main_container.controls:
             self.main_container.controls[0] = self.sidebar
-        
-        # Atualizar a página
-        self.page.update()
+            if self.main_container.page:
+                self.main_container.update()
     
     def create_avatar_section(self, expanded: bool = True):
         """Cria a seção do avatar com funcionalidade de upload"""
         # Obter dados do usuário atual
         user_name = self.user_data.get('nome', 'Usuário')
         user_initial = user_name[0].upper() if user_name else 'U'
-        avatar_link = self.user_data.get('avatar_link')
         
-        print(f"[DEBUG] create_avatar_section - avatar_link: {avatar_link}")
-        
-        # Converter caminho local para URL do servidor se necessário
-        avatar_url = None
-        if avatar_link:
-            if avatar_link.startswith('public/'):
-                avatar_url = f"http://127.0.0.1:8000/{avatar_link}"
-            elif not avatar_link.startswith('http'):
-                avatar_url = f"http://127.0.0.1:8000/public/avatar/{os.path.basename(avatar_link)}"
-            else:
-                avatar_url = avatar_link
-            print(f"[DEBUG] create_avatar_section - avatar_url: {avatar_url}")
-        else:
-            print("[DEBUG] create_avatar_section - sem avatar_link")
+        # Miniatura de 256 px (o avatar expandido tem 120 px; cobre telas de alta densidade)
+        avatar_url = self.api_client.avatar_url(self.user_data, 256)
+        print(f"[DEBUG] create_avatar_section - avatar_url: {avatar_url}")
         
         if expanded:
             # Avatar com nome e botão de upload (modo expandido)
             if avatar_url:
                 # Mostrar imagem do avatar
                 avatar = ft.Container(
-                    content=ft.Image(
-                        src=avatar_url,
+                    content=self.cached_image(
+                        avatar_url,
                         width=120,
                         height=120,
                         fit=ft.ImageFit.COVER,
@@ -405,8 +491,8 @@ class AdminDashboardView:
             # Avatar compacto (modo retraído)
             if avatar_url:
                 return ft.Container(
-                    content=ft.Image(
-                        src=avatar_url,
+                    content=self.cached_image(
+                        avatar_url,
                         width=70,
                         height=70,
                         fit=ft.ImageFit.COVER,
@@ -445,6 +531,21 @@ class AdminDashboardView:
                     tooltip=f"Avatar de {user_name} - Clique para adicionar"
                 )
     
+    def set_image_source(self, image, url, prefetched=False):
+        """
+        Mostra a imagem a partir do cache local; usa a URL se ela não estiver lá.
+        ``prefetched``: o download já foi tentado (``prefetch``), então só consulta o
+        cache em vez de baixar de novo de forma síncrona.
+        """
+        encoded = self.image_cache.get(url) if prefetched else self.image_cache.fetch(url)
+        image.src_base64 = encoded
+        image.src = None if encoded else url
+    
+    def cached_image(self, url, prefetched=False, **kwargs):
+        image = ft.Image(**kwargs)
+        self.set_image_source(image, url, prefetched)
+        return image
+    
     def show_avatar_options(self, e):
         """Mostra opções de avatar (upload/remover)"""
         avatar_link = self.user_data.get('avatar_link')
@@ -472,8 +573,7 @@ class AdminDashboardView:
         )
         
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -490,16 +590,13 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def upload_avatar(self, e):
         """Inicia o processo de upload de avatar"""
         print("[DEBUG] upload_avatar chamado")
         # Fechar dialog de opções
-        self.page.dialog.open = False
-        self.page.update()
+        self.page.close_dialog()
         
         # Criar campo para inserir caminho do arquivo
         file_path_field = ft.TextField(
@@ -517,12 +614,10 @@ class AdminDashboardView:
                 self.process_avatar_upload(file_path)
             else:
                 print("[DEBUG] file_path está vazio!")
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         def browse_file(e):
             print("[DEBUG] browse_file chamado")
@@ -610,9 +705,7 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def process_avatar_upload(self, file_path: str):
         """Processa o upload do avatar"""
@@ -623,12 +716,10 @@ class AdminDashboardView:
             # Validar se o file_path não é None
             if not file_path:
                 print("[DEBUG] file_path é None ou vazio")
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text("Nenhum arquivo selecionado"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
-                self.page.update()
+                ))
                 return
             
             # Limpar espaços em branco
@@ -689,12 +780,10 @@ class AdminDashboardView:
                     except Exception as e:
                         print(f"[DEBUG] Erro ao listar diretório: {e}")
                         
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Arquivo não encontrado: {os.path.basename(file_path)}"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
-                    self.page.update()
+                    ))
                     return
             
             print(f"[DEBUG] Arquivo encontrado! Caminho final: '{file_path}'")
@@ -732,6 +821,7 @@ class AdminDashboardView:
                 if avatar_link:
                     # Atualizar dados do usuário localmente
                     self.user_data['avatar_link'] = avatar_link
+                    self.user_data['avatar_links'] = response_data.get('avatar_links') or {}
                     print(f"[DEBUG] Avatar link atualizado localmente: {self.user_data['avatar_link']}")
                     
                     # Recarregar dados do usuário do servidor para garantir sincronização
@@ -741,63 +831,48 @@ class AdminDashboardView:
                             server_user_data = user_response.get('data', {})
                             if server_user_data.get('avatar_link'):
                                 self.user_data['avatar_link'] = server_user_data['avatar_link']
+                                self.user_data['avatar_links'] = server_user_data.get('avatar_links') or {}
                                 print(f"[DEBUG] Avatar link atualizado do servidor: {self.user_data['avatar_link']}")
                     except Exception as e:
                         print(f"[DEBUG] Erro ao recarregar dados do usuário: {e}")
                     
-                    # Recarregar dados iniciais para atualizar a lista de usuários
-                    print("[DEBUG] Recarregando dados iniciais para atualizar lista de usuários...")
-                    self.load_initial_data()
-                    
-                    # Recriar sidebar para refletir mudanças
-                    self.sidebar = self.create_sidebar()
-                    self.main_container.controls[0] = self.sidebar
-                    
-                    # Atualizar conteúdo se estivermos na view de usuários
-                    if self.current_view == "users":
-                        print("[DEBUG] Atualizando view de usuários...")
-                        self.update_content()
+                    # Atualizar só a linha do usuário na tabela e o menu lateral
+                    self.users_state.updated(dict(self.user_data))
+                    self.refresh_sidebar()
                     
                     # Mostrar mensagem de sucesso
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Avatar atualizado com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                 else:
                     print("[DEBUG] ERRO: Avatar link não encontrado na resposta")
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Erro: Link do avatar não retornado pelo servidor"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
+                    ))
             else:
                 print(f"[DEBUG] Upload falhou: {response}")
                 # Mostrar erro
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao fazer upload: {response.get('message', 'Erro desconhecido')}"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
+                ))
                 
         except Exception as error:
             print(f"[DEBUG] Exceção capturada: {str(error)}")
             print(f"[DEBUG] Tipo da exceção: {type(error)}")
             import traceback
             print(f"[DEBUG] Traceback: {traceback.format_exc()}")
-            self.page.snack_bar = ft.SnackBar(
+            self.page.show_snack_bar(ft.SnackBar(
                 content=ft.Text(f"Erro ao processar upload: {str(error)}"),
                 bgcolor=ft.colors.RED
-            )
-            self.page.snack_bar.open = True
-        
-        self.page.update()
+            ))
     
     def remove_avatar(self, e):
         """Remove o avatar do usuário"""
         # Fechar dialog de opções
-        self.page.dialog.open = False
-        self.page.update()
+        self.page.close_dialog()
         
         def confirm_remove(e):
             try:
@@ -807,47 +882,34 @@ class AdminDashboardView:
                 if response.get('success'):
                     # Atualizar dados do usuário
                     self.user_data['avatar_link'] = None
+                    self.user_data['avatar_links'] = {}
                     
-                    # Recarregar dados iniciais para atualizar a lista de usuários
-                    print("[DEBUG] Recarregando dados iniciais após remoção do avatar...")
-                    self.load_initial_data()
-                    
-                    # Recriar sidebar
-                    self.sidebar = self.create_sidebar()
-                    self.main_container.controls[0] = self.sidebar
-                    
-                    # Atualizar conteúdo se estivermos na view de usuários
-                    if self.current_view == "users":
-                        print("[DEBUG] Atualizando view de usuários após remoção...")
-                        self.update_content()
+                    # Atualizar só a linha do usuário na tabela e o menu lateral
+                    self.users_state.updated(dict(self.user_data))
+                    self.refresh_sidebar()
                     
                     # Mostrar mensagem de sucesso
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Avatar removido com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Erro ao remover avatar: {response.get('message', 'Erro desconhecido')}"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                     
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao remover avatar: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
+                ))
             
             # Fechar dialog de confirmação
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         def close_confirm_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         # Dialog de confirmação
         confirm_dialog = ft.AlertDialog(
@@ -865,9 +927,7 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = confirm_dialog
-        confirm_dialog.open = True
-        self.page.update()
+        self.page.show_dialog(confirm_dialog)
     
     def create_menu_item(self, icon, title: str, view_id: str):
         """Cria um item do menu lateral"""
@@ -913,36 +973,32 @@ class AdminDashboardView:
     def change_view(self, view_id: str):
         """Muda a view atual"""
         print(f"[DEBUG] Mudando para view: {view_id}")
+        previous_view = self.current_view
         self.current_view = view_id
         
-        # Recriar o menu lateral para atualizar estados visuais
-        self.sidebar = self.create_sidebar()
-        
-        # Atualizar conteúdo
-        self.update_content()
-        
-        # Atualizar o container principal completamente
-        self.main_container.controls = [
-            self.sidebar,
-            self.content_area
-        ]
-        
-        # Atualizar página
-        self.page.update()
+        # Só os itens do menu que mudaram de destaque são reenviados
+        changed_items = []
+        for item_id in (previous_view, view_id):
+            item = self.menu_items.get(item_id)
+            if item is not None:
+                item.bgcolor = ft.colors.BLUE_100 if item_id == view_id else ft.colors.TRANSPARENT
+                changed_items.append(item)
+        
+        # Mostra a tela (montada só na primeira vez; reenviada só se mudou enquanto oculta)
+        self.update_content(refresh=view_id in self.outdated_views)
+        if changed_items and self.main_container.page:
+            self.page.update(*changed_items)
         print(f"[DEBUG] View alterada para: {view_id}")
     
     def create_dashboard_view(self):
         """Cria a view do dashboard principal"""
         # Cards de estatísticas
+        usage_counts = self.fetch_usage_counts()
         stats_cards = ft.Row([
-            self.create_stat_card("👥", "Usuários", len(self.users_data), ft.colors.BLUE),
-            self.create_stat_card("🚗", "Veículos", len(self.vehicles_data), ft.colors.GREEN),
-            self.create_stat_card("📋", "Utilizações Ativas", 
-                                len([u for u in self.usage_data if u.get('status') == 'em_uso']), 
-                                ft.colors.ORANGE),
-            self.create_stat_card("✅", "Concluídas Hoje", 
-                                len([u for u in self.usage_data if u.get('status') == 'concluido']), 
-                                ft.colors.PURPLE),
+            self.create_stat_card("👥", "Usuários", self.users_table.total, ft.colors.BLUE, key="users"),
+            self.create_stat_card("🚗", "Veículos", self.vehicles_table.total, ft.colors.GREEN, key="vehicles"),
+            self.create_stat_card("📋", "Utilizações Ativas", usage_counts["abertas"], ft.colors.ORANGE),
+            self.create_stat_card("✅", "Concluídas Hoje", usage_counts["finalizadas_hoje"], ft.colors.PURPLE),
         ], spacing=20)
         
         # Gráfico de atividades recentes (placeholder)
@@ -968,14 +1024,17 @@ class AdminDashboardView:
             recent_activity
         ], scroll=ft.ScrollMode.AUTO)
     
-    def create_stat_card(self, icon: str, title: str, value: int, color):
-        """Cria um card de estatística"""
+    def create_stat_card(self, icon: str, title: str, value: int, color, key: str = None):
+        """Cria um card de estatística (com ``key``, o valor acompanha ``set_stat_value``)"""
+        value_text = ft.Text(str(value), size=24, weight=ft.FontWeight.BOLD, color=color)
+        if key:
+            self.stat_values[key] = value_text
         return ft.Container(
             content=ft.Column([
                 ft.Row([
                     ft.Text(icon, size=32),
                     ft.Column([
-                        ft.Text(str(value), size=24, weight=ft.FontWeight.BOLD, color=color),
+                        value_text,
                         ft.Text(title, size=14, color=ft.colors.GREY_600)
                     ], spacing=0)
                 ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
@@ -1046,154 +1105,141 @@ class AdminDashboardView:
         # Header com botão de adicionar
         header = ft.Row([
             ft.Text("Gerenciamento de Usuários", size=20, weight=ft.FontWeight.BOLD),
-            ft.ElevatedButton(
-                content=ft.Row([
-                    ft.Icon(ft.icons.ADD),
-                    ft.Text("Novo Usuário")
-                ]),
-                bgcolor=ft.colors.BLUE,
-                color=ft.colors.WHITE,
-                on_click=self.show_add_user_dialog
-            )
+            ft.Row([
+                ft.OutlinedButton(
+                    content=ft.Row([
+                        ft.Icon(ft.icons.UPLOAD_FILE),
+                        ft.Text("Importar Planilha")
+                    ]),
+                    tooltip="CSV ou XLSX com as colunas: matricula, nome, email, senha, celular, unidade, perfil, status",
+                    on_click=lambda e: self.pick_import_file("usuarios")
+                ),
+                ft.ElevatedButton(
+                    content=ft.Row([
+                        ft.Icon(ft.icons.ADD),
+                        ft.Text("Novo Usuário")
+                    ]),
+                    bgcolor=ft.colors.BLUE,
+                    color=ft.colors.WHITE,
+                    on_click=self.show_add_user_dialog
+                )
+            ])
         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
         
-        # Tabela de usuários
+        # Tabela de usuários (rola sozinha e busca as próximas páginas)
         users_table = self.create_users_table()
         
         return ft.Column([
             header,
             ft.Container(height=20),
             users_table
-        ], scroll=ft.ScrollMode.AUTO)
+        ], expand=True)
     
     def create_users_table(self):
         """Cria tabela de usuários"""
-        if not self.users_data:
-            return ft.Container(
-                content=ft.Text("Nenhum usuário encontrado", text_align=ft.TextAlign.CENTER),
-                padding=ft.padding.all(50)
-            )
-        
-        # Header da tabela
-        header = ft.Row([
-            ft.Text("Avatar", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Nome", size=14, weight=ft.FontWeight.BOLD, expand=2),
-            ft.Text("Email", size=14, weight=ft.FontWeight.BOLD, expand=2),
-            ft.Text("Perfil", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Status", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Ações", size=14, weight=ft.FontWeight.BOLD, expand=1),
-        ])
-        
-        # Linhas da tabela
-        rows = []
-        for user in self.users_data:
-            status_color = ft.colors.GREEN if user.get('status') == 'ativo' else ft.colors.RED
-            
-            # Criar avatar para a tabela
-            user_name = user.get('nome', 'U')
-            user_initial = user_name[0].upper() if user_name else 'U'
-            avatar_link = user.get('avatar_link')
-            
-            # Converter caminho para URL se necessário
-            avatar_url = None
-            if avatar_link:
-                if avatar_link.startswith('public/'):
-                    avatar_url = f"http://127.0.0.1:8000/{avatar_link}"
-                elif not avatar_link.startswith('http'):
-                    avatar_url = f"http://127.0.0.1:8000/public/avatar/{os.path.basename(avatar_link)}"
-                else:
-                    avatar_url = avatar_link
-            
-            # Criar componente de avatar para tabela
-            if avatar_url:
-                table_avatar = ft.Container(
-                    content=ft.Image(
-                        src=avatar_url,
-                        width=45,
-                        height=45,
-                        fit=ft.ImageFit.COVER,
-                        border_radius=ft.border_radius.all(22)
-                    ),
-                    width=45,
-                    height=45,
-                    border_radius=ft.border_radius.all(22),
-                    bgcolor=ft.colors.BLUE,
-                    border=ft.border.all(2, ft.colors.GREY_300),
-                    shadow=ft.BoxShadow(
-                        spread_radius=1,
-                        blur_radius=3,
-                        color=ft.colors.with_opacity(0.2, ft.colors.BLACK),
-                        offset=ft.Offset(0, 1)
-                    )
-                )
-            else:
-                table_avatar = ft.Container(
-                    content=ft.CircleAvatar(
-                        content=ft.Text(user_initial, size=18, weight=ft.FontWeight.BOLD),
-                        bgcolor=ft.colors.BLUE,
-                        color=ft.colors.WHITE,
-                        radius=22
-                    ),
-                    border=ft.border.all(2, ft.colors.GREY_300),
-                    shadow=ft.BoxShadow(
-                        spread_radius=1,
-                        blur_radius=3,
-                        color=ft.colors.with_opacity(0.2, ft.colors.BLACK),
-                        offset=ft.Offset(0, 1)
-                    )
-                )
-            
-            rows.append(
-                ft.Row([
-                    ft.Container(content=table_avatar, expand=1, alignment=ft.alignment.center),
-                    ft.Text(user.get('nome', 'N/A'), expand=2),
-                    ft.Text(user.get('email', 'N/A'), expand=2),
-                    ft.Text(user.get('perfil', 'N/A').upper(), expand=1),
-                    ft.Container(
-                        content=ft.Text(user.get('status', 'N/A').upper(), color=ft.colors.WHITE, size=12),
-                        bgcolor=status_color,
-                        padding=ft.padding.symmetric(horizontal=8, vertical=4),
-                        border_radius=4,
-                        expand=1
-                    ),
-                    ft.Row([
-                        ft.IconButton(
-                            icon=ft.icons.VISIBILITY,
-                            tooltip="Ver Detalhes",
-                            on_click=lambda e, u=user: self.view_user_details(u)
-                        ),
-                        ft.IconButton(
-                            icon=ft.icons.EDIT,
-                            tooltip="Editar",
-                            on_click=lambda e, u=user: self.edit_user(u)
-                        ),
-                        ft.IconButton(
-                            icon=ft.icons.POWER_SETTINGS_NEW,
-                            tooltip="Ativar/Desativar",
-                            icon_color=ft.colors.GREEN if user.get('status') == 'ativo' else ft.colors.ORANGE,
-                            on_click=lambda e, u=user: self.toggle_user_status(u)
-                        ),
-                        ft.IconButton(
-                            icon=ft.icons.DELETE,
-                            tooltip="Excluir",
-                            icon_color=ft.colors.RED,
-                            on_click=lambda e, u=user: self.delete_user(u)
-                        )
-                    ], expand=1)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
-            )
-        
-        return ft.Container(
-            content=ft.Column([
-                header,
-                ft.Divider(),
-                *rows
-            ]),
-            padding=ft.padding.all(20),
-            bgcolor=ft.colors.WHITE,
-            border_radius=10,
-            border=ft.border.all(1, ft.colors.GREY_300)
+        return self.users_table.control
+    
+    def create_user_row(self):
+        """Cria uma linha vazia da tabela de usuários (preenchida por bind_user_row)"""
+        shadow = ft.BoxShadow(
+            spread_radius=1,
+            blur_radius=3,
+            color=ft.colors.with_opacity(0.2, ft.colors.BLACK),
+            offset=ft.Offset(0, 1)
+        )
+        avatar_image = ft.Image(
+            width=45,
+            height=45,
+            fit=ft.ImageFit.COVER,
+            border_radius=ft.border_radius.all(22)
+        )
+        avatar_initial = ft.Text(size=18, weight=ft.FontWeight.BOLD)
+        avatar = ft.Container(
+            width=45,
+            height=45,
+            border_radius=ft.border_radius.all(22),
+            bgcolor=ft.colors.BLUE,
+            border=ft.border.all(2, ft.colors.GREY_300),
+            shadow=shadow
         )
+        cells = {
+            "avatar": avatar,
+            "avatar_image": avatar_image,
+            "avatar_initial": ft.CircleAvatar(
+                content=avatar_initial,
+                bgcolor=ft.colors.BLUE,
+                color=ft.colors.WHITE,
+                radius=22
+            ),
+            "avatar_initial_text": avatar_initial,
+            "nome": ft.Text(expand=2),
+            "email": ft.Text(expand=2),
+            "perfil": ft.Text(expand=1),
+            "status_text": ft.Text(color=ft.colors.WHITE, size=12),
+            "toggle": ft.IconButton(
+                icon=ft.icons.POWER_SETTINGS_NEW,
+                tooltip="Ativar/Desativar"
+            ),
+            "item": None
+        }
+        cells["status"] = ft.Container(
+            content=cells["status_text"],
+            padding=ft.padding.symmetric(horizontal=8, vertical=4),
+            border_radius=4,
+            expand=1
+        )
+        row = ft.Row([
+            ft.Container(content=avatar, expand=1, alignment=ft.alignment.center),
+            cells["nome"],
+            cells["email"],
+            cells["perfil"],
+            cells["status"],
+            ft.Row([
+                ft.IconButton(
+                    icon=ft.icons.VISIBILITY,
+                    tooltip="Ver Detalhes",
+                    on_click=lambda e: self.view_user_details(cells["item"])
+                ),
+                ft.IconButton(
+                    icon=ft.icons.EDIT,
+                    tooltip="Editar",
+                    on_click=lambda e: self.edit_user(cells["item"])
+                ),
+                cells["toggle"],
+                ft.IconButton(
+                    icon=ft.icons.DELETE,
+                    tooltip="Excluir",
+                    icon_color=ft.colors.RED,
+                    on_click=lambda e: self.delete_user(cells["item"])
+                )
+            ], expand=1)
+        ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN, data=cells)
+        cells["toggle"].on_click = lambda e: self.toggle_user_status(cells["item"])
+        return row
+    
+    def bind_user_row(self, row, user):
+        """Preenche uma linha da tabela de usuários"""
+        cells = row.data
+        cells["item"] = user
+        
+        user_name = user.get('nome', 'U')
+        # Miniatura de 48 px para o círculo de 45 px da tabela
+        avatar_url = self.api_client.avatar_url(user, 48)
+        
+        if avatar_url:
+            self.set_image_source(cells["avatar_image"], avatar_url, prefetched=True)
+            cells["avatar"].content = cells["avatar_image"]
+        else:
+            cells["avatar_initial_text"].value = user_name[0].upper() if user_name else 'U'
+            cells["avatar"].content = cells["avatar_initial"]
+        
+        ativo = user.get('status') == 'ativo'
+        cells["nome"].value = user.get('nome', 'N/A')
+        cells["email"].value = user.get('email', 'N/A')
+        cells["perfil"].value = (user.get('perfil') or 'N/A').upper()
+        cells["status_text"].value = (user.get('status') or 'N/A').upper()
+        cells["status"].bgcolor = ft.colors.GREEN if ativo else ft.colors.RED
+        cells["toggle"].icon_color = ft.colors.GREEN if ativo else ft.colors.ORANGE
     
     def show_add_user_dialog(self, e):
         """Mostra dialog para adicionar usuário"""
@@ -1213,8 +1259,7 @@ class AdminDashboardView:
         senha_field = ft.TextField(label="Senha", password=True, width=300)
         
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
 
         def save_user(e):
             user_data = {
@@ -1228,27 +1273,22 @@ class AdminDashboardView:
             try:
                 response = self.api_client.create_user(user_data)
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.dialog.open = False
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.close_dialog()
+                    self.users_state.added(response['data'])
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Usuário criado com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Erro ao criar usuário: {response.get('message', 'Erro desconhecido')}"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao criar usuário: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
-            self.page.update()
+                ))
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -1266,15 +1306,79 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
+        self.page.show_dialog(dialog)
+    
+    def pick_import_file(self, target: str):
+        """Abre o seletor de planilha para importar usuários ou veículos em lote"""
+        def on_result(e: ft.FilePickerResultEvent):
+            if e.files and e.files[0].path:
+                self.run_import(target, e.files[0].path)
+        
+        file_picker = ft.FilePicker(on_result=on_result)
+        self.page.overlay.append(file_picker)
         self.page.update()
+        file_picker.pick_files(
+            dialog_title="Selecionar Planilha",
+            file_type=ft.FilePickerFileType.CUSTOM,
+            allowed_extensions=["csv", "xlsx"],
+            allow_multiple=False
+        )
+    
+    def run_import(self, target: str, file_path: str):
+        """Envia a planilha e mostra o relatório da importação"""
+        def close_dialog(e):
+            self.page.close_dialog()
+        
+        self.page.show_dialog(ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Importando..."),
+            content=ft.Row([ft.ProgressRing(), ft.Text(os.path.basename(file_path))], spacing=15)
+        ))
+        
+        if target == "usuarios":
+            response = self.api_client.import_users(file_path)
+        else:
+            response = self.api_client.import_vehicles(file_path)
+        
+        if not response.get('success'):
+            self.page.close_dialog()
+            self.page.show_snack_bar(ft.SnackBar(
+                content=ft.Text(f"Erro na importação: {response.get('message', 'Erro desconhecido')}"),
+                bgcolor=ft.colors.RED
+            ))
+            return
+        
+        report = response['data']
+        errors = report.get('erros', [])
+        content = [
+            ft.Text(f"Linhas lidas: {report['total']}"),
+            ft.Text(f"Importadas: {report['importados']}", color=ft.colors.GREEN),
+            ft.Text(f"Com erro: {len(errors)}", color=ft.colors.RED if errors else None),
+        ]
+        if errors:
+            content.append(ft.Divider())
+            # Mostra só as primeiras linhas com erro para não travar o diálogo
+            content.extend(
+                ft.Text(f"Linha {error['linha']}: {error['erro']}", size=12)
+                for error in errors[:100]
+            )
+            if len(errors) > 100:
+                content.append(ft.Text(f"... e mais {len(errors) - 100} linha(s)", size=12, italic=True))
+        
+        # Importação em lote: recarrega só a tabela importada
+        self.reload_table(self.users_table if target == "usuarios" else self.vehicles_table)
+        self.stale_views.update(DATA_VIEWS)
+        self.page.show_dialog(ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Importação concluída"),
+            content=ft.Column(content, tight=True, scroll=ft.ScrollMode.AUTO, height=300, width=450),
+            actions=[ft.TextButton("Fechar", on_click=close_dialog)]
+        ))
     
     def view_user_details(self, user):
         """Visualiza detalhes do usuário"""
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         details_content = ft.Column([
             ft.Container(
@@ -1318,9 +1422,7 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def create_detail_row(self, icon, label, value):
         """Cria uma linha de detalhe"""
@@ -1350,8 +1452,7 @@ class AdminDashboardView:
         celular_field = ft.TextField(label="Celular", width=300, value=user.get('celular', ''))
         
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
 
         def save_changes(e):
             user_data = {
@@ -1360,33 +1461,30 @@ class AdminDashboardView:
                 "matricula": matricula_field.value,
                 "perfil": perfil_dropdown.value,
                 "unidade": unidade_field.value,
-                "celular": celular_field.value
+                "celular": celular_field.value,
+                # Versão carregada na listagem; a API recusa (409) se outro usuário já alterou o registro
+                "version": user.get('version')
             }
             
             try:
                 response = self.api_client.update_user(user['id'], user_data)
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.dialog.open = False
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.close_dialog()
+                    self.users_state.updated(response['data'])
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Usuário atualizado com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Erro ao atualizar usuário: {response.get('message', 'Erro desconhecido')}"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao atualizar usuário: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
-            self.page.update()
+                ))
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -1405,9 +1503,7 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def toggle_user_status(self, user):
         """Alterna status do usuário (ativo/inativo)"""
@@ -1416,8 +1512,7 @@ class AdminDashboardView:
         action = 'ativar' if new_status == 'ativo' else 'desativar'
         
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         def confirm_toggle(e):
             try:
@@ -1427,26 +1522,22 @@ class AdminDashboardView:
                     response = self.api_client.deactivate_user(user['id'])
                 
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.snack_bar = ft.SnackBar(
+                    self.refresh_user(user['id'], {**user, "status": new_status})
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Usuário {action}do com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Erro ao {action} usuário!"),
                         bgcolor=ft.colors.RED
-                    )
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao {action} usuário: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-            
-            self.page.dialog.open = False
-            self.page.snack_bar.open = True
-            self.page.update()
+                ))
+            self.page.close_dialog()
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -1463,39 +1554,33 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
 
     def delete_user(self, user):
         """Exclui um usuário"""
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         def confirm_delete(e):
             try:
                 response = self.api_client.delete_user(user['id'])
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.snack_bar = ft.SnackBar(
+                    self.users_state.removed(user)
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Usuário excluído com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Erro ao excluir usuário!"),
                         bgcolor=ft.colors.RED
-                    )
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao excluir usuário: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-            self.page.dialog.open = False
-            self.page.snack_bar.open = True
-            self.page.update()
+                ))
+            self.page.close_dialog()
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -1507,112 +1592,117 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def create_vehicles_view(self):
         """Cria a view de gerenciamento de veículos"""
         # Header com botão de adicionar
         header = ft.Row([
             ft.Text("Gerenciamento de Veículos", size=20, weight=ft.FontWeight.BOLD),
-            ft.ElevatedButton(
-                content=ft.Row([
-                    ft.Icon(ft.icons.ADD),
-                    ft.Text("Novo Veículo")
-                ]),
-                bgcolor=ft.colors.GREEN,
-                color=ft.colors.WHITE,
-                on_click=self.show_add_vehicle_dialog
-            )
+            ft.Row([
+                ft.OutlinedButton(
+                    content=ft.Row([
+                        ft.Icon(ft.icons.UPLOAD_FILE),
+                        ft.Text("Importar Planilha")
+                    ]),
+                    tooltip="CSV ou XLSX com as colunas: marca, modelo, placa, ano, motor, tipo, status",
+                    on_click=lambda e: self.pick_import_file("veiculos")
+                ),
+                ft.ElevatedButton(
+                    content=ft.Row([
+                        ft.Icon(ft.icons.ADD),
+                        ft.Text("Novo Veículo")
+                    ]),
+                    bgcolor=ft.colors.GREEN,
+                    color=ft.colors.WHITE,
+                    on_click=self.show_add_vehicle_dialog
+                )
+            ])
         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
         
-        # Tabela de veículos
+        # Tabela de veículos (rola sozinha e busca as próximas páginas)
         vehicles_table = self.create_vehicles_table()
         
         return ft.Column([
             header,
             ft.Container(height=20),
             vehicles_table
-        ], scroll=ft.ScrollMode.AUTO)
+        ], expand=True)
     
     def create_vehicles_table(self):
         """Cria tabela de veículos"""
-        if not self.vehicles_data:
-            return ft.Container(
-                content=ft.Column([
-                    ft.Icon(ft.icons.DIRECTIONS_CAR, size=64, color=ft.colors.GREY_400),
-                    ft.Text("Nenhum veículo cadastrado", size=18, color=ft.colors.GREY_600),
-                    ft.Text("Clique em 'Novo Veículo' para começar", size=14, color=ft.colors.GREY_500),
-                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
-                padding=ft.padding.all(50),
-                alignment=ft.alignment.center
-            )
-        
-        # Header da tabela
-        header = ft.Row([
-            ft.Text("Modelo", size=14, weight=ft.FontWeight.BOLD, expand=2),
-            ft.Text("Placa", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Tipo", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Ano", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Status", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Ações", size=14, weight=ft.FontWeight.BOLD, expand=1),
-        ])
-        
-        # Linhas da tabela
-        rows = []
-        for vehicle in self.vehicles_data:
-            status_color = ft.colors.GREEN if vehicle.get('status') == 'disponivel' else ft.colors.RED
-            
-            # Corrigir problema com campos None
-            tipo_text = vehicle.get('tipo') or 'N/A'
-            status_text = vehicle.get('status') or 'N/A'
-            
-            rows.append(
-                ft.Row([
-                    ft.Text(f"{vehicle.get('marca', 'N/A')} {vehicle.get('modelo', 'N/A')}", expand=2),
-                    ft.Text(vehicle.get('placa', 'N/A'), expand=1),
-                    ft.Text(tipo_text.upper() if tipo_text != 'N/A' else 'N/A', expand=1),
-                    ft.Text(str(vehicle.get('ano', 'N/A')), expand=1),
-                    ft.Container(
-                        content=ft.Text(status_text.upper() if status_text != 'N/A' else 'N/A', color=ft.colors.WHITE, size=12),
-                        bgcolor=status_color,
-                        padding=ft.padding.symmetric(horizontal=8, vertical=4),
-                        border_radius=4,
-                        expand=1
-                    ),
-                    ft.Row([
-                        ft.IconButton(
-                            icon=ft.icons.VISIBILITY,
-                            tooltip="Ver Detalhes",
-                            on_click=lambda e, v=vehicle: self.view_vehicle_details(v)
-                        ),
-                        ft.IconButton(
-                            icon=ft.icons.EDIT,
-                            tooltip="Editar",
-                            on_click=lambda e, v=vehicle: self.edit_vehicle(v)
-                        ),
-                        ft.IconButton(
-                            icon=ft.icons.DELETE,
-                            tooltip="Excluir",
-                            icon_color=ft.colors.RED,
-                            on_click=lambda e, v=vehicle: self.delete_vehicle(v)
-                        )
-                    ], expand=1)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
-            )
-        
-        return ft.Container(
-            content=ft.Column([
-                header,
-                ft.Divider(),
-                *rows
-            ]),
-            padding=ft.padding.all(20),
-            bgcolor=ft.colors.WHITE,
-            border_radius=10,
-            border=ft.border.all(1, ft.colors.GREY_300)
+        return self.vehicles_table.control
+    
+    def create_vehicle_row(self):
+        """Cria uma linha vazia da tabela de veículos (preenchida por bind_vehicle_row)"""
+        cells = {
+            "foto": ft.Container(width=64, height=40, border_radius=4, bgcolor=ft.colors.GREY_200,
+                                 alignment=ft.alignment.center),
+            "foto_image": ft.Image(width=64, height=40, fit=ft.ImageFit.COVER, border_radius=ft.border_radius.all(4)),
+            "foto_icon": ft.Icon(ft.icons.DIRECTIONS_CAR, size=20, color=ft.colors.GREY_500),
+            "modelo": ft.Text(expand=2),
+            "placa": ft.Text(expand=1),
+            "tipo": ft.Text(expand=1),
+            "ano": ft.Text(expand=1),
+            "status_text": ft.Text(color=ft.colors.WHITE, size=12),
+            "item": None
+        }
+        cells["status"] = ft.Container(
+            content=cells["status_text"],
+            padding=ft.padding.symmetric(horizontal=8, vertical=4),
+            border_radius=4,
+            expand=1
         )
+        return ft.Row([
+            ft.Container(content=cells["foto"], expand=1, alignment=ft.alignment.center_left),
+            cells["modelo"],
+            cells["placa"],
+            cells["tipo"],
+            cells["ano"],
+            cells["status"],
+            ft.Row([
+                ft.IconButton(
+                    icon=ft.icons.VISIBILITY,
+                    tooltip="Ver Detalhes",
+                    on_click=lambda e: self.view_vehicle_details(cells["item"])
+                ),
+                ft.IconButton(
+                    icon=ft.icons.EDIT,
+                    tooltip="Editar",
+                    on_click=lambda e: self.edit_vehicle(cells["item"])
+                ),
+                ft.IconButton(
+                    icon=ft.icons.DELETE,
+                    tooltip="Excluir",
+                    icon_color=ft.colors.RED,
+                    on_click=lambda e: self.delete_vehicle(cells["item"])
+                )
+            ], expand=1)
+        ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN, data=cells)
+    
+    def bind_vehicle_row(self, row, vehicle):
+        """Preenche uma linha da tabela de veículos"""
+        cells = row.data
+        cells["item"] = vehicle
+        
+        # Capa na menor versão (160 px no lado maior): a listagem só traz os caminhos, não a galeria
+        image_url = self.api_client.vehicle_image_url(vehicle, VEHICLE_THUMBNAIL_SIZE)
+        if image_url:
+            self.set_image_source(cells["foto_image"], image_url, prefetched=True)
+            cells["foto"].content = cells["foto_image"]
+        else:
+            cells["foto"].content = cells["foto_icon"]
+        
+        # Corrigir problema com campos None
+        tipo_text = vehicle.get('tipo') or 'N/A'
+        status_text = vehicle.get('status') or 'N/A'
+        
+        cells["modelo"].value = f"{vehicle.get('marca', 'N/A')} {vehicle.get('modelo', 'N/A')}"
+        cells["placa"].value = vehicle.get('placa', 'N/A')
+        cells["tipo"].value = tipo_text.upper() if tipo_text != 'N/A' else 'N/A'
+        cells["ano"].value = str(vehicle.get('ano', 'N/A'))
+        cells["status_text"].value = status_text.upper() if status_text != 'N/A' else 'N/A'
+        cells["status"].bgcolor = ft.colors.GREEN if vehicle.get('status') == 'disponivel' else ft.colors.RED
     
     def show_add_vehicle_dialog(self, e):
         """Mostra dialog para adicionar veículo"""
@@ -1662,8 +1752,7 @@ class AdminDashboardView:
         )
         
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
 
         def save_vehicle(e):
             vehicle_data = {
@@ -1681,27 +1770,22 @@ class AdminDashboardView:
             try:
                 response = self.api_client.create_vehicle(vehicle_data)
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.dialog.open = False
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.close_dialog()
+                    self.vehicles_state.added(response['data'])
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Veículo criado com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Erro ao criar veículo: {response.get('message', 'Erro desconhecido')}"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao criar veículo: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
-            self.page.update()
+                ))
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -1723,15 +1807,12 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def view_vehicle_details(self, vehicle):
         """Visualiza detalhes do veículo"""
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         # Determinar cor do status
         status_colors = {
@@ -1743,6 +1824,7 @@ class AdminDashboardView:
         status_color = status_colors.get(vehicle.get('status', 'disponivel'), ft.colors.GREY)
         
         details_content = ft.Column([
+            self.create_vehicle_gallery(vehicle),
             ft.Container(
                 content=ft.Row([
                     ft.Icon(ft.icons.DIRECTIONS_CAR, size=40, color=ft.colors.BLUE),
@@ -1787,16 +1869,152 @@ class AdminDashboardView:
         dialog = ft.AlertDialog(
             modal=True,
             title=ft.Text("Detalhes do Veículo"),
-            content=details_content,
+            content=ft.Column([details_content], width=480, scroll=ft.ScrollMode.AUTO),
             actions=[
                 ft.ElevatedButton("Fechar", on_click=close_dialog)
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
 
+    def create_vehicle_gallery(self, vehicle):
+        """
+        Galeria de fotos do dialog de detalhes: a foto escolhida na versão de
+        640 px e as demais como miniaturas (as fotos só são buscadas aqui, não na listagem)
+        """
+        vehicle_id = vehicle.get('id')
+        state = {"photos": [], "selected": None}
+        
+        main_image = ft.Image(fit=ft.ImageFit.CONTAIN, border_radius=ft.border_radius.all(8))
+        main_area = ft.Container(
+            height=240,
+            bgcolor=ft.colors.GREY_100,
+            border_radius=8,
+            alignment=ft.alignment.center
+        )
+        thumbnails = ft.Row(spacing=8, scroll=ft.ScrollMode.AUTO)
+        cover_button = ft.TextButton("Usar como capa", icon=ft.icons.STAR_OUTLINE)
+        delete_button = ft.TextButton("Remover foto", icon=ft.icons.DELETE_OUTLINE, style=ft.ButtonStyle(color=ft.colors.RED))
+        
+        def show_message(message, color):
+            self.page.show_snack_bar(ft.SnackBar(content=ft.Text(message), bgcolor=color))
+        
+        def render():
+            selected = state["selected"]
+            # Sem foto escolhida, mostra a capa (com as dimensões da foto da galeria, se é uma delas)
+            image = selected or next(
+                (photo for photo in state["photos"] if photo.get('imagem_link') == vehicle.get('imagem_link')), vehicle
+            )
+            image_url = self.api_client.vehicle_image_url(image, VEHICLE_DETAIL_SIZE)
+            if image_url:
+                # Reserva o espaço pela proporção gravada na API, antes da imagem chegar
+                width, height = (image.get('dimensoes') or {}).get(str(VEHICLE_DETAIL_SIZE), (None, None))
+                main_image.width = round(width * 240 / height) if width and height else None
+                main_image.height = 240
+                self.set_image_source(main_image, image_url)
+                main_area.content = main_image
+            else:
+                main_area.content = ft.Icon(ft.icons.DIRECTIONS_CAR, size=64, color=ft.colors.GREY_400)
+            
+            thumbnails.controls = []
+            for photo in state["photos"]:
+                thumbnail = self.cached_image(
+                    self.api_client.vehicle_image_url(photo, VEHICLE_THUMBNAIL_SIZE), prefetched=True,
+                    width=64, height=48, fit=ft.ImageFit.COVER, border_radius=ft.border_radius.all(4)
+                )
+                is_selected = selected is not None and photo['id'] == selected['id']
+                thumbnails.controls.append(ft.Container(
+                    content=thumbnail,
+                    border=ft.border.all(2, ft.colors.BLUE if is_selected else ft.colors.TRANSPARENT),
+                    border_radius=6,
+                    on_click=lambda e, photo=photo: select(photo),
+                    tooltip=photo.get('nome_arquivo') or f"{photo.get('largura')}x{photo.get('altura')}"
+                ))
+            is_cover = selected is not None and selected.get('imagem_link') == vehicle.get('imagem_link')
+            cover_button.visible = selected is not None and not is_cover
+            delete_button.visible = selected is not None
+        
+        def refresh(update=True):
+            response = self.api_client.get_vehicle_photos(vehicle_id)
+            state["photos"] = (response.get('data') or []) if response and response.get('success') else []
+            self.image_cache.prefetch(
+                self.api_client.vehicle_image_url(photo, VEHICLE_THUMBNAIL_SIZE) for photo in state["photos"]
+            )
+            selected_id = (state["selected"] or {}).get('id')
+            state["selected"] = next((photo for photo in state["photos"] if photo['id'] == selected_id), None)
+            render()
+            if update:
+                gallery.update()
+        
+        def select(photo):
+            state["selected"] = photo
+            render()
+            gallery.update()
+        
+        def vehicle_changed():
+            # Capa nova: a linha da tabela troca a miniatura
+            response = self.api_client.get_vehicle(vehicle_id)
+            if response and response.get('success'):
+                vehicle.update(response['data'])
+                self.vehicles_state.updated(response['data'])
+        
+        def add_photo(e):
+            def on_result(e: ft.FilePickerResultEvent):
+                if not (e.files and e.files[0].path):
+                    return
+                response = self.api_client.upload_vehicle_photo(vehicle_id, e.files[0].path)
+                if not response.get('success'):
+                    show_message(f"Erro ao enviar foto: {response.get('message', 'Erro desconhecido')}", ft.colors.RED)
+                    return
+                state["selected"] = response['data']
+                if not vehicle.get('imagem_link'):
+                    vehicle_changed()
+                refresh()
+                show_message("Foto adicionada!", ft.colors.GREEN)
+            
+            file_picker = ft.FilePicker(on_result=on_result)
+            self.page.overlay.append(file_picker)
+            self.page.update()
+            file_picker.pick_files(
+                dialog_title="Selecionar Foto do Veículo",
+                file_type=ft.FilePickerFileType.IMAGE,
+                allow_multiple=False
+            )
+        
+        def set_cover(e):
+            response = self.api_client.set_vehicle_cover(vehicle_id, state["selected"]['id'])
+            if response and response.get('success'):
+                vehicle.update(response['data'])
+                self.vehicles_state.updated(response['data'])
+                render()
+                gallery.update()
+                show_message("Capa atualizada!", ft.colors.GREEN)
+            else:
+                show_message(f"Erro ao definir capa: {response.get('message', 'Erro desconhecido')}", ft.colors.RED)
+        
+        def delete_photo(e):
+            response = self.api_client.delete_vehicle_photo(vehicle_id, state["selected"]['id'])
+            if response and response.get('success'):
+                state["selected"] = None
+                refresh()
+                show_message("Foto removida!", ft.colors.GREEN)
+            else:
+                show_message(f"Erro ao remover foto: {response.get('message', 'Erro desconhecido')}", ft.colors.RED)
+        
+        cover_button.on_click = set_cover
+        delete_button.on_click = delete_photo
+        gallery = ft.Column([
+            main_area,
+            thumbnails,
+            ft.Row([
+                ft.TextButton("Adicionar foto", icon=ft.icons.ADD_A_PHOTO, on_click=add_photo),
+                cover_button,
+                delete_button
+            ], wrap=True)
+        ], spacing=8)
+        refresh(update=False)
+        return gallery
+    
     def edit_vehicle(self, vehicle):
         """Edita um veículo"""
         # Campos do formulário preenchidos
@@ -1849,8 +2067,7 @@ class AdminDashboardView:
         )
         
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
 
         def save_changes(e):
             vehicle_data = {
@@ -1862,33 +2079,29 @@ class AdminDashboardView:
                 "combustivel": combustivel_dropdown.value,
                 "cor": cor_field.value,
                 "quilometragem_atual": float(quilometragem_field.value) if quilometragem_field.value else 0,
-                "status": status_dropdown.value
+                "status": status_dropdown.value,
+                "version": vehicle.get('version')
             }
             
             try:
                 response = self.api_client.update_vehicle(vehicle['id'], vehicle_data)
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.dialog.open = False
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.close_dialog()
+                    self.vehicles_state.updated(response['data'])
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Veículo atualizado com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Erro ao atualizar veículo: {response.get('message', 'Erro desconhecido')}"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao atualizar veículo: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
-            self.page.update()
+                ))
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -1910,39 +2123,33 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def delete_vehicle(self, vehicle):
         """Exclui um veículo"""
         def close_dialog(e):
-            self.page.dialog.open = False
-            self.page.update()
+            self.page.close_dialog()
         
         def confirm_delete(e):
             try:
                 response = self.api_client.delete_vehicle(vehicle['id'])
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.snack_bar = ft.SnackBar(
+                    self.vehicles_state.removed(vehicle)
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Veículo excluído com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Erro ao excluir veículo!"),
                         bgcolor=ft.colors.RED
-                    )
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao excluir veículo: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-            self.page.dialog.open = False
-            self.page.snack_bar.open = True
-            self.page.update()
+                ))
+            self.page.close_dialog()
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -1954,9 +2161,7 @@ class AdminDashboardView:
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def create_usage_view(self):
         """Cria a view de controle de uso"""
@@ -1974,24 +2179,48 @@ class AdminDashboardView:
             )
         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
         
-        # Filtros
+        # Filtros (aplicados pela API; a tabela recebe só a página exibida)
+        self.usage_status_filter = ft.Dropdown(
+            label="Status",
+            width=150,
+            options=[
+                ft.dropdown.Option("", "Todos"),
+                ft.dropdown.Option("aberto", "Em Uso"),
+                ft.dropdown.Option("finalizado", "Concluído"),
+                ft.dropdown.Option("cancelado", "Cancelado")
+            ],
+            value=self.usage_filters["status"]
+        )
+        self.usage_search_filter = ft.TextField(
+            label="Buscar motorista, matrícula ou placa", width=260,
+            value=self.usage_filters["busca"], on_submit=self.filter_usage_records
+        )
+        self.usage_unit_filter = ft.TextField(label="Unidade", width=120, value=self.usage_filters["unidade"])
+        self.usage_from_filter = ft.TextField(label="De (AAAA-MM-DD)", width=150, value=self.usage_filters["data_de"])
+        self.usage_to_filter = ft.TextField(label="Até (AAAA-MM-DD)", width=150, value=self.usage_filters["data_ate"])
+        self.usage_sort_filter = ft.Dropdown(
+            label="Ordenar por",
+            width=170,
+            options=[
+                ft.dropdown.Option("-data_inicio", "Mais recentes"),
+                ft.dropdown.Option("data_inicio", "Mais antigos"),
+                ft.dropdown.Option("motorista", "Motorista"),
+                ft.dropdown.Option("veiculo", "Veículo"),
+                ft.dropdown.Option("status", "Status")
+            ],
+            value=self.usage_filters["ordenar"]
+        )
         filters = ft.Row([
-            ft.Dropdown(
-                label="Status",
-                width=150,
-                options=[
-                    ft.dropdown.Option("todos", "Todos"),
-                    ft.dropdown.Option("em_uso", "Em Uso"),
-                    ft.dropdown.Option("concluido", "Concluído"),
-                    ft.dropdown.Option("cancelado", "Cancelado")
-                ],
-                value="todos"
-            ),
-            ft.DatePicker(),
+            self.usage_status_filter,
+            self.usage_search_filter,
+            self.usage_unit_filter,
+            self.usage_from_filter,
+            self.usage_to_filter,
+            self.usage_sort_filter,
             ft.ElevatedButton("Filtrar", on_click=self.filter_usage_records)
-        ], spacing=20)
+        ], spacing=20, wrap=True)
         
-        # Tabela de utilizações
+        # Tabela de utilizações (rola sozinha e busca as próximas páginas)
         usage_table = self.create_usage_table()
         
         return ft.Column([
@@ -2000,91 +2229,86 @@ class AdminDashboardView:
             filters,
             ft.Container(height=20),
             usage_table
-        ], scroll=ft.ScrollMode.AUTO)
+        ], expand=True)
     
     def create_usage_table(self):
         """Cria tabela de utilizações"""
-        if not self.usage_data:
-            return ft.Container(
-                content=ft.Column([
-                    ft.Icon(ft.icons.ASSIGNMENT, size=64, color=ft.colors.GREY_400),
-                    ft.Text("Nenhuma utilização registrada", size=18, color=ft.colors.GREY_600),
-                    ft.Text("Clique em 'Nova Utilização' para começar", size=14, color=ft.colors.GREY_500),
-                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
-                padding=ft.padding.all(50),
-                alignment=ft.alignment.center
-            )
+        return self.usage_table.control
+    
+    def create_usage_row(self):
+        """Cria uma linha vazia da tabela de utilizações (preenchida por bind_usage_row)"""
+        cells = {
+            "motorista": ft.Text(expand=2),
+            "veiculo": ft.Text(expand=2),
+            "destino": ft.Text(expand=2),
+            "data_inicio": ft.Text(expand=2),
+            "status_text": ft.Text(color=ft.colors.WHITE, size=12),
+            "edit": ft.IconButton(
+                icon=ft.icons.EDIT,
+                tooltip="Editar"
+            ),
+            "item": None
+        }
+        cells["status"] = ft.Container(
+            content=cells["status_text"],
+            padding=ft.padding.symmetric(horizontal=8, vertical=4),
+            border_radius=4,
+            expand=1
+        )
+        cells["edit"].on_click = lambda e: self.edit_usage(cells["item"])
+        return ft.Row([
+            cells["motorista"],
+            cells["veiculo"],
+            cells["destino"],
+            cells["data_inicio"],
+            cells["status"],
+            ft.Row([
+                ft.IconButton(
+                    icon=ft.icons.VISIBILITY,
+                    tooltip="Ver Detalhes",
+                    on_click=lambda e: self.view_usage_details(cells["item"])
+                ),
+                cells["edit"]
+            ], expand=1)
+        ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN, data=cells)
+    
+    def bind_usage_row(self, row, usage):
+        """Preenche uma linha da tabela de utilizações"""
+        cells = row.data
+        cells["item"] = usage
         
-        # Header da tabela
-        header = ft.Row([
-            ft.Text("Motorista", size=14, weight=ft.FontWeight.BOLD, expand=2),
-            ft.Text("Veículo", size=14, weight=ft.FontWeight.BOLD, expand=2),
-            ft.Text("Destino", size=14, weight=ft.FontWeight.BOLD, expand=2),
-            ft.Text("Data/Hora", size=14, weight=ft.FontWeight.BOLD, expand=2),
-            ft.Text("Status", size=14, weight=ft.FontWeight.BOLD, expand=1),
-            ft.Text("Ações", size=14, weight=ft.FontWeight.BOLD, expand=1),
-        ])
+        status_colors = {
+            'em_uso': ft.colors.BLUE,
+            'aberto': ft.colors.BLUE,
+            'concluido': ft.colors.GREEN,
+            'finalizado': ft.colors.GREEN,
+            'cancelado': ft.colors.RED
+        }
         
-        # Linhas da tabela
-        rows = []
-        for usage in self.usage_data:
-            status_colors = {
-                'em_uso': ft.colors.BLUE,
-                'concluido': ft.colors.GREEN,
-                'cancelado': ft.colors.RED
-            }
-            status_color = status_colors.get(usage.get('status'), ft.colors.GREY)
-            
-            try:
-                data_inicio = datetime.fromisoformat(usage.get('data_inicio', '')).strftime('%d/%m/%Y %H:%M')
-            except:
-                data_inicio = 'N/A'
-            
-            rows.append(
-                ft.Row([
-                    ft.Text(usage.get('motorista_nome', 'N/A'), expand=2),
-                    ft.Text(f"{usage.get('veiculo_marca', 'N/A')} {usage.get('veiculo_modelo', 'N/A')}", expand=2),
-                    ft.Text(usage.get('destino', 'N/A'), expand=2),
-                    ft.Text(data_inicio, expand=2),
-                    ft.Container(
-                        content=ft.Text(usage.get('status', 'N/A').upper(), color=ft.colors.WHITE, size=12),
-                        bgcolor=status_color,
-                        padding=ft.padding.symmetric(horizontal=8, vertical=4),
-                        border_radius=4,
-                        expand=1
-                    ),
-                    ft.Row([
-                        ft.IconButton(
-                            icon=ft.icons.VISIBILITY,
-                            tooltip="Ver Detalhes",
-                            on_click=lambda e, u=usage: self.view_usage_details(u)
-                        ),
-                        ft.IconButton(
-                            icon=ft.icons.EDIT,
-                            tooltip="Editar",
-                            on_click=lambda e, u=usage: self.edit_usage(u)
-                        ) if usage.get('status') == 'em_uso' else ft.Container()
-                    ], expand=1)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
-            )
+        try:
+            data_inicio = datetime.fromisoformat(usage.get('data_inicio', '')).strftime('%d/%m/%Y %H:%M')
+        except:
+            data_inicio = 'N/A'
         
-        return ft.Container(
-            content=ft.Column([
-                header,
-                ft.Divider(),
-                *rows
-            ]),
-            padding=ft.padding.all(20),
-            bgcolor=ft.colors.WHITE,
-            border_radius=10,
-            border=ft.border.all(1, ft.colors.GREY_300)
+        cells["motorista"].value = usage.get('motorista_nome') or (usage.get('motorista') or {}).get('nome', 'N/A')
+        cells["veiculo"].value = (
+            f"{usage.get('veiculo_marca') or (usage.get('veiculo') or {}).get('marca', 'N/A')} "
+            f"{usage.get('veiculo_modelo') or (usage.get('veiculo') or {}).get('modelo', 'N/A')}"
         )
+        cells["destino"].value = usage.get('destino', 'N/A')
+        cells["data_inicio"].value = data_inicio
+        cells["status_text"].value = (usage.get('status') or 'N/A').upper()
+        cells["status"].bgcolor = status_colors.get(usage.get('status'), ft.colors.GREY)
+        cells["edit"].visible = usage.get('status') == 'em_uso'
     
     def show_add_usage_dialog(self, e):
         """Mostra dialog para nova utilização"""
         # Carregar dados necessários
-        users_options = [ft.dropdown.Option(str(u.get('id')), u.get('nome', 'N/A')) for u in self.users_data if u.get('perfil') in ['motorista', 'gestor']]
-        vehicles_options = [ft.dropdown.Option(str(v.get('id')), f"{v.get('marca', 'N/A')} {v.get('modelo', 'N/A')} - {v.get('placa', 'N/A')}") for v in self.vehicles_data if v.get('status') == 'disponivel']
+        # Consultas próprias: as tabelas só têm as páginas já carregadas
+        drivers = self.api_client.get_drivers()
+        vehicles = self.api_client.get_available_vehicles()
+        users_options = [ft.dropdown.Option(str(u.get('id')), u.get('nome', 'N/A')) for u in (drivers.get('data') or [] if drivers.get('success') else [])]
+        vehicles_options = [ft.dropdown.Option(str(v.get('id')), f"{v.get('marca', 'N/A')} {v.get('modelo', 'N/A')} - {v.get('placa', 'N/A')}") for v in (vehicles.get('data') or [] if vehicles.get('success') else [])]
         
         # Campos do formulário
         motorista_dropdown = ft.Dropdown(
@@ -2115,27 +2339,23 @@ class AdminDashboardView:
             try:
                 response = self.api_client.create_usage_record(usage_data)
                 if response and response.get('success'):
-                    self.load_initial_data()
-                    self.update_content()
-                    self.page.dialog.open = False
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.close_dialog()
+                    self.load_usage_page()
+                    self.refresh_vehicle(usage_data["veiculo_id"])
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text("Utilização registrada com sucesso!"),
                         bgcolor=ft.colors.GREEN
-                    )
-                    self.page.snack_bar.open = True
+                    ))
                 else:
-                    self.page.snack_bar = ft.SnackBar(
+                    self.page.show_snack_bar(ft.SnackBar(
                         content=ft.Text(f"Erro ao registrar utilização: {response.get('message', 'Erro desconhecido')}"),
                         bgcolor=ft.colors.RED
-                    )
-                    self.page.snack_bar.open = True
+                    ))
             except Exception as error:
-                self.page.snack_bar = ft.SnackBar(
+                self.page.show_snack_bar(ft.SnackBar(
                     content=ft.Text(f"Erro ao registrar utilização: {str(error)}"),
                     bgcolor=ft.colors.RED
-                )
-                self.page.snack_bar.open = True
-            self.page.update()
+                ))
         
         dialog = ft.AlertDialog(
             modal=True,
@@ -2149,41 +2369,67 @@ class AdminDashboardView:
                 ft.Text("Obs: A data/hora de início será registrada automaticamente", size=12, color=ft.colors.GREY_600)
             ], height=400, scroll=ft.ScrollMode.AUTO),
             actions=[
-                ft.TextButton("Cancelar", on_click=lambda e: setattr(self.page.dialog, 'open', False)),
+                ft.TextButton("Cancelar", on_click=lambda e: self.page.close_dialog()),
                 ft.ElevatedButton("Registrar", on_click=save_usage)
             ]
         )
         
-        self.page.dialog = dialog
-        dialog.open = True
-        self.page.update()
+        self.page.show_dialog(dialog)
     
     def view_usage_details(self, usage):
         """Visualiza detalhes da utilização"""
-        self.page.snack_bar = ft.SnackBar(
+        self.page.show_snack_bar(ft.SnackBar(
             content=ft.Text("Detalhes da utilização - Em desenvolvimento"),
             bgcolor=ft.colors.BLUE
-        )
-        self.page.snack_bar.open = True
-        self.page.update()
+        ))
     
     def edit_usage(self, usage):
         """Edita uma utilização"""
-        self.page.snack_bar = ft.SnackBar(
+        self.page.show_snack_bar(ft.SnackBar(
             content=ft.Text("Edição de utilização - Em desenvolvimento"),
             bgcolor=ft.colors.BLUE
-        )
-        self.page.snack_bar.open = True
-        self.page.update()
+        ))
     
     def filter_usage_records(self, e):
-        """Filtra registros de utilização"""
-        self.page.snack_bar = ft.SnackBar(
-            content=ft.Text("Filtros de utilização - Em desenvolvimento"),
-            bgcolor=ft.colors.BLUE
-        )
-        self.page.snack_bar.open = True
-        self.page.update()
+        """Aplica os filtros na API e volta ao início da lista"""
+        self.usage_filters = {
+            "status": self.usage_status_filter.value or "",
+            "busca": (self.usage_search_filter.value or "").strip(),
+            "unidade": (self.usage_unit_filter.value or "").strip(),
+            "data_de": (self.usage_from_filter.value or "").strip(),
+            "data_ate": (self.usage_to_filter.value or "").strip(),
+            "ordenar": self.usage_sort_filter.value or "-data_inicio"
+        }
+        self.load_usage_page()
+    
+    def load_usage_page(self):
+        """Recarrega a tabela de utilizações a partir da primeira página"""
+        self.reload_table(self.usage_table)
+        # Os cards e relatórios contam as utilizações carregadas
+        self.stale_views.update(DATA_VIEWS)
+    
+    def reload_table(self, table: PagedTable):
+        """Busca a primeira página de uma tabela de novo e envia só ela"""
+        if table.reload() and table.control.page:
+            self.page.update(table.control)
+    
+    def refresh_user(self, user_id: int, fallback: Dict[str, Any]):
+        """Busca um usuário alterado pela API (versão nova) e atualiza a linha dele"""
+        response = self.api_client.get_user(user_id)
+        self.users_state.updated(response['data'] if response and response.get('success') else fallback)
+    
+    def refresh_vehicle(self, vehicle_id: int):
+        """Busca um veículo alterado pela API (ex.: status após registrar uso) e atualiza a linha dele"""
+        response = self.api_client.get_vehicle(vehicle_id) if vehicle_id else None
+        if response and response.get('success'):
+            self.vehicles_state.updated(response['data'])
+    
+    def show_table_error(self, message: str):
+        """Avisa que uma página da tabela não pôde ser carregada"""
+        self.page.show_snack_bar(ft.SnackBar(
+            content=ft.Text(f"Erro ao carregar registros: {message}"),
+            bgcolor=ft.colors.RED
+        ))
     
     def create_routes_view(self):
         """Cria a view de rotas"""
@@ -2284,7 +2530,10 @@ class AdminDashboardView:
             )
         ], spacing=20, wrap=True)
         
-        # Estatísticas rápidas
+        # Estatísticas rápidas: totais consultados na API (as tabelas só têm as páginas já carregadas)
+        usage_counts = self.fetch_usage_counts()
+        available = self.api_client.get_available_vehicles()
+        drivers = self.api_client.get_users(limit=1, perfil="motorista,gestor")
         quick_stats = ft.Container(
             content=ft.Column([
                 ft.Text("Estatísticas Rápidas", size=18, weight=ft.FontWeight.BOLD),
@@ -2292,19 +2541,19 @@ class AdminDashboardView:
                 ft.Row([
                     ft.Column([
                         ft.Text("Total de Viagens", size=14, weight=ft.FontWeight.BOLD),
-                        ft.Text(str(len(self.usage_data)), size=24, color=ft.colors.BLUE)
+                        ft.Text(str(usage_counts["total"]), size=24, color=ft.colors.BLUE)
                     ]),
                     ft.Column([
                         ft.Text("Veículos Ativos", size=14, weight=ft.FontWeight.BOLD),
-                        ft.Text(str(len([v for v in self.vehicles_data if v.get('status') == 'disponivel'])), size=24, color=ft.colors.GREEN)
+                        ft.Text(str(len(available["data"]) if available.get('success') else "-"), size=24, color=ft.colors.GREEN)
                     ]),
                     ft.Column([
                         ft.Text("Utilizações em Andamento", size=14, weight=ft.FontWeight.BOLD),
-                        ft.Text(str(len([u for u in self.usage_data if u.get('status') == 'em_uso'])), size=24, color=ft.colors.ORANGE)
+                        ft.Text(str(usage_counts["abertas"]), size=24, color=ft.colors.ORANGE)
                     ]),
                     ft.Column([
                         ft.Text("Motoristas Cadastrados", size=14, weight=ft.FontWeight.BOLD),
-                        ft.Text(str(len([u for u in self.users_data if u.get('perfil') in ['motorista', 'gestor']])), size=24, color=ft.colors.PURPLE)
+                        ft.Text(str(drivers.get('total', '-') if drivers.get('success') else "-"), size=24, color=ft.colors.PURPLE)
                     ])
                 ], alignment=ft.MainAxisAlignment.SPACE_AROUND)
             ]),
@@ -2324,66 +2573,73 @@ class AdminDashboardView:
     
     def generate_usage_report(self):
         """Gera relatório de utilização"""
-        self.page.snack_bar = ft.SnackBar(
+        self.page.show_snack_bar(ft.SnackBar(
             content=ft.Text("Relatório de utilização - Em desenvolvimento"),
             bgcolor=ft.colors.BLUE
-        )
-        self.page.snack_bar.open = True
-        self.page.update()
+        ))
     
     def generate_vehicles_report(self):
         """Gera relatório de veículos"""
-        self.page.snack_bar = ft.SnackBar(
+        self.page.show_snack_bar(ft.SnackBar(
             content=ft.Text("Relatório de veículos - Em desenvolvimento"),
             bgcolor=ft.colors.GREEN
-        )
-        self.page.snack_bar.open = True
-        self.page.update()
+        ))
     
     def generate_drivers_report(self):
         """Gera relatório de motoristas"""
-        self.page.snack_bar = ft.SnackBar(
+        self.page.show_snack_bar(ft.SnackBar(
             content=ft.Text("Relatório de motoristas - Em desenvolvimento"),
             bgcolor=ft.colors.ORANGE
-        )
-        self.page.snack_bar.open = True
-        self.page.update()
+        ))
     
     def generate_statistics_report(self):
         """Gera relatório estatístico"""
-        self.page.snack_bar = ft.SnackBar(
+        self.page.show_snack_bar(ft.SnackBar(
             content=ft.Text("Estatísticas gerais - Em desenvolvimento"),
             bgcolor=ft.colors.PURPLE
-        )
-        self.page.snack_bar.open = True
-        self.page.update()
+        ))
     
-    def update_content(self):
-        """Atualiza o conteúdo baseado na view atual"""
-        # Recriar sidebar para atualizar item ativo
-        self.sidebar = self.create_sidebar()
-        
-        # Determinar qual view mostrar
-        if self.current_view == "dashboard":
-            content = self.create_dashboard_view()
-        elif self.current_view == "users":
-            content = self.create_users_view()
-        elif self.current_view == "vehicles":
-            content = self.create_vehicles_view()
-        elif self.current_view == "usage":
-            content = self.create_usage_view()
-        elif self.current_view == "routes":
-            content = self.create_routes_view()
-        elif self.current_view == "reports":
-            content = self.create_reports_view()
-        else:
-            content = self.create_dashboard_view()
-        
-        self.content_area.content = ft.Container(
-            content=content,
-            padding=ft.padding.all(30),
-            expand=True
-        )
+    def update_content(self, refresh: bool = True):
+        """
+        Mostra a tela atual, montando-a só se ainda não existe ou se ficou desatualizada.
+        Com ``refresh``, envia também as alterações feitas nos controles da tela.
+        """
+        view = self.view_cache.get(self.current_view)
+        if view is None:
+            view = CachedView(content=self.build_view(self.current_view), padding=ft.padding.all(30), expand=True)
+            self.view_cache[self.current_view] = view
+            self.views_column.controls.append(view)
+        elif self.current_view in self.stale_views:
+            view.content = self.build_view(self.current_view)
+            refresh = True
+        self.stale_views.discard(self.current_view)
+        if refresh:
+            self.outdated_views.discard(self.current_view)
+        
+        for cached in self.view_cache.values():
+            cached.visible = cached is view
+        
+        if self.views_column.page:
+            # Telas novas são enviadas inteiras; as já montadas só trocam "visible"
+            self.views_column.update()
+            if refresh:
+                view.update()
+    
+    def build_view(self, view_id: str):
+        """Monta o conteúdo de uma tela"""
+        if view_id == "dashboard":
+            return self.create_dashboard_view()
+        elif view_id == "users":
+            return self.create_users_view()
+        elif view_id == "vehicles":
+            return self.create_vehicles_view()
+        elif view_id == "usage":
+            return self.create_usage_view()
+        elif view_id == "routes":
+            return self.create_routes_view()
+        elif view_id == "reports":
+            return self.create_reports_view()
+        return self.create_dashboard_view()
     
     def logout(self, e):
         """Faz logout do sistema"""
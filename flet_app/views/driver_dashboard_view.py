@@ -3,7 +3,8 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from api_client import SGUVApiClient
-from datetime import datetime
+from local_store import LocalStore, PENDENTE, CONFLITO
+from sync import SyncService
 
 class DriverDashboardView:
     def __init__(self, page: ft.Page, api_client: SGUVApiClient, user_data: dict):
@@ -11,6 +12,10 @@ class DriverDashboardView:
         self.api_client = api_client
         self.user_data = user_data
         
+        # Tudo é gravado primeiro no banco local; a API é sincronizada em segundo plano
+        self.store = LocalStore()
+        self.sync_service = SyncService(api_client, self.store, user_data['id'])
+        
         # Estado atual
         self.current_control = None
         self.current_route = None
@@ -30,6 +35,7 @@ class DriverDashboardView:
                     ft.Text(f"Olá, {self.user_data['nome']}", size=18, weight=ft.FontWeight.BOLD),
                     ft.Text(f"Matrícula: {self.user_data['matricula']} | Unidade: {self.user_data.get('unidade', 'N/A')}", size=12)
                 ], spacing=2),
+                self.create_sync_status(),
                 ft.IconButton(
                     icon=ft.icons.LOGOUT,
                     tooltip="Sair",
@@ -95,6 +101,28 @@ class DriverDashboardView:
             self.controls_list
         ], spacing=10, scroll=ft.ScrollMode.AUTO)
     
+    def create_sync_status(self):
+        """Indicador de sincronização com o servidor"""
+        self.sync_icon = ft.Icon(ft.icons.CLOUD_DONE, size=20, color=ft.colors.GREEN)
+        self.sync_text = ft.Text("Sincronizado", size=12)
+        return ft.Row([self.sync_icon, self.sync_text], spacing=5)
+    
+    def update_sync_status(self):
+        counts = self.store.pending_count(self.user_data['id'])
+        if counts['conflitos']:
+            self.sync_icon.name, self.sync_icon.color = ft.icons.WARNING, ft.colors.RED
+            self.sync_text.value = f"{counts['conflitos']} conflito(s)"
+        elif counts['pendentes']:
+            self.sync_icon.name, self.sync_icon.color = ft.icons.CLOUD_UPLOAD, ft.colors.ORANGE
+            self.sync_text.value = f"{counts['pendentes']} pendente(s)"
+        else:
+            self.sync_icon.name, self.sync_icon.color = ft.icons.CLOUD_DONE, ft.colors.GREEN
+            self.sync_text.value = "Sincronizado"
+    
+    def request_sync(self):
+        """Envia as alterações locais sem bloquear a interface"""
+        self.sync_service.sync_in_background(on_done=lambda summary: self.refresh_data())
+    
     def create_status_card(self, title: str, value: str, icon: str, color: str):
         """Cria um card de status"""
         return ft.Container(
@@ -114,46 +142,36 @@ class DriverDashboardView:
     def build(self):
         """Constrói a interface principal"""
         self.refresh_data()
+        # Sincroniza agora e periodicamente enquanto o painel estiver aberto
+        self.sync_service.start(on_done=lambda summary: self.refresh_data())
         return self.main_content
     
     def refresh_data(self):
-        """Atualiza os dados da interface"""
+        """Atualiza a interface a partir do banco local (não depende da rede)"""
         try:
-            # Buscar controles do usuário
-            my_controls = self.api_client.get_my_usage_controls()
-            open_controls = self.api_client.get_open_usage_controls()
+            motorista_id = self.user_data['id']
+            my_controls = self.store.list_controls(motorista_id)
             
             # Atualizar controle atual
-            if open_controls:
-                self.current_control = open_controls[0]
+            self.current_control = self.store.get_open_control(motorista_id)
+            if self.current_control:
                 self.action_buttons.controls[1].disabled = False  # Adicionar Rota
                 self.action_buttons.controls[2].disabled = False  # Finalizar Controle
                 self.action_buttons.controls[0].disabled = True   # Iniciar Novo
             else:
-                self.current_control = None
                 self.action_buttons.controls[1].disabled = True   # Adicionar Rota
                 self.action_buttons.controls[2].disabled = True   # Finalizar Controle
                 self.action_buttons.controls[0].disabled = False  # Iniciar Novo
             
             # Atualizar cards de status
-            active_controls = len(open_controls)
-            total_km_today = sum(
-                (control.get('km_final', control.get('km_inicial', 0)) - control.get('km_inicial', 0))
-                for control in my_controls
-                if control.get('data_inicio', '').startswith(datetime.now().strftime('%Y-%m-%d'))
-            )
-            total_routes_today = sum(
-                len(self.api_client.get_routes_by_control(control['id']))
-                for control in my_controls
-                if control.get('data_inicio', '').startswith(datetime.now().strftime('%Y-%m-%d'))
-            )
-            
-            self.status_cards.controls[0].content.controls[2].value = str(active_controls)
-            self.status_cards.controls[1].content.controls[2].value = f"{total_km_today:.1f}"
-            self.status_cards.controls[2].content.controls[2].value = str(total_routes_today)
+            summary = self.store.today_summary(motorista_id)
+            self.status_cards.controls[0].content.controls[2].value = str(summary['controles_abertos'])
+            self.status_cards.controls[1].content.controls[2].value = f"{summary['km_hoje']:.1f}"
+            self.status_cards.controls[2].content.controls[2].value = str(summary['rotas_hoje'])
             
             # Atualizar lista de controles
             self.update_controls_list(my_controls)
+            self.update_sync_status()
             
             self.page.update()
             
@@ -171,14 +189,28 @@ class DriverDashboardView:
                 'cancelado': ft.colors.RED
             }.get(control['status'], ft.colors.GREY)
             
+            sync_info = []
+            actions = []
+            if control['sync_status'] == PENDENTE:
+                sync_info.append(ft.Text("Aguardando envio ao servidor", size=12, color=ft.colors.ORANGE))
+            elif control['sync_status'] == CONFLITO:
+                sync_info.append(ft.Text(f"Não sincronizado: {control['sync_message']}", size=12, color=ft.colors.RED))
+                actions.append(ft.IconButton(
+                    icon=ft.icons.DELETE,
+                    tooltip="Descartar do aparelho",
+                    on_click=lambda e, ctrl=control: self.discard_control(ctrl)
+                ))
+            
             control_card = ft.Container(
                 content=ft.Row([
                     ft.Column([
-                        ft.Text(f"Veículo: {control.get('veiculo', {}).get('placa', 'N/A')}", weight=ft.FontWeight.BOLD),
+                        ft.Text(f"Veículo: {control.get('veiculo_descricao') or 'N/A'}", weight=ft.FontWeight.BOLD),
                         ft.Text(f"Início: {control.get('data_inicio', 'N/A')}"),
                         ft.Text(f"KM Inicial: {control.get('km_inicial', 0)}"),
-                        ft.Text(f"Status: {control.get('status', 'N/A').title()}", color=status_color)
+                        ft.Text(f"Status: {control.get('status', 'N/A').title()}", color=status_color),
+                        *sync_info
                     ], expand=True),
+                    *actions,
                     ft.IconButton(
                         icon=ft.icons.VISIBILITY,
                         tooltip="Ver Detalhes",
@@ -193,14 +225,20 @@ class DriverDashboardView:
             
             self.controls_list.controls.append(control_card)
     
+    def discard_control(self, control):
+        """Remove do aparelho um controle que o servidor recusou"""
+        self.store.discard_control(control['local_id'])
+        self.refresh_data()
+    
     def show_new_control_dialog(self, e):
         """Mostra diálogo para iniciar novo controle"""
         try:
-            # Buscar veículos disponíveis
-            self.vehicles = self.api_client.get_available_vehicles()
+            # Veículos disponíveis na última sincronização
+            self.vehicles = self.store.available_vehicles()
             
             if not self.vehicles:
                 self.show_error("Não há veículos disponíveis no momento")
+                self.request_sync()
                 return
             
             vehicle_dropdown = ft.Dropdown(
@@ -225,11 +263,13 @@ class DriverDashboardView:
                 
                 try:
                     km_inicial = float(km_field.value)
-                    result = self.api_client.create_usage_control(int(vehicle_dropdown.value), km_inicial)
+                    vehicle = next(v for v in self.vehicles if str(v['id']) == vehicle_dropdown.value)
+                    self.store.create_control(self.user_data['id'], vehicle, km_inicial)
                     
                     self.page.close_dialog()
                     self.show_success("Controle de utilização iniciado com sucesso!")
                     self.refresh_data()
+                    self.request_sync()
                     
                 except ValueError:
                     self.show_error("KM deve ser um número válido")
@@ -280,8 +320,8 @@ class DriverDashboardView:
             
             try:
                 km_saida = float(km_saida_field.value)
-                result = self.api_client.create_route(
-                    self.current_control['id'],
+                self.store.create_route(
+                    self.current_control['local_id'],
                     km_saida,
                     logradouro_saida=local_saida_field.value or ""
                 )
@@ -289,6 +329,7 @@ class DriverDashboardView:
                 self.page.close_dialog()
                 self.show_success("Rota adicionada com sucesso!")
                 self.refresh_data()
+                self.request_sync()
                 
             except ValueError:
                 self.show_error("KM deve ser um número válido")
@@ -298,7 +339,7 @@ class DriverDashboardView:
         dialog = ft.AlertDialog(
             title=ft.Text("Adicionar Nova Rota"),
             content=ft.Column([
-                ft.Text(f"Controle: {self.current_control.get('veiculo', {}).get('placa', 'N/A')}"),
+                ft.Text(f"Controle: {self.current_control.get('veiculo_descricao') or 'N/A'}"),
                 km_saida_field,
                 local_saida_field
             ], tight=True),
@@ -340,8 +381,8 @@ class DriverDashboardView:
                     self.show_error("KM final deve ser maior que o KM inicial")
                     return
                 
-                result = self.api_client.finalize_usage_control(
-                    self.current_control['id'],
+                self.store.finalize_control(
+                    self.current_control['local_id'],
                     km_final,
                     assinatura_field.value
                 )
@@ -349,6 +390,7 @@ class DriverDashboardView:
                 self.page.close_dialog()
                 self.show_success("Controle finalizado com sucesso!")
                 self.refresh_data()
+                self.request_sync()
                 
             except ValueError:
                 self.show_error("KM deve ser um número válido")
@@ -358,7 +400,7 @@ class DriverDashboardView:
         dialog = ft.AlertDialog(
             title=ft.Text("Finalizar Controle"),
             content=ft.Column([
-                ft.Text(f"Veículo: {self.current_control.get('veiculo', {}).get('placa', 'N/A')}"),
+                ft.Text(f"Veículo: {self.current_control.get('veiculo_descricao') or 'N/A'}"),
                 ft.Text(f"KM Inicial: {self.current_control['km_inicial']}"),
                 km_final_field,
                 assinatura_field
@@ -376,7 +418,7 @@ class DriverDashboardView:
     def show_control_details(self, control):
         """Mostra detalhes de um controle"""
         try:
-            routes = self.api_client.get_routes_by_control(control['id'])
+            routes = self.store.list_routes(control['local_id'])
             
             routes_info = []
             for route in routes:
@@ -387,6 +429,8 @@ class DriverDashboardView:
                     route_text += f"\nDe: {route.get('logradouro_saida')}"
                 if route.get('logradouro_chegada'):
                     route_text += f"\nPara: {route.get('logradouro_chegada')}"
+                if route.get('sync_status') == CONFLITO:
+                    route_text += f"\nNão sincronizada: {route.get('sync_message')}"
                 routes_info.append(ft.Text(route_text))
                 routes_info.append(ft.Divider())
             
@@ -396,9 +440,9 @@ class DriverDashboardView:
             dialog = ft.AlertDialog(
                 title=ft.Text("Detalhes do Controle"),
                 content=ft.Column([
-                    ft.Text(f"Veículo: {control.get('veiculo', {}).get('placa', 'N/A')}"),
+                    ft.Text(f"Veículo: {control.get('veiculo_descricao') or 'N/A'}"),
                     ft.Text(f"Início: {control.get('data_inicio', 'N/A')}"),
-                    ft.Text(f"Fim: {control.get('data_fim', 'Em andamento')}"),
+                    ft.Text(f"Fim: {control.get('data_fim') or 'Em andamento'}"),
                     ft.Text(f"KM Inicial: {control.get('km_inicial', 0)}"),
                     ft.Text(f"KM Final: {control.get('km_final', 'N/A')}"),
                     ft.Text(f"Status: {control.get('status', 'N/A').title()}"),
@@ -432,6 +476,7 @@ class DriverDashboardView:
     
     def handle_logout(self, e):
         """Processa logout do usuário"""
+        self.sync_service.stop()
         self.api_client.logout()
         self.page.route = "/login"
         self.page.update()
@@ -0,0 +1,198 @@
+"""
+Tabela paginada e virtualizada para as listagens do painel administrativo.
+
+- As linhas ficam em um ``ft.ListView`` com altura fixa (``item_extent``), então
+  o Flutter só monta os widgets das linhas visíveis, mesmo com milhares carregadas
+- Os registros chegam da API em páginas (``skip``/``limit``); a próxima página é
+  buscada quando a rolagem se aproxima do fim da lista
+- Os controles de linha são criados uma vez e reaproveitados: recarregar ou
+  filtrar só troca os valores das linhas existentes
+
+Cada tabela informa como criar uma linha vazia (``create_row``) e como preencher
+uma linha com um registro (``bind_row``); ``prefetch`` (opcional) recebe cada
+página (e os registros recebidos por ``apply``) antes das linhas serem preenchidas (ex.: para baixar os avatares de uma vez). Alterações feitas no painel chegam por
+``apply`` (assinante de ``RecordEvents``) e atualizam só a linha afetada.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+import flet as ft
+
+from .state import ADDED, REMOVED, UPDATED, Observable
+
+TABLE_PAGE_SIZE = int(os.getenv("SGUV_TABLE_PAGE_SIZE", "100"))
+# Quantas linhas antes do fim da lista a próxima página começa a ser buscada
+LOAD_MORE_ROWS = 20
+
+
+class PagedTable:
+    def __init__(
+        self,
+        columns: List[Tuple[str, int]],
+        fetch_page: Callable[[int, int], Dict[str, Any]],
+        create_row: Callable[[], ft.Control],
+        bind_row: Callable[[ft.Control, Dict[str, Any]], None],
+        empty_content: ft.Control,
+        row_height: int = 56,
+        page_size: int = TABLE_PAGE_SIZE,
+        on_error: Callable[[str], None] = None,
+        prefetch: Callable[[List[Dict[str, Any]]], None] = None,
+    ):
+        self.fetch_page = fetch_page
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.row_height = row_height
+        self.page_size = page_size
+        self.on_error = on_error
+        self.prefetch = prefetch
+
+        self.items: List[Dict[str, Any]] = []
+        self.total_state = Observable(0)  # total de registros na API (ex.: para os cards do dashboard)
+        self._rows: List[ft.Control] = []  # linhas já criadas, reaproveitadas entre recargas
+        self._loading = threading.Lock()
+
+        self.list_view = ft.ListView(
+            item_extent=row_height,
+            expand=True,
+            on_scroll_interval=100,
+            on_scroll=self._on_scroll
+        )
+        self.status_text = ft.Text(size=12, color=ft.colors.GREY_600)
+        self.table = ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Text(title, size=14, weight=ft.FontWeight.BOLD, expand=expand)
+                    for title, expand in columns
+                ]),
+                ft.Divider(),
+                self.list_view,
+                self.status_text
+            ], expand=True),
+            padding=ft.padding.all(20),
+            bgcolor=ft.colors.WHITE,
+            border_radius=10,
+            border=ft.border.all(1, ft.colors.GREY_300),
+            expand=True
+        )
+        self.empty_content = empty_content
+        self.control = ft.Container(expand=True)
+        self._refresh_layout()
+
+    @property
+    def total(self) -> int:
+        return self.total_state.value
+
+    @total.setter
+    def total(self, value: int):
+        self.total_state.value = value
+
+    @property
+    def has_more(self) -> bool:
+        return len(self.items) < self.total
+
+    def reload(self) -> bool:
+        """Busca a primeira página de novo, reaproveitando as linhas já criadas"""
+        with self._loading:
+            response = self.fetch_page(0, self.page_size)
+            if not response or not response.get('success'):
+                self._report_error(response)
+                return False
+            self.items = list(response.get('data') or [])
+            self._prefetch(self.items)
+            self.total = response.get('total', len(self.items))
+            self.list_view.controls = [self._bind(index, item) for index, item in enumerate(self.items)]
+            self._refresh_layout()
+            return True
+
+    def load_more(self):
+        """Acrescenta a próxima página ao fim da lista"""
+        if not self.has_more or not self._loading.acquire(blocking=False):
+            return
+        try:
+            response = self.fetch_page(len(self.items), self.page_size)
+            if not response or not response.get('success'):
+                self._report_error(response)
+                return
+            page_items = response.get('data') or []
+            self.total = response.get('total', self.total)
+            if not page_items:
+                # Registros removidos no meio tempo: não há mais o que buscar
+                self.total = len(self.items)
+            self._prefetch(page_items)
+            start = len(self.items)
+            self.items.extend(page_items)
+            self.list_view.controls.extend(self._bind(start + offset, item) for offset, item in enumerate(page_items))
+            self._refresh_layout()
+        finally:
+            self._loading.release()
+        self._send(self.list_view, self.status_text)
+
+    def apply(self, event: str, record: Dict[str, Any]):
+        """
+        Aplica um registro criado, alterado ou removido no painel sem buscar a
+        página de novo. Registros novos só entram na lista se ela já está
+        completa (senão chegam ao rolar até o fim).
+        """
+        index = next((i for i, item in enumerate(self.items) if item.get('id') == record.get('id')), None)
+        had_items = bool(self.items)
+        if event == UPDATED:
+            if index is None:
+                return
+            self.items[index] = record
+            self._prefetch([record])
+            row = self.list_view.controls[index]
+            self.bind_row(row, record)
+            self._send(row)
+            return
+        if event == REMOVED:
+            if index is not None:
+                self.items.pop(index)
+                row = self.list_view.controls.pop(index)
+                # A linha volta para o fim do conjunto, disponível para o próximo registro
+                self._rows.remove(row)
+                self._rows.append(row)
+            self.total = max(self.total - 1, len(self.items))
+        elif event == ADDED:
+            complete = not self.has_more
+            self.total += 1
+            if complete:
+                self._prefetch([record])
+                self.items.append(record)
+                self.list_view.controls.append(self._bind(len(self.items) - 1, record))
+        self._refresh_layout()
+        if bool(self.items) != had_items:
+            self._send(self.control)
+        else:
+            self._send(self.list_view, self.status_text)
+
+    def _prefetch(self, items: List[Dict[str, Any]]):
+        if self.prefetch and items:
+            self.prefetch(items)
+
+    def _send(self, *controls: ft.Control):
+        if self.control.page:
+            self.control.page.update(*controls)
+
+    def _bind(self, index: int, item: Dict[str, Any]) -> ft.Control:
+        if index == len(self._rows):
+            self._rows.append(self.create_row())
+        row = self._rows[index]
+        self.bind_row(row, item)
+        return row
+
+    def _refresh_layout(self):
+        self.control.content = self.table if self.items else self.empty_content
+        self.status_text.value = f"{len(self.items)} de {self.total} registros"
+        if self.has_more:
+            self.status_text.value += " · role para carregar mais"
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        if e.pixels >= e.max_scroll_extent - LOAD_MORE_ROWS * self.row_height:
+            self.load_more()
+
+    def _report_error(self, response):
+        message = (response or {}).get('message', 'Erro desconhecido')
+        print(f"Erro ao carregar página da tabela: {message}")
+        if self.on_error:
+            self.on_error(message)
@@ -0,0 +1,62 @@
+"""
+Estado reativo do painel administrativo.
+
+Em vez de recarregar tudo da API e chamar ``page.update()`` (que percorre e
+compara a árvore inteira da página) depois de cada ação, as telas publicam o
+que mudou e só os controles que dependem daquilo se atualizam:
+
+- ``Observable``: um valor (ex.: total de usuários) que avisa quem o exibe
+- ``RecordEvents``: registros criados, alterados ou removidos em uma coleção
+  (ex.: a tabela de usuários atualiza só a linha do registro alterado)
+"""
+from typing import Any, Callable, Dict, List
+
+ADDED = "added"
+UPDATED = "updated"
+REMOVED = "removed"
+
+
+class Observable:
+    """Valor que avisa os assinantes quando muda"""
+
+    def __init__(self, value: Any = None):
+        self._value = value
+        self._listeners: List[Callable[[Any], None]] = []
+
+    @property
+    def value(self) -> Any:
+        return self._value
+
+    @value.setter
+    def value(self, value: Any):
+        if value == self._value:
+            return
+        self._value = value
+        for listener in list(self._listeners):
+            listener(value)
+
+    def subscribe(self, listener: Callable[[Any], None]):
+        self._listeners.append(listener)
+
+
+class RecordEvents:
+    """Avisa os assinantes quando registros de uma coleção são criados, alterados ou removidos"""
+
+    def __init__(self):
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+    def subscribe(self, listener: Callable[[str, Dict[str, Any]], None]):
+        self._listeners.append(listener)
+
+    def _emit(self, event: str, record: Dict[str, Any]):
+        for listener in list(self._listeners):
+            listener(event, record)
+
+    def added(self, record: Dict[str, Any]):
+        self._emit(ADDED, record)
+
+    def updated(self, record: Dict[str, Any]):
+        self._emit(UPDATED, record)
+
+    def removed(self, record: Dict[str, Any]):
+        self._emit(REMOVED, record)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Teste de estresse do checkout de veículos.
+
+Dispara centenas de checkouts simultâneos para o mesmo veículo, cada um
+com um motorista diferente e sua própria sessão, e verifica que exatamente
+um deles conseguiu reservar o veículo.
+
+Uso:
+    python stress_checkout.py --workers 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Banco temporário (precisa ser definido antes de importar o módulo database)
+_tmp_dir = tempfile.mkdtemp(prefix="sguv_stress_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'stress.db')}"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+from sqlalchemy import insert, func  # noqa: E402
+from database import SessionLocal, create_tables, engine  # noqa: E402
+from models import Usuario, Veiculo, ControleUtilizacaoVeiculo  # noqa: E402
+import crud, schemas  # noqa: E402
+
+
+def setup(workers: int) -> int:
+    """Cria um veículo disponível e um motorista por worker"""
+    create_tables()
+    with engine.begin() as conn:
+        conn.execute(insert(Veiculo), [{"marca": "Fiat", "modelo": "Uno", "placa": "STR0001", "status": "disponivel"}])
+        conn.execute(insert(Usuario), [
+            {
+                "matricula": f"M{i:04d}",
+                "nome": f"Motorista {i}",
+                "email": f"motorista{i}@sguv.com",
+                "status": "ativo",
+                "perfil": "motorista",
+                "senha_hash": "x",
+            }
+            for i in range(workers)
+        ])
+    db = SessionLocal()
+    try:
+        return db.query(Veiculo.id).filter(Veiculo.placa == "STR0001").scalar()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkouts concorrentes no mesmo veículo")
+    parser.add_argument("--workers", type=int, default=300)
+    args = parser.parse_args()
+
+    veiculo_id = setup(args.workers)
+    barrier = threading.Barrier(args.workers)
+
+    def checkout(motorista_id: int) -> str:
+        db = SessionLocal()
+        try:
+            controle = schemas.ControleUtilizacaoVeiculoCreate(
+                veiculo_id=veiculo_id,
+                data_inicio=time.strftime("%Y-%m-%d %H:%M:%S"),
+                km_inicial=1000
+            )
+            barrier.wait()
+            result = crud.create_controle(db, controle, motorista_id=motorista_id)
+            return "sucesso" if result is not None else "indisponivel"
+        except Exception as e:
+            return f"erro: {type(e).__name__}"
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(checkout, range(1, args.workers + 1)))
+    elapsed = time.perf_counter() - start
+
+    summary = {}
+    for result in results:
+        summary[result] = summary.get(result, 0) + 1
+
+    db = SessionLocal()
+    try:
+        controles = db.query(func.count(ControleUtilizacaoVeiculo.id)).scalar()
+        status = db.query(Veiculo.status).filter(Veiculo.id == veiculo_id).scalar()
+    finally:
+        db.close()
+
+    print(f"{args.workers} checkouts em {elapsed:.2f}s: {summary}")
+    print(f"Controles criados: {controles} | status do veículo: {status}")
+
+    if summary.get("sucesso") != 1 or controles != 1 or status != "em_uso":
+        print("❌ FALHOU: o veículo deveria ter sido reservado exatamente uma vez")
+        sys.exit(1)
+    print("✅ OK: apenas um checkout foi aceito")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Sincronização do aplicativo do motorista (flet_app/sync.py) contra uma API simulada"""
+import os
+import sys
+import tempfile
+
+# Os módulos do flet_app se importam sem pacote (from local_store import ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "flet_app"))
+os.environ.setdefault("SGUV_OFFLINE_QUEUE", os.path.join(tempfile.mkdtemp(), "rotas_pendentes.json"))
+
+from local_store import CONFLITO, LocalStore  # noqa: E402
+from sync import SyncService  # noqa: E402
+
+MOTORISTA_ID = 7
+VEICULO = {"id": 3, "marca": "Fiat", "modelo": "Uno", "placa": "ABC1234"}
+
+
+class FakeApi:
+    """Servidor com um controle aberto que recusa a finalização (ex.: alterado por outro usuário)"""
+
+    def __init__(self):
+        self.server_control = None
+
+    def create_usage_control(self, veiculo_id, km_inicial, data_inicio=None, client_id=None):
+        self.server_control = {
+            "id": 100, "client_id": client_id, "veiculo_id": veiculo_id, "data_inicio": data_inicio,
+            "km_inicial": km_inicial, "km_final": None, "data_fim": None, "assinatura_eletronica": None,
+            "status": "aberto", "version": 1, "veiculo": VEICULO, "rotas": [],
+        }
+        return {"success": True, "data": self.server_control}
+
+    def finalize_usage_control(self, control_id, km_final, assinatura, data_fim=None, version=None,
+                               idempotency_key=None):
+        return {"success": False, "status_code": 409, "message": "Registro alterado por outro usuário"}
+
+    def get_usage_control(self, control_id):
+        return {"success": True, "data": self.server_control}
+
+    def get_my_usage_controls(self, projection=None):
+        return {"success": True, "data": [self.server_control]}
+
+    def get_available_vehicles(self):
+        return {"success": True, "data": []}
+
+
+def test_finalizacao_recusada_continua_em_conflito_depois_do_pull():
+    api = FakeApi()
+    store = LocalStore(":memory:")
+    service = SyncService(api, store, MOTORISTA_ID)
+
+    control = store.create_control(MOTORISTA_ID, VEICULO, 1000)
+    service.sync()
+    store.finalize_control(control["local_id"], 1080, "assinatura")
+
+    # push marca o conflito e, como a outbox esvaziou, o pull roda na mesma passada
+    summary = service.sync()
+
+    local = store.get_control(control["local_id"])
+    assert summary == {"pendentes": 0, "conflitos": 1}
+    assert local["sync_status"] == CONFLITO
+    assert local["status"] == "finalizado"
+    assert local["km_final"] == 1080
+    assert local["assinatura_eletronica"] == "assinatura"
+
+    # Descartado pelo motorista, o controle volta a refletir o servidor
+    store.discard_control(control["local_id"])
+    service.pull()
+    restored = store.get_control(control["local_id"])
+    assert restored["status"] == "aberto"
+    assert restored["sync_status"] != CONFLITO